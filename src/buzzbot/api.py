@@ -8,6 +8,7 @@ Run (dev):
 """
 from __future__ import annotations
 
+import dataclasses
 import uuid
 import threading
 from typing import Dict, List, Optional, Any
@@ -16,10 +17,12 @@ from flask import Flask, request, jsonify
 
 from .config import AppConfig
 from .chat import ChatSession
-from .io_utils import save_history
+from .messages import JSONProvider
+from .io_utils import open_journal
 from .veo3 import generate_veo3_video
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 
 # Global config + session store -------------------------------------------------
 _config = AppConfig.load()
@@ -31,14 +34,11 @@ _global_lock = threading.Lock()
 def _create_session(model: Optional[str] = None, system_prompt: Optional[str] = None) -> str:
     cfg = _config
     model_to_use = model or cfg.model
-    new_cfg = type(cfg)(
-        openai_api_key=cfg.openai_api_key,
-        google_api_key=cfg.google_api_key,
-        base_url=cfg.base_url,
+    new_cfg = dataclasses.replace(
+        cfg,
         model=model_to_use,
         system_prompt=system_prompt or cfg.system_prompt,
         color=False,
-        debug=cfg.debug,
     )
     session = ChatSession(config=new_cfg)
     sid = uuid.uuid4().hex
@@ -107,9 +107,7 @@ def chat():
         if data.get("model") and data.get("model") != session.config.model:
             session.switch_model(data.get("model"))
         if data.get("reset"):
-            session.history.clear()
-            if session.config.system_prompt:
-                session.history.append({"role": "system", "content": session.config.system_prompt})
+            session.reset()
         reply_msg = session.complete(prompt)
         return jsonify({
             "session_id": sid,
@@ -136,9 +134,11 @@ def switch_model(session_id: str):
 def save_session(session_id: str):
     if session_id not in _sessions:
         return jsonify({"error": "not_found"}), 404
+    session = _sessions[session_id]
     with _locks[session_id]:
-        path = save_history(_sessions[session_id].history)
-    return jsonify({"path": str(path), "messages": len(_sessions[session_id].history)})
+        journal = open_journal(session_id, **session.config.journal_options())
+        appended = journal.sync(session.history)
+    return jsonify({"path": str(journal.path), "messages": len(session.history), "appended": appended})
 
 
 @app.route("/video/generate", methods=["POST"])
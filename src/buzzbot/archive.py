@@ -0,0 +1,278 @@
+"""Compressed binary archive for session histories (``.bzar``).
+
+Layout::
+
+    b"BZAR" | version u8 | codec u8 | encoding u8
+    block*:  raw_len u32 | comp_len u32 | compressed(record*)
+    record:  len u32 | payload (msgpack or JSON bytes)
+
+Records are packed into ~64 KiB blocks compressed with zstd when the
+``zstandard`` package is installed, zlib otherwise. Payloads use ``msgpack``
+when available, JSON otherwise; readers handle whichever a file was written
+with. ``iter_archive`` decompresses one block at a time, so memory stays flat
+no matter how large the archive is.
+
+Several sessions can share one archive: each starts with a
+``{"_op": "session", "name": ...}`` record (see ``pack_sessions``).
+
+CLI::
+
+    PYTHONPATH=src python -m buzzbot.archive pack data/sessions/x.jsonl x.bzar
+    PYTHONPATH=src python -m buzzbot.archive unpack x.bzar x.jsonl
+    PYTHONPATH=src python -m buzzbot.archive pack-dir data/sessions all.bzar
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .messages import json_default
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+MAGIC = b"BZAR"
+VERSION = 1
+CODEC_ZLIB, CODEC_ZSTD = 0, 1
+ENCODING_JSON, ENCODING_MSGPACK = 0, 1
+SUFFIX = ".bzar"
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+_HEADER = struct.Struct("<4sBBB")
+_BLOCK = struct.Struct("<II")
+_RECORD = struct.Struct("<I")
+
+Message = Dict[str, Any]
+
+
+def is_archive(path: Path) -> bool:
+    try:
+        with Path(path).open("rb") as f:
+            return f.read(4) == MAGIC
+    except OSError:
+        return False
+
+
+def _encoder(encoding: int):
+    if encoding == ENCODING_MSGPACK:
+        return lambda msg: msgpack.packb(msg, default=json_default, use_bin_type=True)
+    return lambda msg: json.dumps(msg, ensure_ascii=False, default=json_default).encode("utf-8")
+
+
+def _decoder(encoding: int):
+    if encoding == ENCODING_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("archive uses msgpack. Run: pip install msgpack")
+        return lambda data: msgpack.unpackb(data, raw=False)
+    return lambda data: json.loads(bytes(data))
+
+
+def _compressor(codec: int, level: Optional[int]):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level if level is not None else 3).compress
+    return lambda data: zlib.compress(data, level if level is not None else 6)
+
+
+def _decompressor(codec: int):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("archive uses zstd. Run: pip install zstandard")
+        dctx = zstandard.ZstdDecompressor()
+        return lambda data, raw_len: dctx.decompress(data, max_output_size=raw_len)
+    return lambda data, raw_len: zlib.decompress(data)
+
+
+class ArchiveWriter:
+    """Streaming writer; use as a context manager."""
+
+    def __init__(
+        self,
+        path: Path,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        codec: Optional[int] = None,
+        encoding: Optional[int] = None,
+        level: Optional[int] = None,
+    ):
+        if codec is None:
+            codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+        if encoding is None:
+            encoding = ENCODING_MSGPACK if msgpack is not None else ENCODING_JSON
+        self.path = Path(path)
+        self.block_size = block_size
+        self._encode = _encoder(encoding)
+        self._compress = _compressor(codec, level)
+        self._buf = bytearray()
+        self._f = self.path.open("wb")
+        self._f.write(_HEADER.pack(MAGIC, VERSION, codec, encoding))
+        self.count = 0
+
+    def write(self, msg: Any):
+        payload = self._encode(msg)
+        self._buf += _RECORD.pack(len(payload))
+        self._buf += payload
+        self.count += 1
+        if len(self._buf) >= self.block_size:
+            self._flush_block()
+
+    def write_many(self, messages: Iterable[Any]):
+        for msg in messages:
+            self.write(msg)
+
+    def _flush_block(self):
+        if not self._buf:
+            return
+        comp = self._compress(bytes(self._buf))
+        self._f.write(_BLOCK.pack(len(self._buf), len(comp)))
+        self._f.write(comp)
+        self._buf.clear()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._flush_block()
+        self._f.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_archive(path: Path) -> Iterator[Any]:
+    """Yield every record of an archive, decompressing one block at a time."""
+    with Path(path).open("rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path}: truncated archive header")
+        magic, version, codec, encoding = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a BuzzBot archive")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported archive version {version}")
+        decompress = _decompressor(codec)
+        decode = _decoder(encoding)
+        while True:
+            head = f.read(_BLOCK.size)
+            if not head:
+                return
+            if len(head) < _BLOCK.size:
+                raise ValueError(f"{path}: truncated block header")
+            raw_len, comp_len = _BLOCK.unpack(head)
+            block = memoryview(decompress(f.read(comp_len), raw_len))
+            pos = 0
+            while pos < raw_len:
+                (n,) = _RECORD.unpack_from(block, pos)
+                pos += _RECORD.size
+                yield decode(block[pos:pos + n])
+                pos += n
+
+
+def write_archive(path: Path, messages: Iterable[Any], **options: Any) -> int:
+    with ArchiveWriter(path, **options) as w:
+        w.write_many(messages)
+        return w.count
+
+
+def load_archive(path: Path) -> List[Message]:
+    """Materialize a single-session archive as a history list."""
+    return [m for m in iter_archive(path) if not (isinstance(m, dict) and "_op" in m)]
+
+
+# Converters -------------------------------------------------------------------
+def _iter_jsonl(path: Path) -> Iterator[Any]:
+    # Imported lazily: io_utils dispatches to this module for .bzar files
+    from .io_utils import load_history
+    yield from load_history(Path(path))
+
+
+def jsonl_to_archive(src: Path, dst: Path, **options: Any) -> int:
+    return write_archive(dst, _iter_jsonl(src), **options)
+
+
+def archive_to_jsonl(src: Path, dst: Path) -> int:
+    count = 0
+    with Path(dst).open("w", encoding="utf-8") as f:
+        for msg in iter_archive(src):
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def pack_sessions(paths: Iterable[Path], dst: Path, **options: Any) -> int:
+    """Bundle many JSONL sessions/journals into one archive."""
+    sessions = 0
+    with ArchiveWriter(dst, **options) as w:
+        for p in paths:
+            p = Path(p)
+            w.write({"_op": "session", "name": p.name})
+            w.write_many(_iter_jsonl(p))
+            sessions += 1
+    return sessions
+
+
+def iter_sessions(path: Path) -> Iterator[Tuple[str, List[Message]]]:
+    """Yield (name, history) for each session of a pack_sessions archive."""
+    name: Optional[str] = None
+    history: List[Message] = []
+    for rec in iter_archive(path):
+        if isinstance(rec, dict) and rec.get("_op") == "session":
+            if name is not None:
+                yield name, history
+            name, history = rec.get("name", ""), []
+        else:
+            history.append(rec)
+    if name is not None:
+        yield name, history
+
+
+def unpack_sessions(src: Path, out_dir: Path) -> int:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for name, history in iter_sessions(src):
+        with (out_dir / Path(name).name).open("w", encoding="utf-8") as f:
+            for msg in history:
+                f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="buzzbot.archive", description="Convert session histories to/from .bzar archives.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    for cmd, help_ in (
+        ("pack", "JSONL session -> archive"),
+        ("unpack", "archive -> JSONL session"),
+        ("pack-dir", "every *.jsonl in a directory -> one archive"),
+        ("unpack-dir", "multi-session archive -> directory of JSONL files"),
+    ):
+        sp = sub.add_parser(cmd, help=help_)
+        sp.add_argument("src", type=Path)
+        sp.add_argument("dst", type=Path)
+    args = p.parse_args(argv)
+    if args.cmd == "pack":
+        print(f"{jsonl_to_archive(args.src, args.dst)} messages -> {args.dst}")
+    elif args.cmd == "unpack":
+        print(f"{archive_to_jsonl(args.src, args.dst)} messages -> {args.dst}")
+    elif args.cmd == "pack-dir":
+        print(f"{pack_sessions(sorted(args.src.glob('*.jsonl')), args.dst)} sessions -> {args.dst}")
+    else:
+        print(f"{unpack_sessions(args.src, args.dst)} sessions -> {args.dst}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
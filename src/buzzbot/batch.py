@@ -0,0 +1,156 @@
+"""Batch prompt runner: many independent ChatSessions over a worker pool.
+
+Input is JSONL (a file, or ``-`` for stdin); each line is one job:
+
+    {"id": "a1", "prompt": "Pitch a 8s clip about cats"}
+    {"id": "a2", "prompts": ["Pitch a clip", "Make it funnier"]}     # multi-turn
+    {"id": "a3", "messages": [{"role": "system", "content": "..."},
+                              {"role": "user", "content": "..."}]}   # history + last user turn
+    "a bare JSON string (or a non-JSON line) is a single prompt"
+
+Results are appended to the output JSONL in completion order, one line per
+job with its ``id`` and input ``index``. Jobs whose id already has a
+successful result in the output file are skipped, so an interrupted run can
+simply be restarted with the same arguments.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .chat import ChatSession
+from .config import AppConfig
+from .router import BACKGROUND
+
+Job = Dict[str, Any]
+
+
+def read_jobs(stream: TextIO) -> Iterator[Tuple[int, Job]]:
+    """Yield (index, job) for every non-empty input line."""
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            data = line
+        if isinstance(data, str):
+            data = {"prompt": data}
+        if not isinstance(data, dict):
+            print(f"[warn] batch line {index}: expected an object or string, skipping", file=sys.stderr)
+            index += 1
+            continue
+        data.setdefault("id", str(index))
+        yield index, data
+        index += 1
+
+
+def completed_ids(output: Path) -> Set[str]:
+    """Ids that already have a successful result in output."""
+    done: Set[str] = set()
+    if not output.exists():
+        return done
+    with output.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # e.g. a line truncated by a crash
+            if isinstance(rec, dict) and not rec.get("error"):
+                done.add(str(rec.get("id")))
+    return done
+
+
+def _turns(job: Job) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """(history prefix, user prompts to send) for a job."""
+    if "messages" in job:
+        history = [dict(m) for m in job["messages"]]
+        if not history or history[-1].get("role") != "user":
+            raise ValueError("'messages' must end with a user message")
+        last = history.pop()
+        return history, [last.get("content", "")]
+    if "prompts" in job:
+        return [], [str(p) for p in job["prompts"]]
+    if "prompt" in job:
+        return [], [str(job["prompt"])]
+    raise ValueError("job needs 'prompt', 'prompts' or 'messages'")
+
+
+def run_job(config: AppConfig, index: int, job: Job) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"id": job["id"], "index": index}
+    try:
+        history, prompts = _turns(job)
+        cfg = dataclasses.replace(config, model=job.get("model") or config.model)
+        session = ChatSession(config=cfg, history=history)
+        session.echo = False
+        # A batch job ends with its last reply: nothing would pick up deferred results
+        session.defer_tools = False
+        replies = []
+        for prompt in prompts:
+            reply = session.complete(prompt, call_class=BACKGROUND)
+            content = reply.get("content", "")
+            if content.startswith("<error"):
+                raise RuntimeError(content)
+            replies.append(content)
+        result["reply"] = replies[-1]
+        if len(replies) > 1:
+            result["replies"] = replies
+    except Exception as e:
+        result["error"] = str(e)
+    result["latency"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(
+    config: AppConfig,
+    source: TextIO,
+    output: Path,
+    workers: int = 4,
+) -> int:
+    """Run every pending job of source; returns the number of failed jobs."""
+    skip = completed_ids(output)
+    pending = [(i, job) for i, job in read_jobs(source) if str(job["id"]) not in skip]
+    if skip:
+        print(f"[batch] resuming: {len(skip)} job(s) already done", file=sys.stderr)
+    total, failed, done = len(pending), 0, 0
+    write_lock = threading.Lock()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run_job, config, i, job) for i, job in pending]
+        for fut in as_completed(futures):
+            result = fut.result()
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+            done += 1
+            if result.get("error"):
+                failed += 1
+            print(f"[batch] {done}/{total} done ({failed} failed)", file=sys.stderr)
+    return failed
+
+
+def default_output(batch_arg: str) -> Path:
+    if batch_arg == "-":
+        return Path("batch_results.jsonl")
+    src = Path(batch_arg)
+    return src.with_name(src.stem + ".results.jsonl")
+
+
+def main_batch(config: AppConfig, batch_arg: str, output: Optional[str], workers: int) -> int:
+    out_path = Path(output) if output else default_output(batch_arg)
+    if batch_arg == "-":
+        failed = run_batch(config, sys.stdin, out_path, workers)
+    else:
+        with open(batch_arg, "r", encoding="utf-8") as f:
+            failed = run_batch(config, f, out_path, workers)
+    print(f"[batch] results in {out_path}", file=sys.stderr)
+    return 1 if failed else 0
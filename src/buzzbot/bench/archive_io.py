@@ -0,0 +1,65 @@
+"""Size and speed of session exports: JSONL files vs. one .bzar archive.
+
+Writes N synthetic sessions as JSONL (the data/sessions format), packs them
+into a single archive and times reloading both ways.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.bench.archive_io --sessions 2000 --messages 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from .. import archive
+from ..io_utils import load_history
+from .history_memory import synthetic_history
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=2000)
+    p.add_argument("--messages", type=int, default=200)
+    args = p.parse_args(argv)
+
+    codec = "zstd" if archive.zstandard is not None else "zlib"
+    encoding = "msgpack" if archive.msgpack is not None else "json"
+    print(f"{args.sessions} sessions x {args.messages} messages ({encoding} + {codec})")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        jsonl_dir = root / "sessions"
+        jsonl_dir.mkdir()
+        paths = []
+        for s in range(args.sessions):
+            path = jsonl_dir / f"{s:06d}.jsonl"
+            with path.open("w", encoding="utf-8") as f:
+                for msg in synthetic_history(s, args.messages):
+                    f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            paths.append(path)
+        jsonl_bytes = sum(p.stat().st_size for p in paths)
+
+        bundle = root / "all.bzar"
+        _, pack_s = _timed(lambda: archive.pack_sessions(paths, bundle))
+        arch_bytes = bundle.stat().st_size
+
+        n_jsonl, load_jsonl_s = _timed(lambda: sum(len(load_history(p)) for p in paths))
+        n_arch, load_arch_s = _timed(lambda: sum(len(h) for _, h in archive.iter_sessions(bundle)))
+        assert n_jsonl == n_arch, (n_jsonl, n_arch)
+
+    print(f"size   jsonl {jsonl_bytes / 2**20:8.1f} MiB   archive {arch_bytes / 2**20:8.1f} MiB  ({jsonl_bytes / max(arch_bytes, 1):.1f}x smaller)")
+    print(f"pack   {pack_s:6.2f}s")
+    print(f"reload jsonl {load_jsonl_s:6.2f}s   archive {load_arch_s:6.2f}s  ({n_arch} messages)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
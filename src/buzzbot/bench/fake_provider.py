@@ -0,0 +1,243 @@
+"""Local fake OpenAI-compatible provider and fake Veo3 client for offline benchmarks.
+
+``FakeProvider`` serves ``POST /v1/chat/completions`` (blocking and SSE
+streaming) with configurable first-token latency, token rate and tool-call
+behaviour, plus ``GET /v1/models``. Point ``OPENAI_BASE_URL`` at it.
+
+Standalone:
+  PYTHONPATH=src python -m buzzbot.bench.fake_provider --port 8900 --latency-ms 200 --tokens-per-s 80
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+WORDS = "viral clip idea with a twist drone shot cat skateboard sunset neon city ocean slow motion".split()
+
+
+@dataclass
+class ProviderBehavior:
+    latency_ms: float = 150.0      # time to first token
+    tokens_per_s: float = 100.0    # generation speed after the first token
+    reply_tokens: int = 40
+    tool_call_rate: float = 0.2    # chance to answer a user turn with a tool call
+    error_rate: float = 0.0        # chance to answer with HTTP 500
+    seed: Optional[int] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, *args):  # keep benchmark output clean
+        pass
+
+    def _json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        b = self.server.behavior
+        rng = self.server.rng
+        with self.server.rng_lock:
+            fail = rng.random() < b.error_rate
+            call_tool = rng.random() < b.tool_call_rate
+            words = [rng.choice(WORDS) for _ in range(b.reply_tokens)]
+        self.server.count_request()
+        time.sleep(b.latency_ms / 1000.0)
+        if fail:
+            self._json(500, {"error": {"message": "fake provider failure", "type": "server_error"}})
+            return
+        messages: List[Dict[str, Any]] = req.get("messages") or []
+        tool_call = None
+        if req.get("tools") and messages and messages[-1].get("role") == "user" and call_tool:
+            tool_call = {
+                "index": 0,
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": "get_random_D6_dice_value", "arguments": "{}"},
+            }
+        if req.get("stream"):
+            self._stream(req, words, tool_call)
+        else:
+            self._blocking(req, words, tool_call)
+
+    def _blocking(self, req, words, tool_call):
+        b = self.server.behavior
+        if tool_call is None:
+            time.sleep(len(words) / b.tokens_per_s)
+        message: Dict[str, Any] = {"role": "assistant", "content": None if tool_call else " ".join(words)}
+        if tool_call:
+            message["tool_calls"] = [{k: v for k, v in tool_call.items() if k != "index"}]
+        self._json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "fake-model"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 0 if tool_call else len(words), "total_tokens": 10 + len(words)},
+        })
+
+    def _stream(self, req, words, tool_call):
+        b = self.server.behavior
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def send(delta: Dict[str, Any], finish: Optional[str] = None, usage=None):
+            chunk = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": req.get("model", "fake-model"),
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            if usage:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        if tool_call:
+            send({"role": "assistant", "tool_calls": [tool_call]})
+            send({}, "tool_calls")
+        else:
+            for i, w in enumerate(words):
+                send({"role": "assistant", "content": w} if i == 0 else {"content": " " + w})
+                time.sleep(1.0 / b.tokens_per_s)
+            send({}, "stop")
+        if (req.get("stream_options") or {}).get("include_usage"):
+            send({}, usage={"prompt_tokens": 10, "completion_tokens": 0 if tool_call else len(words), "total_tokens": 10 + len(words)})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, behavior: ProviderBehavior):
+        super().__init__(addr, _Handler)
+        self.behavior = behavior
+        self.rng = random.Random(behavior.seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests += 1
+
+
+class FakeProvider:
+    """Run the fake provider in a background thread (context manager)."""
+
+    def __init__(self, behavior: Optional[ProviderBehavior] = None, host: str = "127.0.0.1", port: int = 0):
+        self.server = _Server((host, port), behavior or ProviderBehavior())
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-provider", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    def start(self) -> "FakeProvider":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeProvider":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Fake Veo3 (google-genai) client ------------------------------------------------
+class _FakeVideo:
+    def __init__(self, size: int):
+        self.size = size
+
+    def save(self, path: str):
+        Path(path).write_bytes(b"\0" * self.size)
+
+
+class FakeVeo3Client:
+    """Implements the slice of ``genai.Client`` used by ``generate_veo3_video``.
+
+    The operation completes after ``render_seconds`` inside generate_videos,
+    so the real 10s polling loop is never entered.
+    """
+
+    requires_sdk = False
+
+    def __init__(self, render_seconds: float = 2.0, video_bytes: int = 256 * 1024):
+        client = self
+
+        def generate_videos(model: str, prompt: str, config: Any = None):
+            time.sleep(client.render_seconds)
+            video = _FakeVideo(client.video_bytes)
+            return SimpleNamespace(done=True, response=SimpleNamespace(generated_videos=[SimpleNamespace(video=video)]))
+
+        self.render_seconds = render_seconds
+        self.video_bytes = video_bytes
+        self.models = SimpleNamespace(generate_videos=generate_videos)
+        self.operations = SimpleNamespace(get=lambda op: op)
+        self.files = SimpleNamespace(download=lambda file: None)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8900)
+    p.add_argument("--latency-ms", type=float, default=150.0)
+    p.add_argument("--tokens-per-s", type=float, default=100.0)
+    p.add_argument("--reply-tokens", type=int, default=40)
+    p.add_argument("--tool-call-rate", type=float, default=0.2)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    args = p.parse_args(argv)
+    behavior = ProviderBehavior(args.latency_ms, args.tokens_per_s, args.reply_tokens, args.tool_call_rate, args.error_rate)
+    provider = FakeProvider(behavior, args.host, args.port)
+    print(f"Fake provider on {provider.base_url} (Ctrl+C to stop)")
+    try:
+        provider.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+"""Fan-out publishing benchmark with fake platform backends.
+
+Starts --posts posts of one --size-mb video to --platforms fake platforms
+(each with --latency seconds per upload and --concurrency parallel
+uploads) through PostManager and reports wall time, post throughput and
+per-post / per-task latency percentiles.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.bench.fanout --posts 50 --platforms 3 --size-mb 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .. import metrics
+from ..publish.fanout import RUNNING, FakeBackend, PostManager
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--posts", type=int, default=20)
+    p.add_argument("--platforms", type=int, default=3)
+    p.add_argument("--size-mb", type=float, default=10.0)
+    p.add_argument("--latency", type=float, default=0.2, help="seconds per fake upload")
+    p.add_argument("--concurrency", type=int, default=4, help="parallel uploads per platform")
+    p.add_argument("--error-rate", type=float, default=0.0)
+    args = p.parse_args(argv)
+
+    backends = [
+        FakeBackend(f"fake{i}", latency=args.latency, jitter=args.latency / 4,
+                    error_rate=args.error_rate, concurrency=args.concurrency)
+        for i in range(args.platforms)
+    ]
+    manager = PostManager(backends)
+    with tempfile.TemporaryDirectory(prefix="buzzbot-fanout-") as tmp:
+        video = Path(tmp) / "clip.mp4"
+        video.write_bytes(os.urandom(int(args.size_mb * (1 << 20))))
+        start = time.perf_counter()
+        posts = [manager.start(video, f"post {i}", [b.name for b in backends]) for i in range(args.posts)]
+        while any(post.status == RUNNING for post in posts):
+            time.sleep(0.01)
+        wall = time.perf_counter() - start
+
+    ends = [max(t.finished for t in post.tasks.values()) - post.created for post in posts]
+    tasks = [t for post in posts for t in post.tasks.values()]
+    failed = sum(1 for t in tasks if t.error)
+    post_lat = metrics.summarize(ends)
+    task_lat = metrics.summarize(t.latency for t in tasks)
+    print(f"{args.posts} posts x {args.platforms} platforms, {args.size_mb:g} MB video")
+    print(f"wall {wall:.2f}s  {args.posts / wall:.2f} posts/s  {failed}/{len(tasks)} tasks failed")
+    print(f"post latency  p50 {post_lat['p50']:.3f}s  p95 {post_lat['p95']:.3f}s  max {post_lat['max']:.3f}s")
+    print(f"task latency  p50 {task_lat['p50']:.3f}s  p95 {task_lat['p95']:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
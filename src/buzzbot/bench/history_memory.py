@@ -0,0 +1,82 @@
+"""Heap usage of cached chat histories: plain dicts vs. compact MessageStore.
+
+Builds N sessions x M messages of a realistic mix (system prompt, user turns,
+assistant tool calls, tool results, assistant replies) in both
+representations and reports the traced allocation size of each.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.bench.history_memory --sessions 10000 --messages 100
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from ..messages import MessageStore
+
+SYSTEM_PROMPT = "You are BuzzBot, an assistant that helps create viral video ideas."
+
+
+def synthetic_history(session_idx: int, n_messages: int) -> List[Dict[str, Any]]:
+    history: List[Dict[str, Any]] = [{"id": 1, "role": "system", "content": SYSTEM_PROMPT}]
+    i = 0
+    while len(history) < n_messages:
+        i += 1
+        mid = len(history) + 1
+        history.append({"id": mid, "role": "user", "content": f"Idea #{i} for session {session_idx}: roll a die and pitch a clip"})
+        if i % 3 == 0:
+            call_id = f"call_{session_idx}_{i}"
+            history.append({
+                "id": mid + 1,
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": "get_random_D6_dice_value", "arguments": "{}"},
+                }],
+            })
+            history.append({
+                "id": mid + 2,
+                "role": "tool",
+                "tool_call_id": call_id,
+                "name": "get_random_D6_dice_value",
+                "content": str(i % 6 + 1),
+            })
+        history.append({"id": len(history) + 1, "role": "assistant", "content": f"Here is pitch {i} for session {session_idx}, with a twist."})
+    return history[:n_messages]
+
+
+def measure(label: str, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    data = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = sum(len(h) for h in data)
+    print(f"{label:<14} {current / 2**20:9.1f} MiB  {current / max(n, 1):7.1f} B/msg  built in {elapsed:.1f}s")
+    del data
+    return current
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=10_000)
+    p.add_argument("--messages", type=int, default=100)
+    args = p.parse_args(argv)
+
+    print(f"{args.sessions} sessions x {args.messages} messages")
+    dicts = measure("list[dict]", lambda: [synthetic_history(s, args.messages) for s in range(args.sessions)])
+    compact = measure("MessageStore", lambda: [MessageStore(synthetic_history(s, args.messages)) for s in range(args.sessions)])
+    print(f"saving: {(1 - compact / dicts) * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
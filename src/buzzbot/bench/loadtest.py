@@ -0,0 +1,228 @@
+"""Offline load test of the Flask webserver (/chat, /sessions, /video/generate).
+
+Starts a fake OpenAI-compatible provider and a fake Veo3 client (see
+fake_provider.py), boots the real webserver against a temporary SQLite
+database, then drives a weighted mix of requests from N concurrent clients.
+Reports per-endpoint p50/p95/p99 latency and requests/s, SQLite write
+latency (which includes lock waits) and "database is locked" errors, and the
+server process RSS.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.bench.loadtest --concurrency 16 --duration 30 \\
+      --mix chat=70,sessions=25,video=5 --latency-ms 150 --tokens-per-s 100
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fake_provider import FakeProvider, FakeVeo3Client, ProviderBehavior
+from ..metrics import percentile
+
+OPS = ("chat", "sessions", "video")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPS:
+            raise SystemExit(f"unknown op in --mix: {name!r} (expected one of {OPS})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def rss_mib() -> Tuple[Optional[float], float]:
+    """(current RSS, peak RSS) of this process in MiB."""
+    current = None
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return current, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class DbProbe:
+    """SQLAlchemy engine hooks timing write statements and counting lock errors."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.write_seconds: List[float] = []
+        self.locked_errors = 0
+        self._lock = threading.Lock()
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, params, context, executemany):
+            conn.info["bench_t0"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, params, context, executemany):
+            t0 = conn.info.pop("bench_t0", None)
+            if t0 is not None and statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+                with self._lock:
+                    self.write_seconds.append(time.perf_counter() - t0)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(ctx):
+            if "database is locked" in str(ctx.original_exception):
+                with self._lock:
+                    self.locked_errors += 1
+
+
+def _request(base: str, method: str, path: str, body: Optional[Dict[str, Any]] = None, timeout: float = 120.0):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def _client(base: str, mix: Dict[str, float], deadline: float, seed: int, results: List[Tuple[str, float, bool]]):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    _, payload = _request(base, "POST", "/session/new", {})
+    sid = payload["session_id"]
+    turn = 0
+    while time.monotonic() < deadline:
+        op = rng.choices(names, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            if op == "chat":
+                turn += 1
+                status, _ = _request(base, "POST", "/chat", {"session_id": sid, "prompt": f"idea {turn}: pitch a viral clip", "delta": True})
+            elif op == "sessions":
+                status, _ = _request(base, "GET", "/sessions")
+            else:
+                status, body = _request(base, "POST", "/video/generate", {"description": "a cat surfing at sunset"})
+                if status == 200 and body and body.get("status") != "ok":
+                    status = 500
+            ok = status == 200
+        except Exception:
+            ok = False
+        results.append((op, time.perf_counter() - t0, ok))
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    p.add_argument("--mix", type=str, default="chat=70,sessions=25,video=5")
+    p.add_argument("--latency-ms", type=float, default=150.0, help="fake provider time to first token")
+    p.add_argument("--tokens-per-s", type=float, default=100.0)
+    p.add_argument("--reply-tokens", type=int, default=40)
+    p.add_argument("--tool-call-rate", type=float, default=0.2)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--render-seconds", type=float, default=2.0, help="fake Veo3 render time")
+    p.add_argument("--json", type=Path, default=None, help="also write the report here")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    tmp = Path(tempfile.mkdtemp(prefix="buzzbot-loadtest-"))
+    behavior = ProviderBehavior(args.latency_ms, args.tokens_per_s, args.reply_tokens, args.tool_call_rate, args.error_rate, args.seed)
+    provider = FakeProvider(behavior).start()
+    os.environ.update({
+        "OPENAI_API_KEY": "fake",
+        "GOOGLE_API_KEY": "fake",
+        "OPENAI_BASE_URL": provider.base_url,
+        "OPENAI_MODEL": "fake-model",
+        "DATABASE_URL": f"sqlite:///{tmp / 'bench.db'}",
+        "BUZZBOT_VIDEO_DIR": str(tmp / "videos"),
+    })
+    # Imported only now: the webserver reads its config at import time
+    from werkzeug.serving import make_server
+    from .. import veo3, webserver
+    from ..chat import ChatSession
+
+    fake_veo = FakeVeo3Client(args.render_seconds)
+    ChatSession.google_client = lambda self: fake_veo  # type: ignore[method-assign]
+    veo3.MAX_VEO3_QUERIES = 10**9
+    with webserver.app.app_context():
+        probe = DbProbe(webserver.db.engine)
+    server = make_server("127.0.0.1", 0, webserver.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="buzzbot-server", daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"Load: {args.concurrency} clients x {args.duration:.0f}s, mix {mix}, provider {provider.base_url}")
+    results: List[Tuple[str, float, bool]] = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    clients = [
+        threading.Thread(target=_client, args=(base, mix, deadline, args.seed + i, results), daemon=True)
+        for i in range(args.concurrency)
+    ]
+    # Sessions echo every reply to stdout; keep the report readable
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+    elapsed = time.monotonic() - started
+    server.shutdown()
+    provider.stop()
+
+    by_op: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+    for op, dt, ok in results:
+        by_op[op].append((dt, ok))
+    report: Dict[str, Any] = {"elapsed_s": elapsed, "concurrency": args.concurrency, "endpoints": {}}
+    print(f"\n{'endpoint':<10}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for op in OPS:
+        samples = by_op.get(op)
+        if not samples:
+            continue
+        lat = [dt * 1000 for dt, _ in samples]
+        errors = sum(1 for _, ok in samples if not ok)
+        row = {
+            "requests": len(samples),
+            "errors": errors,
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(lat, 0.50),
+            "p95_ms": percentile(lat, 0.95),
+            "p99_ms": percentile(lat, 0.99),
+        }
+        report["endpoints"][op] = row
+        print(f"{op:<10}{row['requests']:>7}{errors:>8}{row['rps']:>9.1f}{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}")
+    writes = [w * 1000 for w in probe.write_seconds]
+    report["db"] = {
+        "writes": len(writes),
+        "write_p50_ms": percentile(writes, 0.50),
+        "write_p99_ms": percentile(writes, 0.99),
+        "write_max_ms": max(writes) if writes else 0.0,
+        "locked_errors": probe.locked_errors,
+    }
+    rss, peak = rss_mib()
+    report["rss_mib"] = rss
+    report["peak_rss_mib"] = peak
+    report["provider_requests"] = provider.requests
+    db = report["db"]
+    print(f"\nsqlite writes {db['writes']}: p50 {db['write_p50_ms']:.1f} ms, p99 {db['write_p99_ms']:.1f} ms, "
+          f"max {db['write_max_ms']:.1f} ms (incl. lock waits); 'database is locked' errors: {db['locked_errors']}")
+    print(f"provider requests: {provider.requests}; RSS {rss or 0:.0f} MiB (peak {peak:.0f} MiB)")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
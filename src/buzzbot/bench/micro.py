@@ -0,0 +1,225 @@
+"""Micro-benchmarks for ChatSession internals and the persistence paths.
+
+Times ``_convert_history``, ``_tool_specs``, ``_tool_dispatch``,
+``save_history`` / ``load_history``, the SQLAlchemy write/read paths used by
+``/chat`` and ``_session_payload`` / ``/sessions`` on synthetic histories of
+10 to 10k messages and 10 to 1000 sessions. Results are written as a JSON
+baseline; ``compare`` flags cases whose median got slower than a threshold.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.bench.micro run --out data/bench/base.json
+  PYTHONPATH=src python -m buzzbot.bench.micro run --compare data/bench/base.json
+  PYTHONPATH=src python -m buzzbot.bench.micro compare data/bench/base.json data/bench/new.json --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..config import APP_SAVING_DIR, AppConfig
+from .history_memory import synthetic_history
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_SESSION_COUNTS = (10, 100, 1000)
+
+# (case name, callable to time); setup happens while building the list
+Case = Tuple[str, Callable[[], Any]]
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """Median / min seconds per call over repeat runs of an auto-sized loop."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time or number >= 1 << 20:
+            break
+        number *= 4
+    runs = [t / number for t in timer.repeat(repeat, number)]
+    return {"median_us": statistics.median(runs) * 1e6, "min_us": min(runs) * 1e6, "loops": number}
+
+
+def _config() -> AppConfig:
+    return AppConfig(openai_api_key="bench", google_api_key="bench", model="bench-model", color=False)
+
+
+def chat_cases(sizes) -> Iterator[Case]:
+    from ..chat import ChatSession
+
+    for n in sizes:
+        session = ChatSession(_config(), history=synthetic_history(0, n))
+        yield f"chat.convert_history[{n}]", lambda s=session: list(s._convert_history())
+    session = ChatSession(_config())
+    session.echo = False
+    yield "chat.tool_specs", session._tool_specs
+    yield "chat.tool_dispatch", lambda: session._tool_dispatch("get_random_D6_dice_value", "{}")
+
+
+def io_cases(sizes, tmp: Path) -> Iterator[Case]:
+    from .. import io_utils
+
+    # save_history always writes a new timestamped file under SESSIONS_DIR
+    io_utils.SESSIONS_DIR = tmp / "sessions"
+    for n in sizes:
+        history = synthetic_history(0, n)
+        path = io_utils.save_history(history)
+        yield f"io.save_history[{n}]", lambda h=history: io_utils.save_history(h)
+        yield f"io.load_history[{n}]", lambda p=path: io_utils.load_history(p)
+
+
+def db_cases(sizes, session_counts) -> Iterator[Case]:
+    # Imported late: DATABASE_URL must point at the scratch database first
+    from .. import webserver
+    from ..models import ChatSessionDB, MessageDB, db
+
+    app = webserver.app
+
+    def add_session(sid: str, messages: List[Dict[str, Any]]):
+        db.session.add(ChatSessionDB(user_id=0, session_id=sid))
+        db.session.add_all(
+            MessageDB(session_id=sid, role=m["role"], content=m.get("content") or "")
+            for m in messages if m["role"] in ("user", "assistant")
+        )
+        db.session.commit()
+
+    cases: List[Case] = []
+    with app.app_context():
+        for n in sizes:
+            sid = f"bench-history-{n}"
+            add_session(sid, synthetic_history(0, n))
+            webserver._sessions[sid] = webserver.ChatSession(_config(), history=synthetic_history(0, n))
+
+            def insert(sid=sid):
+                with app.app_context():
+                    db.session.add(MessageDB(session_id=sid, role="assistant", content="bench reply"))
+                    db.session.commit()
+
+            def title_query(sid=sid):
+                with app.app_context():
+                    return MessageDB.query.filter_by(session_id=sid, role="user").order_by(MessageDB.timestamp).all()
+
+            def payload(sid=sid):
+                with app.app_context():
+                    return webserver._session_payload(sid)
+
+            cases += [
+                (f"db.message_insert[{n}]", insert),
+                (f"db.user_messages_query[{n}]", title_query),
+                (f"web.session_payload[{n}]", payload),
+            ]
+    yield from cases
+
+    created = 0
+    for k in session_counts:
+        with app.app_context():
+            ChatSessionDB.query.filter(ChatSessionDB.session_id.like("bench-history-%")).delete(synchronize_session=False)
+            db.session.commit()
+            while created < k:
+                add_session(f"bench-list-{created}", synthetic_history(created, 6))
+                created += 1
+
+        def list_sessions():
+            with app.test_request_context("/sessions"):
+                return webserver.list_sessions()
+
+        yield f"web.list_sessions[{k}]", list_sessions
+
+
+def run(args) -> Dict[str, Any]:
+    tmp = Path(tempfile.mkdtemp(prefix="buzzbot-micro-"))
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp / 'bench.db'}"
+    os.environ.setdefault("BUZZBOT_VIDEO_DIR", str(tmp / "videos"))
+    groups = [
+        chat_cases(args.sizes),
+        io_cases(args.sizes, tmp),
+        db_cases(args.sizes, args.sessions),
+    ]
+    results: Dict[str, Dict[str, float]] = {}
+    for group in groups:
+        for name, fn in group:
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, repeat=args.repeat, min_time=args.min_time)
+            r = results[name]
+            print(f"{name:<36}{r['median_us']:>14.1f} us  (min {r['min_us']:.1f}, x{r['loops']})", flush=True)
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": list(args.sizes),
+            "sessions": list(args.sessions),
+        },
+        "results": results,
+    }
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[str]:
+    """Print old vs new medians; returns the names of regressed cases."""
+    regressions: List[str] = []
+    print(f"{'case':<36}{'base us':>12}{'new us':>12}{'change':>9}")
+    for name, b in base["results"].items():
+        n = new["results"].get(name)
+        if n is None:
+            continue
+        change = n["median_us"] / b["median_us"] - 1 if b["median_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36}{b['median_us']:>12.1f}{n['median_us']:>12.1f}{change:>+9.1%}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than +{threshold:.0%}")
+    return regressions
+
+
+def _ints(spec: str) -> List[int]:
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the suite and write a JSON baseline")
+    r.add_argument("--sizes", type=_ints, default=list(DEFAULT_SIZES), help="history lengths (default 10,100,1000,10000)")
+    r.add_argument("--sessions", type=_ints, default=list(DEFAULT_SESSION_COUNTS), help="session counts for /sessions")
+    r.add_argument("--filter", default=None, help="only cases whose name contains this")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--min-time", type=float, default=0.05, help="seconds per timed run")
+    r.add_argument("--out", type=Path, default=None, help="baseline file (default data/bench/micro-<time>.json)")
+    r.add_argument("--compare", type=Path, default=None, help="compare against this baseline afterwards")
+    r.add_argument("--threshold", type=float, default=0.2, help="regression threshold (0.2 = 20%% slower)")
+    c = sub.add_parser("compare", help="compare two baselines")
+    c.add_argument("base", type=Path)
+    c.add_argument("new", type=Path)
+    c.add_argument("--threshold", type=float, default=0.2)
+    args = p.parse_args(argv)
+
+    if args.cmd == "compare":
+        base = json.loads(args.base.read_text())
+        new = json.loads(args.new.read_text())
+        return 1 if compare(base, new, args.threshold) else 0
+
+    report = run(args)
+    out = args.out or APP_SAVING_DIR / "bench" / f"micro-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nbaseline written to {out}", file=sys.stderr)
+    if args.compare:
+        print()
+        return 1 if compare(json.loads(args.compare.read_text()), report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
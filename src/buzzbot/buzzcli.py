@@ -2,11 +2,15 @@
 from __future__ import annotations
 import argparse
 import sys
+import weakref
 from pathlib import Path
+from typing import Optional
 
 from .config import AppConfig
-from .io_utils import save_history, load_history, print_message, colorize
+from . import metrics
+from .io_utils import save_history, load_history, print_message, colorize, open_journal, timestamp
 from .chat import ChatSession
+from .router import BACKGROUND
 
 
 def parse_args(argv=None):
@@ -15,6 +19,7 @@ def parse_args(argv=None):
     p.add_argument("--multiline", action="store_true", help="Enable multiline prompt input mode")
     p.add_argument("--system", type=str, help="Override/add a system prompt for this run", default=None)
     p.add_argument("--no-color", action="store_true", help="Disable ANSI colors")
+    p.add_argument("--no-stream", action="store_true", help="Print replies only once complete (no token streaming)")
     p.add_argument("--test-openai", action="store_true", help="Run a quick 'Hello world' API test and exit")
     # Webserver mode options
     p.add_argument("--webserver", action="store_true", help="Start web server (Flask) instead of interactive CLI (default)")
@@ -22,6 +27,16 @@ def parse_args(argv=None):
     p.add_argument("--webserver-port", type=int, default=8000, help="Port for web server (default: 8000)")
     p.add_argument("--webserver-reload", action="store_true", help="Enable autoreload for web server (dev only)")
     p.add_argument("--cli", action="store_true", help="Force CLI mode (override default webserver)")
+    # Batch mode
+    p.add_argument("--batch", type=str, default=None, metavar="FILE", help="Run prompts/conversations from a JSONL file ('-' for stdin) and exit")
+    p.add_argument("--batch-output", type=str, default=None, metavar="FILE", help="Results JSONL (default: <input>.results.jsonl); completed ids are skipped on rerun")
+    p.add_argument("--workers", type=int, default=4, help="Concurrent sessions in batch mode (default: 4)")
+    # Content daemon
+    p.add_argument("--daemon", action="store_true", help="Run the scheduled content daemon (ideate, render, publish)")
+    p.add_argument("--target", action="append", default=None, metavar="PLATFORM=N", help="Clips per day for a platform (repeatable; default BUZZBOT_DAEMON_TARGETS)")
+    p.add_argument("--veo3-quota", type=int, default=None, help="Veo3 renders per day (default BUZZBOT_VEO3_DAILY_QUOTA)")
+    p.add_argument("--publish-window", type=str, default=None, metavar="H-H", help="Local hours to publish in (default BUZZBOT_PUBLISH_WINDOW)")
+    p.add_argument("--dry-run", action="store_true", help="Daemon: log uploads instead of publishing")
     p.add_argument("--test-gen", action="store_true", help="Test clip gen")
     p.add_argument("--test-tiktok", action="store_true", help="Test")
     return p.parse_args(argv)
@@ -41,8 +56,65 @@ def read_multiline() -> str:
     return "\n".join(lines)
 
 
-def repl(session: ChatSession):
-    print(colorize("Type /exit to quit, /save to persist, /new to reset, /model <name> to switch model.", "\033[33m", session.config.color))
+# Journal key per CLI session: the first /save creates the journal, later ones
+# only append the messages added since.
+_journal_keys: "weakref.WeakKeyDictionary[ChatSession, str]" = weakref.WeakKeyDictionary()
+
+
+def bind_journal(session: ChatSession, key: str):
+    """Make /save continue an existing journal (e.g. one loaded via --session)."""
+    _journal_keys[session] = key
+
+
+def save_session(session: ChatSession) -> tuple[Path, int]:
+    key = _journal_keys.setdefault(session, timestamp())
+    journal = open_journal(key, **session.config.journal_options())
+    appended = journal.sync(session.history)
+    return journal.path, appended
+
+
+def format_turn_stats(stats: dict) -> str:
+    tps = stats.get("tokens_per_s")
+    rate = f" · {tps:.0f} tok/s" if tps else ""
+    return f"[ttft {stats['ttft']:.2f}s · total {stats['total']:.2f}s · {stats['tokens']} tok{rate}]"
+
+
+def format_session_stats(turn_stats: list) -> str:
+    if not turn_stats:
+        return "No completed turns yet."
+    ttft = metrics.summarize(t["ttft"] for t in turn_stats)
+    total = metrics.summarize(t["total"] for t in turn_stats)
+    rates = [t["tokens_per_s"] for t in turn_stats if t.get("tokens_per_s")]
+    lines = [
+        f"turns: {len(turn_stats)}",
+        f"ttft:  p50 {ttft['p50']:.2f}s  p95 {ttft['p95']:.2f}s  max {ttft['max']:.2f}s",
+        f"total: p50 {total['p50']:.2f}s  p95 {total['p95']:.2f}s  max {total['max']:.2f}s",
+    ]
+    if rates:
+        lines.append(f"rate:  mean {sum(rates) / len(rates):.0f} tok/s  min {min(rates):.0f}  max {max(rates):.0f}")
+    return "\n".join(lines)
+
+
+def _complete_turn(session: ChatSession, content: str, stream: bool):
+    n_turns = len(session.turn_stats)
+    session.complete(content, stream=stream)
+    if len(session.turn_stats) > n_turns:
+        print(colorize(format_turn_stats(session.turn_stats[-1]), "\033[2m", session.config.color))
+
+
+def watch_jobs(session: ChatSession):
+    """Announce finished background jobs; their results join the next turn."""
+    def announce(job):
+        print(colorize(
+            f"\n[job {job.id}] {job.tool} {job.status}; the assistant will see the result with your next message.",
+            "\033[33m", session.config.color,
+        ))
+    session.add_job_listener(announce)
+
+
+def repl(session: ChatSession, stream: bool = True):
+    watch_jobs(session)
+    print(colorize("Type /exit to quit, /save to persist, /new to reset, /model <name> to switch model, /stats for latency stats.", "\033[33m", session.config.color))
     while True:
         try:
             prompt = input(colorize("you> ", "\033[32m", session.config.color))
@@ -55,14 +127,15 @@ def repl(session: ChatSession):
             if prompt.strip() == '/exit':
                 break
             if prompt.strip() == '/save':
-                path = save_history(session.history)
-                print(f"Saved to {path}")
+                path, appended = save_session(session)
+                print(f"Saved to {path} (+{appended} messages)")
+                continue
+            if prompt.strip() == '/stats':
+                print(format_session_stats(session.turn_stats))
                 continue
             if prompt.strip() == '/new':
                 model = session.config.model
-                session.history.clear()
-                if session.config.system_prompt:
-                    session.history.append({"role": "system", "content": session.config.system_prompt})
+                session.reset()
                 print("Started new session (model remains: %s)" % model)
                 continue
             if prompt.startswith('/model'):
@@ -76,10 +149,11 @@ def repl(session: ChatSession):
                 continue
             print("Unknown command.")
             continue
-        session.complete(prompt)
+        _complete_turn(session, prompt, stream)
 
 
-def repl_multiline(session: ChatSession):
+def repl_multiline(session: ChatSession, stream: bool = True):
+    watch_jobs(session)
     print(colorize("Multiline mode. End input with empty line. /exit etc. still supported (single line).", "\033[33m", session.config.color))
     while True:
         try:
@@ -94,14 +168,15 @@ def repl_multiline(session: ChatSession):
             if first.strip() == '/exit':
                 break
             if first.strip() == '/save':
-                path = save_history(session.history)
-                print(f"Saved to {path}")
+                path, appended = save_session(session)
+                print(f"Saved to {path} (+{appended} messages)")
+                continue
+            if first.strip() == '/stats':
+                print(format_session_stats(session.turn_stats))
                 continue
             if first.strip() == '/new':
                 model = session.config.model
-                session.history.clear()
-                if session.config.system_prompt:
-                    session.history.append({"role": "system", "content": session.config.system_prompt})
+                session.reset()
                 print("Started new session (model remains: %s)" % model)
                 continue
             if first.startswith('/model'):
@@ -126,7 +201,7 @@ def repl_multiline(session: ChatSession):
                 break
             lines.append(line)
         content = "\n".join(lines)
-        session.complete(content)
+        _complete_turn(session, content, stream)
 
 
 # ------------------------- Test helper ---------------------------------------
@@ -135,17 +210,11 @@ def run_hello_test(config: AppConfig) -> int:
     """Perform a minimal API round-trip and print result.
     Returns exit code.
     """
-    print("Running API test (model=%s)..." % config.model)
+    print("Running API test...")
     try:
         session = ChatSession(config=config)
-        client = session.openai_client()
-        resp = client.chat.completions.create(
-            model=config.model,
-            messages=[{"role": "user", "content": "Say 'Hello world' exactly."}],
-            stream=False,
-        )
-        content = resp.choices[0].message.content.strip()
-        print("Assistant:", content)
+        content = session.one_shot("Say 'Hello world' exactly.", call_class=BACKGROUND).strip()
+        print(f"Assistant ({session.last_route.model} @ {session.last_route.base_url}):", content)
         if "hello world" in content.lower():
             print("[success] API test passed.")
             return 0
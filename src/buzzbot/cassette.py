@@ -0,0 +1,399 @@
+"""Record/replay of provider calls ("cassettes") for offline, deterministic runs.
+
+Enable with environment variables (see ``AppConfig``)::
+
+    BUZZBOT_CASSETTE=data/cassettes/bug-123.jsonl
+    BUZZBOT_CASSETTE_MODE=auto      # record | replay | auto (replay if the file exists)
+    BUZZBOT_CASSETTE_LATENCY=0      # replay timing: 0 = instant, 1 = original, 0.5 = 2x faster
+
+``ChatSession.openai_client()`` / ``google_client()`` then return wrappers
+that record every ``chat.completions.create`` call (blocking, streamed chunk by
+chunk, or failed) and every Veo3 ``generate_videos`` operation, or answer them
+from the cassette without touching the network. This covers ChatSession,
+PlotGenerator and generate_veo3_video, which all go through those clients.
+
+The cassette is JSONL, one interaction per line::
+
+    {"kind": "openai.chat", "key": ..., "request": {...}, "elapsed": 1.2,
+     "response": {...}}               # blocking completion
+     "chunks": [[0.31, {...}], ...]   # streamed completion (offset s, chunk)
+     "error": {"type": "RateLimitError", "status_code": 429, "message": ...}
+    {"kind": "veo3.video", "key": ..., "request": {...}, "elapsed": 65.0, "asset": "<sha>.mp4"}
+
+Interactions are matched by a hash of the request (tool and background job
+results excluded, see ``request_key``). Repeated identical requests (e.g. retries) replay in
+recorded order and cycle once exhausted, so a recorded conversation can be
+replayed in a loop for benchmarks. Recording appends to an existing file.
+Video bytes are stored once per content hash in ``<cassette>.assets/``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .jobs import RESULT_PREFIX
+from .messages import WireView, json_default
+
+try:
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+except ImportError:  # pragma: no cover
+    ChatCompletion = ChatCompletionChunk = None  # type: ignore
+
+RECORD, REPLAY, AUTO = "record", "replay", "auto"
+
+OPENAI_CHAT = "openai.chat"
+VEO3_VIDEO = "veo3.video"
+
+
+class CassetteMissError(RuntimeError):
+    """Replay found no recorded interaction for a request."""
+
+
+class ReplayedAPIError(Exception):
+    """A provider error re-raised from a cassette.
+
+    Subclasses are created on the fly with the recorded exception's class name
+    so ``resilience.classify_error`` treats them exactly like the original.
+    """
+
+    status_code: Optional[int] = None
+
+
+_error_types: Dict[str, type] = {}
+
+
+def _replayed_error(info: Dict[str, Any]) -> Exception:
+    name = info.get("type") or "ReplayedAPIError"
+    cls = _error_types.get(name)
+    if cls is None:
+        cls = _error_types.setdefault(name, type(name, (ReplayedAPIError,), {}))
+    exc = cls(info.get("message", ""))
+    exc.status_code = info.get("status_code")
+    return exc
+
+
+def _error_info(exc: BaseException) -> Dict[str, Any]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return {
+        "type": type(exc).__name__,
+        "status_code": code if isinstance(code, int) else None,
+        "message": str(exc),
+    }
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, WireView):
+        return list(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    try:
+        return json_default(obj)
+    except TypeError:
+        return repr(obj)
+
+
+def _plain(obj: Any) -> Any:
+    """JSON-compatible deep copy of a request / response object."""
+    return json.loads(json.dumps(obj, default=_default))
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    """Stable hash of a request. Results of local tools (dice rolls, video
+    URLs with timestamps) differ from run to run, so tool message contents are
+    left out of the key, as are background job results (random job id)."""
+    messages = request.get("messages")
+    if messages:
+        request = dict(request)
+        request["messages"] = [{**m, "content": None} if _volatile(m) else m for m in messages]
+    canonical = json.dumps([kind, request], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+def _volatile(message: Dict[str, Any]) -> bool:
+    if message.get("role") == "tool":
+        return True
+    content = message.get("content")
+    return message.get("role") == "system" and isinstance(content, str) and content.startswith(RESULT_PREFIX)
+
+
+def _namespace(data: Any) -> Any:
+    if isinstance(data, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in data.items()})
+    if isinstance(data, list):
+        return [_namespace(v) for v in data]
+    return data
+
+
+def _completion(data: Dict[str, Any]) -> Any:
+    if ChatCompletion is not None:
+        return ChatCompletion.model_validate(data)
+    return _namespace(data)
+
+
+def _chunk(data: Dict[str, Any]) -> Any:
+    if ChatCompletionChunk is not None:
+        return ChatCompletionChunk.model_validate(data)
+    return _namespace(data)
+
+
+class Cassette:
+    """One cassette file, shared by every client of the process (thread-safe)."""
+
+    def __init__(self, path: Path, mode: str = AUTO, latency: float = 0.0):
+        self.path = Path(path)
+        if mode == AUTO:
+            mode = REPLAY if self.path.exists() else RECORD
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"unknown cassette mode: {mode!r}")
+        self.mode = mode
+        self.latency = max(0.0, float(latency))
+        self.assets_dir = self.path.with_name(self.path.name + ".assets")
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        if mode == REPLAY:
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self):
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                self._by_key.setdefault(rec["key"], []).append(rec)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._by_key.values())
+
+    # Recording -------------------------------------------------------------
+    def record(self, interaction: Dict[str, Any]):
+        line = json.dumps(interaction, ensure_ascii=False, default=_default)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def store_asset(self, src: Path, suffix: str = "") -> str:
+        """Copy a file into the assets dir (content-addressed); returns its name."""
+        digest = hashlib.sha256()
+        with Path(src).open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        name = digest.hexdigest()[:32] + suffix
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        dst = self.assets_dir / name
+        if not dst.exists():
+            shutil.copyfile(src, dst)
+        return name
+
+    # Replay ----------------------------------------------------------------
+    def next(self, kind: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            recs = self._by_key.get(key)
+            if not recs:
+                raise CassetteMissError(
+                    f"no recorded {kind} interaction for this request in {self.path} "
+                    f"(key {key}); re-record with BUZZBOT_CASSETTE_MODE=record"
+                )
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return recs[i % len(recs)]
+
+    def wait(self, seconds: float):
+        if self.latency and seconds > 0:
+            time.sleep(seconds * self.latency)
+
+
+_cassettes: Dict[Tuple[str, str], Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(config: Any) -> Optional[Cassette]:
+    """The process-wide cassette configured by config, or None."""
+    path = getattr(config, "cassette", None)
+    if not path:
+        return None
+    mode = getattr(config, "cassette_mode", AUTO)
+    key = (str(Path(path).resolve()), mode)
+    with _cassettes_lock:
+        cassette = _cassettes.get(key)
+        if cassette is None:
+            cassette = _cassettes[key] = Cassette(
+                Path(path), mode, getattr(config, "cassette_latency", 0.0)
+            )
+        return cassette
+
+
+# OpenAI -----------------------------------------------------------------------
+class _Completions:
+    def __init__(self, cassette: Cassette, real: Any):
+        self._cassette = cassette
+        self._real = real
+
+    def create(self, **kwargs: Any) -> Any:
+        # The timeout is what is left of the retry deadline: not part of the request
+        request = _plain({k: v for k, v in kwargs.items() if k != "timeout"})
+        key = request_key(OPENAI_CHAT, request)
+        if self._cassette.replaying:
+            return self._replay(key)
+        base = {"kind": OPENAI_CHAT, "key": key, "request": request}
+        t0 = time.perf_counter()
+        try:
+            resp = self._real.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._cassette.record({**base, "elapsed": time.perf_counter() - t0, "error": _error_info(e)})
+            raise
+        if kwargs.get("stream"):
+            return self._record_stream(resp, base, t0)
+        self._cassette.record({**base, "elapsed": time.perf_counter() - t0, "response": _plain(resp)})
+        return resp
+
+    def _record_stream(self, stream: Any, base: Dict[str, Any], t0: float) -> Iterator[Any]:
+        chunks: List[Any] = []
+        rec = {**base, "chunks": chunks}
+        try:
+            for chunk in stream:
+                chunks.append([round(time.perf_counter() - t0, 4), _plain(chunk)])
+                yield chunk
+        except Exception as e:
+            rec["error"] = _error_info(e)
+            raise
+        finally:
+            rec["elapsed"] = time.perf_counter() - t0
+            self._cassette.record(rec)
+
+    def _replay(self, key: str) -> Any:
+        rec = self._cassette.next(OPENAI_CHAT, key)
+        if "chunks" in rec:
+            return self._replay_stream(rec)
+        self._cassette.wait(rec.get("elapsed", 0.0))
+        if "error" in rec:
+            raise _replayed_error(rec["error"])
+        return _completion(rec["response"])
+
+    def _replay_stream(self, rec: Dict[str, Any]) -> Iterator[Any]:
+        prev = 0.0
+        for offset, data in rec["chunks"]:
+            self._cassette.wait(offset - prev)
+            prev = offset
+            yield _chunk(data)
+        if "error" in rec:
+            raise _replayed_error(rec["error"])
+
+
+class CassetteOpenAI:
+    """Stands in for ``openai.OpenAI``; real is None when replaying."""
+
+    def __init__(self, cassette: Cassette, real: Any = None):
+        self._real = real
+        self.chat = SimpleNamespace(completions=_Completions(cassette, real))
+
+    def __getattr__(self, name: str) -> Any:
+        if self._real is None:
+            raise AttributeError(f"{name!r} is not available in cassette replay")
+        return getattr(self._real, name)
+
+
+# Veo3 (google-genai) ----------------------------------------------------------
+class _RecordingVideo:
+    def __init__(self, owner: "_RecordingOperation", inner: Any):
+        self._owner = owner
+        self.inner = inner
+
+    def save(self, path: str):
+        self.inner.save(path)
+        self._owner.saved(Path(path))
+
+
+class _RecordingOperation:
+    """Wraps a live long-running operation; records it once its video is saved."""
+
+    def __init__(self, cassette: Cassette, inner: Any, base: Dict[str, Any], t0: float):
+        self._cassette = cassette
+        self.inner = inner
+        self._base = base
+        self._t0 = t0
+
+    @property
+    def done(self) -> bool:
+        return getattr(self.inner, "done", True)
+
+    @property
+    def response(self) -> Any:
+        videos = [
+            SimpleNamespace(video=_RecordingVideo(self, gv.video))
+            for gv in self.inner.response.generated_videos
+        ]
+        return SimpleNamespace(generated_videos=videos)
+
+    def saved(self, path: Path):
+        asset = self._cassette.store_asset(path, path.suffix)
+        self._cassette.record({**self._base, "elapsed": time.perf_counter() - self._t0, "asset": asset})
+
+
+class _ReplayVideo:
+    def __init__(self, asset: Path):
+        self.asset = asset
+
+    def save(self, path: str):
+        shutil.copyfile(self.asset, path)
+
+
+class CassetteGenai:
+    """Stands in for ``genai.Client`` in generate_veo3_video; real is None when replaying."""
+
+    # Replay needs neither the SDK nor an API key
+    requires_sdk = False
+
+    def __init__(self, cassette: Cassette, real: Any = None):
+        self._cassette = cassette
+        self._real = real
+        self.models = SimpleNamespace(generate_videos=self._generate_videos)
+        self.operations = SimpleNamespace(get=self._get_operation)
+        self.files = SimpleNamespace(download=self._download)
+
+    def _generate_videos(self, model: str, prompt: str, config: Any = None) -> Any:
+        request = _plain({"model": model, "prompt": prompt, "config": config})
+        key = request_key(VEO3_VIDEO, request)
+        if self._cassette.replaying:
+            rec = self._cassette.next(VEO3_VIDEO, key)
+            self._cassette.wait(rec.get("elapsed", 0.0))
+            if "error" in rec:
+                raise _replayed_error(rec["error"])
+            video = _ReplayVideo(self._cassette.assets_dir / rec["asset"])
+            return SimpleNamespace(done=True, response=SimpleNamespace(generated_videos=[SimpleNamespace(video=video)]))
+        base = {"kind": VEO3_VIDEO, "key": key, "request": request}
+        t0 = time.perf_counter()
+        try:
+            op = self._real.models.generate_videos(model=model, prompt=prompt, config=config)
+        except Exception as e:
+            self._cassette.record({**base, "elapsed": time.perf_counter() - t0, "error": _error_info(e)})
+            raise
+        return _RecordingOperation(self._cassette, op, base, t0)
+
+    def _get_operation(self, op: Any) -> Any:
+        if isinstance(op, _RecordingOperation):
+            op.inner = self._real.operations.get(op.inner)
+            return op
+        if self._real is None:
+            return op
+        return self._real.operations.get(op)
+
+    def _download(self, file: Any) -> Any:
+        if self._real is None:
+            return None
+        return self._real.files.download(file=getattr(file, "inner", file))
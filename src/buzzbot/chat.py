@@ -3,10 +3,22 @@ from multiprocessing.util import DEBUG
 import sys
 import os
 import random
-from typing import List, Dict, Optional, Callable, Any, cast
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Deque, Optional, Callable, Any, cast
 
+from . import metrics
+from .cassette import CassetteGenai, CassetteOpenAI, get_cassette
 from .config import AppConfig
-from .io_utils import print_message, format_prefix
+from .io_utils import print_message, print_token, format_prefix
+from .jobs import RESULT_PREFIX, Job, jobs
+from .messages import MessageStore, WireView
+from .resilience import RetryPolicy, CircuitOpenError, classify_error, get_breaker, call_with_retry, FATAL
+from .router import BACKGROUND, INTERACTIVE, TOOL_FOLLOWUP, Route, get_router
+from .tools import registry as tool_registry, tool
 from .veo3 import generate_veo3_video
 
 Message = Dict[str, Any]
@@ -27,6 +39,7 @@ except ImportError:  # pragma: no cover
 
 
 
+@tool(description="Return a random integer between 1 and 6 inclusive (simulate rolling a D6)")
 def get_random_D6_dice_value() -> int:
     """
     Just a simple function to simulate rolling a D6 die.
@@ -38,30 +51,148 @@ def get_random_D6_dice_value() -> int:
     return random.randint(1, 6)
 
 
+@tool(
+    name="generate_veo3_video",
+    description="Generate a short video with Google's Veo3 model. Provide a rich textual description and optional negative keywords list to avoid styles.",
+    params={
+        "description": "Main scene / action description",
+        "negative_keywords": {
+            "description": "List of style/content keywords to avoid (what not to include in the video) to further guide the model if necessary.",
+            "default": [],
+        },
+    },
+    # generate_veo3_video polls for up to 10 minutes: run it as a background job
+    timeout=660.0,
+    cost=1.0,
+    deferred=True,
+)
+def veo3_video_tool(session: "ChatSession", description: str, negative_keywords: Optional[List[str]] = None) -> str:
+    try:
+        client = session.google_client()
+    except Exception as e:
+        return f"<error: {e}>"
+    return generate_veo3_video(
+        client, description=description, negative_keywords=negative_keywords or []
+    )
+
+
 class ChatSession:
     def __init__(self, config: AppConfig, history: Optional[List[Message]] = None):
         self.config = config
-        self.history: List[Message] = history or []
+        self.history = MessageStore(history)
         if config.system_prompt and not any(
             m.get("role") == "system" for m in self.history
         ):
             self.history.insert(0, {"role": "system", "content": config.system_prompt})
-        self._openai_client = None  # renamed from _client
+        # Every history entry carries a monotonically increasing integer "id",
+        # used as a cursor by the paginated / delta history API.
+        ids = [m.get("id") for m in self.history]
+        if not all(isinstance(i, int) for i in ids) or any(
+            a >= b for a, b in zip(ids, ids[1:])
+        ):
+            # Legacy histories (JSONL files, DB restore) carry no ids: renumber
+            for i, m in enumerate(self.history, start=1):
+                m["id"] = i
+        self._next_id = self.history[-1]["id"] + 1 if self.history else 1
+        # Print replies to the terminal (off for batch / server use)
+        self.echo = True
+        # Per-turn latency stats: ttft / total seconds, tokens, tokens_per_s
+        self.turn_stats: List[Dict[str, Any]] = []
+        self._turn: Dict[str, Any] = {"ttft": None, "tokens": 0}
+        # Deferred tools (jobs.py): running jobs, and finished ones whose
+        # result has not been added to the history yet. Both are updated
+        # from the job worker threads, so only touch them under _jobs_lock.
+        self.defer_tools = config.defer_tools
+        self._jobs_lock = threading.Lock()
+        self.pending_jobs: Dict[str, Job] = {}
+        self._job_results: Deque[Job] = deque()
+        self._job_listeners: List[Callable[[Job], None]] = []
+        self._openai_clients: Dict[tuple, Any] = {}  # per (base_url, api key env)
+        # Route that served the last provider call (router.py)
+        self.last_route: Optional[Route] = None
         self._google_client = None
 
-    def openai_client(self):
-        if self._openai_client is None:
+    def openai_client(self, route: Optional[Route] = None):
+        """Client for a route's endpoint (default: the session's base_url)."""
+        route = (route or Route()).resolve(self.config)
+        key = (route.base_url, route.api_key_env)
+        client = self._openai_clients.get(key)
+        if client is None:
+            cassette = get_cassette(self.config)
+            if cassette is not None and cassette.replaying:
+                client = self._openai_clients[key] = CassetteOpenAI(cassette)
+                return client
             if OpenAI is None:
                 raise RuntimeError(
                     "openai library not installed. Run: pip install openai"
                 )
-            self._openai_client = OpenAI(
-                api_key=self.config.openai_api_key, base_url=self.config.base_url
+            # Retries are handled by _create_completion (resilience.py), not the SDK
+            client = OpenAI(
+                api_key=route.api_key(self.config),
+                base_url=route.base_url,
+                max_retries=0,
             )
-        return self._openai_client
+            if cassette is not None:
+                client = CassetteOpenAI(cassette, client)
+            self._openai_clients[key] = client
+        return client
+
+    def _create_completion(self, call_class: str, **kwargs):
+        """chat.completions.create for a call class (router.py). Each candidate
+        route runs under its own retry policy and circuit breaker; when one
+        still fails with a retryable error the next route is tried. One
+        retry deadline covers all routes, and each request's timeout is what
+        is left of it."""
+        cfg = self.config
+        router = get_router(cfg)
+        policy = RetryPolicy(
+            max_attempts=cfg.retry_max_attempts, deadline=cfg.retry_deadline
+        )
+        last_error: Optional[Exception] = None
+        deadline_start = time.monotonic()
+        for route in router.candidates(call_class, cfg):
+            if last_error is not None and time.monotonic() - deadline_start >= policy.deadline:
+                break
+            client = self.openai_client(route)
+            breaker = get_breaker(
+                route.base_url, route.model, cfg.breaker_threshold, cfg.breaker_reset
+            )
+            start = time.perf_counter()
+            try:
+                resp = call_with_retry(
+                    lambda timeout: client.chat.completions.create(
+                        model=route.model, timeout=timeout, **kwargs
+                    ),
+                    policy,
+                    breaker,
+                    start=deadline_start,
+                )
+            except Exception as e:
+                if classify_error(e) == FATAL and not isinstance(e, CircuitOpenError):
+                    raise
+                router.record(route, None, ok=False, call_class=call_class)
+                last_error = e
+                continue
+            router.record(route, time.perf_counter() - start, ok=True, call_class=call_class)
+            self.last_route = route
+            return resp
+        assert last_error is not None
+        raise last_error
+
+    def one_shot(self, prompt: str, call_class: str = BACKGROUND, **kwargs: Any) -> str:
+        """A single completion outside the conversation (titles, ideation);
+        the session history is not touched."""
+        resp = self._create_completion(
+            call_class, messages=[{"role": "user", "content": prompt}], **kwargs
+        )
+        return resp.choices[0].message.content or ""
 
     def google_client(self):
         if self._google_client is None:
+            cassette = get_cassette(self.config)
+            if cassette is not None and cassette.replaying:
+                self._google_client = CassetteGenai(cassette)
+                return self._google_client
             if genai is None:
                 raise RuntimeError(
                     "google-genai not installed. Run: pip install google-genai"
@@ -72,211 +203,295 @@ class ChatSession:
             if not api_key:
                 raise RuntimeError("Missing GOOGLE_API_KEY for Veo3 tool.")
             self._google_client = genai.Client(api_key=api_key)
+            if cassette is not None:
+                self._google_client = CassetteGenai(cassette, self._google_client)
         return self._google_client
 
     def switch_model(self, new_model: str):
         self.config.switch_model(new_model)
 
-    # Tool specs for OpenAI (JSON schema w/out params) -----------------------
-    def _tool_specs(self):
-        base = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_random_D6_dice_value",
-                    "description": "Return a random integer between 1 and 6 inclusive (simulate rolling a D6)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "additionalProperties": False,
-                    },
-                },
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_veo3_video",
-                    "description": "Generate a short video with Google's Veo3 model. Provide a rich textual description and optional negative keywords list to avoid styles.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "description": {
-                                "type": "string",
-                                "description": "Main scene / action description",
-                            },
-                            "negative_keywords": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "List of style/content keywords to avoid (what not to include in the video) to further guide the model if necessary.",
-                                "default": [],
-                            },
-                        },
-                        "required": ["description"],
-                        "additionalProperties": False,
-                    },
-                },
-            },
-        ]
-        return base
+    # History helpers ---------------------------------------------------------
+    def add_message(self, msg: Message) -> Message:
+        """Append msg to the history, stamping it with the next message id.
+        Returns the stored (compact) record."""
+        msg["id"] = self._next_id
+        self._next_id += 1
+        self.history.append(msg)
+        return self.history[-1]
 
-    def _tool_dispatch(self, name: str, arguments: str) -> str:
-        # Dispatch simple functions
-        funcs: Dict[str, Callable[[], Any]] = {
-            "get_random_D6_dice_value": get_random_D6_dice_value,
-            "generate_veo3_video": lambda args=arguments: self._dispatch_generate_veo3_video(
-                args
-            ),
-        }
+    def reset(self):
+        """Clear the conversation (keeping the system prompt). Ids keep
+        increasing so cursors handed out before the reset stay unambiguous."""
+        self.history.clear()
+        if self.config.system_prompt:
+            self.add_message({"role": "system", "content": self.config.system_prompt})
 
-        fn = funcs.get(name)
-        if not fn:
-            return f"<error: unknown function {name}>"
-        try:
-            return str(fn())
-        except Exception as e:  # pragma: no cover
-            return f"<error executing {name}: {e}>"
+    @property
+    def last_id(self) -> int:
+        return self.history[-1]["id"] if self.history else 0
 
-    def _dispatch_generate_veo3_video(self, arguments: str) -> str:
-        import json
+    def history_page(
+        self,
+        since: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> tuple[List[Message], bool]:
+        """Return (messages, has_more) for a cursor window, oldest first.
 
-        try:
-            data = json.loads(arguments or "{}")
-        except Exception:
-            data = {}
-        description = data.get("description", "")
-        negative_keywords = data.get("negative_keywords", []) or []
-        try:
-            client = self.google_client()
-        except Exception as e:
-            return f"<error: {e}>"
-        return generate_veo3_video(
-            client, description=description, negative_keywords=negative_keywords
-        )
+        since: messages with id > since (paging forward from the oldest).
+        before: messages with id < before (paging backward, newest page first).
+        has_more tells whether messages remain past the page in the paging
+        direction.
+        """
+        lo, hi = 0, len(self.history)
+        if since is not None:
+            lo = bisect_right(self.history, since, key=lambda m: m["id"])
+        if before is not None:
+            hi = bisect_left(self.history, before, key=lambda m: m["id"], lo=lo)
+        if limit is None or hi - lo <= limit:
+            return self.history[lo:hi], False
+        if before is not None and since is None:
+            return self.history[hi - limit:hi], True
+        return self.history[lo:lo + limit], True
 
-    def _dispatch_generate_veo3_video(self, arguments: str) -> str:
-        import json
+    # Tools (see tools.py) ----------------------------------------------------
+    def _tool_specs(self) -> List[Dict[str, Any]]:
+        # Built once per registry change, shared by every session
+        return tool_registry.specs()
 
-        try:
-            data = json.loads(arguments or "{}")
-        except Exception:
-            data = {}
-        description = data.get("description", "")
-        negative_keywords = data.get("negative_keywords", []) or []
-        try:
-            client = self.google_client()
-        except Exception as e:
-            return f"<error: {e}>"
-        return generate_veo3_video(
-            client, description=description, negative_keywords=negative_keywords
+    def _tool_dispatch(self, name: str, arguments: str) -> str:
+        t = tool_registry.get(name)
+        if t is not None and t.deferred and self.defer_tools:
+            return self._start_job(name, arguments)
+        return tool_registry.call(name, arguments, session=self)
+
+    # Deferred tools ------------------------------------------------------------
+    def add_job_listener(self, fn: Callable[[Job], None]):
+        """fn(job) is called from the worker thread when a job of this session ends."""
+        self._job_listeners.append(fn)
+
+    def _start_job(self, name: str, arguments: str) -> str:
+        error = tool_registry.check(name, arguments)
+        if error:
+            return error
+        with self._jobs_lock:
+            # Held across submit so a fast job cannot finish before it is listed
+            job = jobs.submit(
+                name,
+                lambda: tool_registry.call(name, arguments, session=self),
+                arguments=arguments,
+                on_done=self._job_finished,
+            )
+            self.pending_jobs[job.id] = job
+        return (
+            f"<pending: background job {job.id} started for {name}. Its result will be "
+            f"added to this conversation when it finishes; tell the user it is in progress.>"
         )
 
-    def _convert_history(self) -> List[Dict[str, Any]]:
-        converted: List[Dict[str, Any]] = []
-        for m in self.history:
-            role = m.get("role")
-            if role == "tool":
-                converted.append(
-                    {
-                        "role": "tool",
-                        "content": m.get("content", ""),
-                        "tool_call_id": m.get("tool_call_id"),
-                    }
-                )
-            elif role == "assistant" and m.get("tool_calls"):
-                # Preserve tool_calls structure
-                converted.append(
-                    {
-                        "role": "assistant",
-                        "content": m.get("content", ""),
-                        "tool_calls": m.get("tool_calls"),
-                    }
-                )
-            else:
-                converted.append({"role": role, "content": m.get("content", "")})
-        return converted
+    def _job_finished(self, job: Job):
+        with self._jobs_lock:
+            self.pending_jobs.pop(job.id, None)
+            self._job_results.append(job)
+        for fn in list(self._job_listeners):
+            fn(job)
+
+    def running_jobs(self) -> List[Job]:
+        """Snapshot of the jobs still running (pending_jobs changes under you)."""
+        with self._jobs_lock:
+            return list(self.pending_jobs.values())
 
-    # Core completion with tool loop; final response prints (streamless for tool phase)
-    def complete(self, user_content: str) -> Message:
+    def deliver_job_results(self) -> List[Message]:
+        """Add the results of finished jobs to the history as system messages.
+        Call with the session lock held (complete() does so on its own)."""
+        with self._jobs_lock:
+            finished = list(self._job_results)
+            self._job_results.clear()
+        added = []
+        for job in finished:
+            verb = "finished" if job.status == "done" else "failed"
+            added.append(self.add_message({
+                "role": "system",
+                "content": f"{RESULT_PREFIX}{job.id} ({job.tool}) {verb}: {job.result}",
+            }))
+        return added
+
+    def _run_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """Results of a round's tool calls, in order; run concurrently when
+        there are several and every tool is marked parallel_safe."""
+        calls = [(tc["function"]["name"] or "<unknown>", tc["function"]["arguments"] or "{}") for tc in tool_calls]
+        if len(calls) > 1 and tool_registry.parallel_safe([name for name, _ in calls]):
+            with ThreadPoolExecutor(max_workers=min(len(calls), 8)) as pool:
+                return list(pool.map(lambda c: self._tool_dispatch(*c), calls))
+        return [self._tool_dispatch(name, args) for name, args in calls]
+
+    def _convert_history(self) -> WireView:
+        # Built lazily from the compact records; nothing is copied up front
+        return self.history.wire()
+
+    # Core completion with tool loop. With stream=True, assistant text is printed
+    # token by token as it arrives (tool-call rounds included); otherwise the
+    # final reply is printed once complete.
+    def complete(self, user_content: str, stream: bool = False, call_class: str = INTERACTIVE) -> Message:
+        # Results of jobs that finished since the last turn go first
+        self.deliver_job_results()
         user_msg: Message = {"role": "user", "content": user_content}
-        self.history.append(user_msg)
-        client = self.openai_client()
+        self.add_message(user_msg)
+        return self._run_turn(stream, call_class)
+
+    def continue_turn(self, stream: bool = False) -> Message:
+        """Let the assistant respond without a new user message, e.g. to job
+        results just added by deliver_job_results()."""
+        return self._run_turn(stream, TOOL_FOLLOWUP)
+
+    def _run_turn(self, stream: bool, call_class: str) -> Message:
+        turn_start = time.perf_counter()
+        self._turn = {"ttft": None, "tokens": 0}
         tools = self._tool_specs()
 
-        # Tool-call loop (non-streaming to inspect tool_calls)
         while True:
             try:
-                msgs = self._convert_history()
-                resp = client.chat.completions.create(  # type: ignore[arg-type]
-                    model=self.config.model,
-                    messages=msgs,  # type: ignore[arg-type]
-                    tools=tools,  # type: ignore[arg-type]
-                    tool_choice="auto",
-                )
+                round_ = self._stream_round if stream else self._blocking_round
+                content, tool_calls = round_(call_class, tools, turn_start)
             except Exception as e:
-                print(
-                    f"[warn] Tool-call phase failed ({e}); falling back to simple completion.",
-                    file=sys.stderr,
-                )
-                return self._fallback_completion(client)
+                # Only a request the provider rejected (e.g. tools unsupported) is
+                # worth repeating without tools; timeouts, outages and rate limits
+                # were already retried and would just fail a second time.
+                if classify_error(e) == FATAL and getattr(e, "status_code", None) in (400, 404, 422):
+                    print(
+                        f"[warn] Tool-call phase rejected ({e}); falling back to simple completion.",
+                        file=sys.stderr,
+                    )
+                    return self._fallback_completion(call_class, turn_start)
+                return self._error_reply(e)
 
-            choice = resp.choices[0]
-            msg = choice.message
-            if msg.tool_calls:
+            if tool_calls:
                 # Append the assistant tool-call message FIRST per API requirements
-                assistant_call_msg: Message = {
-                    "role": "assistant",
-                    "content": msg.content or "",
-                    "tool_calls": [
+                self.add_message(
+                    {"role": "assistant", "content": content, "tool_calls": tool_calls}
+                )
+                # Now execute the function tool calls and append tool messages
+                for tc, result in zip(tool_calls, self._run_tool_calls(tool_calls)):
+                    self.add_message(
                         {
-                            "id": tc.id,
-                            "type": tc.type,
-                            "function": {
-                                "name": getattr(tc.function, "name", ""),
-                                "arguments": getattr(tc.function, "arguments", ""),
-                            },
+                            "role": "tool",
+                            "tool_call_id": tc["id"],
+                            "name": tc["function"]["name"] or "<unknown>",
+                            "content": result,
                         }
-                        for tc in msg.tool_calls
-                        if getattr(tc, "type", None) == "function"
-                    ],
-                }
-                self.history.append(assistant_call_msg)
-
-                # Now execute each function tool call and append tool messages
-                for tc in msg.tool_calls:
-                    fn_obj = getattr(tc, "function", None)
-                    if fn_obj and getattr(tc, "type", None) == "function":
-                        fn_name = getattr(fn_obj, "name", "<unknown>")
-                        fn_args = getattr(fn_obj, "arguments", "{}")
-                        result = self._tool_dispatch(fn_name, fn_args)  # type: ignore[arg-type]
-                        self.history.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": getattr(tc, "id", None),
-                                "name": fn_name,
-                                "content": result,
-                            }
-                        )
+                    )
                 # Loop again so model can use tool outputs
+                if call_class == INTERACTIVE:
+                    call_class = TOOL_FOLLOWUP
                 continue
-            assistant_msg: Message = {"role": "assistant", "content": msg.content or ""}
-            self.history.append(assistant_msg)
-            print_message(assistant_msg, self.config.color)
+            assistant_msg = self.add_message({"role": "assistant", "content": content})
+            if self.echo and not stream:
+                print_message(assistant_msg, self.config.color)
+            self._record_turn(turn_start)
             return assistant_msg
 
+    def _blocking_round(self, call_class: str, tools, turn_start: float):
+        """One non-streaming request; returns (content, function tool calls)."""
+        resp = self._create_completion(
+            call_class,
+            messages=self._convert_history(),
+            tools=tools,
+            tool_choice="auto",
+        )
+        msg = resp.choices[0].message
+        usage = getattr(resp, "usage", None)
+        self._turn["tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        if msg.content and self._turn["ttft"] is None:
+            self._turn["ttft"] = time.perf_counter() - turn_start
+        tool_calls = [
+            {
+                "id": tc.id,
+                "type": tc.type,
+                "function": {
+                    "name": getattr(tc.function, "name", ""),
+                    "arguments": getattr(tc.function, "arguments", ""),
+                },
+            }
+            for tc in (msg.tool_calls or [])
+            if getattr(tc, "type", None) == "function"
+        ]
+        return msg.content or "", tool_calls
+
+    def _stream_round(self, call_class: str, tools, turn_start: float):
+        """One streaming request, printing content deltas as they arrive and
+        reassembling tool-call deltas; returns (content, function tool calls)."""
+        chunks = self._create_completion(
+            call_class,
+            messages=self._convert_history(),
+            tools=tools,
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts: List[str] = []
+        calls: Dict[int, Dict[str, Any]] = {}
+        usage_tokens = 0
+        try:
+            for chunk in chunks:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    usage_tokens += getattr(usage, "completion_tokens", 0) or 0
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    if not parts:
+                        if self._turn["ttft"] is None:
+                            self._turn["ttft"] = time.perf_counter() - turn_start
+                        print_message({"role": "assistant"}, self.config.color, stream=True)
+                    print_token(delta.content)
+                    parts.append(delta.content)
+                for tcd in getattr(delta, "tool_calls", None) or []:
+                    entry = calls.setdefault(
+                        tcd.index,
+                        {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+                    )
+                    if tcd.id:
+                        entry["id"] = tcd.id
+                    fn = getattr(tcd, "function", None)
+                    if fn is not None:
+                        entry["function"]["name"] += fn.name or ""
+                        entry["function"]["arguments"] += fn.arguments or ""
+        finally:
+            if parts:
+                print()  # end the streamed line
+        # Without usage info, one content delta is roughly one token
+        self._turn["tokens"] += usage_tokens or len(parts)
+        return "".join(parts), [calls[i] for i in sorted(calls)]
+
+    def _record_turn(self, turn_start: float):
+        total = time.perf_counter() - turn_start
+        ttft = self._turn["ttft"] if self._turn["ttft"] is not None else total
+        tokens = self._turn["tokens"]
+        gen_time = total - ttft
+        stats = {
+            "ttft": ttft,
+            "total": total,
+            "tokens": tokens,
+            "tokens_per_s": tokens / gen_time if gen_time > 0 else None,
+        }
+        self.turn_stats.append(stats)
+        metrics.observe("chat_ttft_seconds", ttft, model=self.config.model)
+        metrics.observe("chat_turn_seconds", total, model=self.config.model)
+
     # Fallback simple non-streaming
-    def _fallback_completion(self, client) -> Message:
-        assistant_msg: Message = {"role": "assistant", "content": ""}
+    def _fallback_completion(self, call_class: str, turn_start: float) -> Message:
         try:
-            resp = client.chat.completions.create(  # type: ignore[arg-type]
-                model=self.config.model,
-                messages=self._convert_history(),  # type: ignore[arg-type]
+            resp = self._create_completion(call_class, messages=self._convert_history())
+            assistant_msg = self.add_message(
+                {"role": "assistant", "content": resp.choices[0].message.content}
             )
-            assistant_msg["content"] = resp.choices[0].message.content
-            self.history.append(assistant_msg)
-            print_message(assistant_msg, self.config.color)
+            if self.echo:
+                print_message(assistant_msg, self.config.color)
+            self._record_turn(turn_start)
             return assistant_msg
         except Exception as e:
-            print(f"[error] Request failed: {e}", file=sys.stderr)
-            assistant_msg["content"] = f"<error: {e}>"
-            self.history.append(assistant_msg)
-            return assistant_msg
+            return self._error_reply(e)
+
+    def _error_reply(self, e: Exception) -> Message:
+        print(f"[error] Request failed: {e}", file=sys.stderr)
+        return self.add_message({"role": "assistant", "content": f"<error: {e}>"})
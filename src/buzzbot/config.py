@@ -44,15 +44,45 @@ class AppConfig:
     system_prompt: Optional[str] = None
     color: bool = True
     debug: bool = False
+    # Provider resilience (see resilience.py)
+    retry_max_attempts: int = 3
+    retry_deadline: float = 60.0
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+    # Session journal (see io_utils.SessionJournal)
+    journal_fsync: str = "interval"
+    journal_checkpoint_every: int = 64
+    # Provider record/replay (see cassette.py)
+    cassette: Optional[str] = None
+    cassette_mode: str = "auto"
+    cassette_latency: float = 0.0
+    # Deferred tools (see jobs.py): run long tools in the background and
+    # let the assistant follow up on their results without a user message
+    defer_tools: bool = True
+    job_auto_continue: bool = True
+    # Model routing per call class (see router.py)
+    routes_file: Optional[str] = None
+    background_model: Optional[str] = None
+    # Content daemon (see scheduler.py)
+    daemon_targets: str = "tiktok=3"
+    veo3_daily_quota: int = 10
+    publish_window: str = "9-22"
 
     @classmethod
     def load(cls) -> "AppConfig":
         _load_dotenv_once()
+        cassette = os.getenv("BUZZBOT_CASSETTE") or None
+        cassette_mode = os.getenv("BUZZBOT_CASSETTE_MODE", "auto").lower()
+        cassette_latency = float(os.getenv("BUZZBOT_CASSETTE_LATENCY", "0"))
+        # Replaying a cassette never reaches the providers: keys are optional
+        replay = bool(cassette) and (
+            cassette_mode == "replay" or (cassette_mode == "auto" and Path(cassette).exists())
+        )
         openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
+        if not openai_api_key and not replay:
             raise RuntimeError("Missing OPENAI_API_KEY environment variable.")
         google_api_key = os.getenv("GOOGLE_API_KEY")
-        if not google_api_key:
+        if not google_api_key and not replay:
             raise RuntimeError("Missing GOOGLE_API_KEY environment variable.")
         base_url = os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
         model = os.getenv("OPENAI_MODEL", DEFAULT_MODEL)
@@ -66,17 +96,50 @@ class AppConfig:
         global DEBUG
         DEBUG = debug
         print(f"NB: DEBUG mode is {'enabled' if debug else 'disabled'}.")
+
+        retry_max_attempts = int(os.getenv("BUZZBOT_RETRY_MAX_ATTEMPTS", "3"))
+        retry_deadline = float(os.getenv("BUZZBOT_RETRY_DEADLINE", "60"))
+        breaker_threshold = int(os.getenv("BUZZBOT_BREAKER_THRESHOLD", "5"))
+        breaker_reset = float(os.getenv("BUZZBOT_BREAKER_RESET", "30"))
+        journal_fsync = os.getenv("BUZZBOT_JOURNAL_FSYNC", "interval")
+        journal_checkpoint_every = int(os.getenv("BUZZBOT_JOURNAL_CHECKPOINT_EVERY", "64"))
+        defer_tools = os.getenv("BUZZBOT_DEFER_TOOLS", "1").lower() in ("1", "true", "yes", "on")
+        job_auto_continue = os.getenv("BUZZBOT_JOB_AUTO_CONTINUE", "1").lower() in ("1", "true", "yes", "on")
+        routes_file = os.getenv("BUZZBOT_ROUTES") or None
+        background_model = os.getenv("BUZZBOT_BACKGROUND_MODEL") or None
+        daemon_targets = os.getenv("BUZZBOT_DAEMON_TARGETS", "tiktok=3")
+        veo3_daily_quota = int(os.getenv("BUZZBOT_VEO3_DAILY_QUOTA", "10"))
+        publish_window = os.getenv("BUZZBOT_PUBLISH_WINDOW", "9-22")
         
         return cls(
-            openai_api_key=openai_api_key,
-            google_api_key=google_api_key,
+            openai_api_key=openai_api_key or "",
+            google_api_key=google_api_key or "",
             base_url=base_url,
             model=model,
             system_prompt=system_prompt,
             color=color,
-            debug=debug
+            debug=debug,
+            retry_max_attempts=retry_max_attempts,
+            retry_deadline=retry_deadline,
+            breaker_threshold=breaker_threshold,
+            breaker_reset=breaker_reset,
+            journal_fsync=journal_fsync,
+            journal_checkpoint_every=journal_checkpoint_every,
+            cassette=cassette,
+            cassette_mode=cassette_mode,
+            cassette_latency=cassette_latency,
+            defer_tools=defer_tools,
+            job_auto_continue=job_auto_continue,
+            routes_file=routes_file,
+            background_model=background_model,
+            daemon_targets=daemon_targets,
+            veo3_daily_quota=veo3_daily_quota,
+            publish_window=publish_window,
         )
 
+    def journal_options(self) -> dict:
+        return {"fsync": self.journal_fsync, "checkpoint_every": self.journal_checkpoint_every}
+
     def switch_model(self, new_model: str):
         self.model = new_model
 
@@ -1,10 +1,186 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional, Sequence, Set
+
 from buzzbot.chat import ChatSession
 from buzzbot.config import AppConfig
 from agents import set_default_openai_key
 from buzzbot.veo3 import generate_veo3_video
+from buzzbot.router import BACKGROUND
+from buzzbot import metrics
+from buzzbot.novelty import NoveltyIndex, get_index
+
+# Ideas containing any of these never reach Veo3 (policy rejections waste a run)
+BANNED_TERMS = (
+    "nsfw", "nude", "gore", "blood", "violence", "weapon", "gun", "celebrity",
+    "logo", "trademark", "disney", "marvel", "pokemon", "politic",
+)
+
+# Prompt length (words) Veo3 handles well for an 8s clip
+PROMPT_WORDS = (15, 80)
+TITLE_WORDS = (2, 12)
+
+# Word-set Jaccard similarity above which two ideas count as the same idea
+DUPLICATE_SIMILARITY = 0.6
+
+_WORD = re.compile(r"[a-z0-9']+")
+_LIST_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)]|#+)\s*")
+_LABEL = re.compile(r"^\s*\**\s*(title|prompt|description)\s*\**\s*[:\-–]\s*", re.I)
+
+
+@dataclass
+class PlotCandidate:
+    title: str
+    prompt: str
+    score: float = 0.0
+    rejected: Optional[str] = None  # reason, when the idea must not be rendered
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """The historical ``title\\nprompt`` form."""
+        return f"{self.title}\n{self.prompt}"
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD.findall(text.lower()))
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _clean(text: str) -> str:
+    text = _LABEL.sub("", _LIST_PREFIX.sub("", text)).strip()
+    return text.strip("\"'`*").strip()
+
+
+def _from_json(raw: str) -> Optional[List[PlotCandidate]]:
+    start, end = raw.find("["), raw.rfind("]")
+    if start < 0 or end <= start:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start < 0 or end <= start:
+            return None
+    try:
+        data: Any = json.loads(raw[start:end + 1])
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = next((v for v in data.values() if isinstance(v, list)), [data])
+    out: List[PlotCandidate] = []
+    for item in data if isinstance(data, list) else []:
+        if isinstance(item, dict):
+            lowered = {str(k).lower(): v for k, v in item.items()}
+            title = str(lowered.get("title") or "")
+            prompt = str(lowered.get("prompt") or lowered.get("description") or "")
+        elif isinstance(item, str) and "\n" in item.strip():
+            title, prompt = item.strip().split("\n", 1)
+        else:
+            continue
+        if title.strip() and prompt.strip():
+            out.append(PlotCandidate(_clean(title), _clean(prompt)))
+    return out
+
+
+def _from_lines(raw: str) -> List[PlotCandidate]:
+    """Fallback for plain text: "title\\nprompt" pairs, optionally numbered,
+    labelled ("Title: ...") or separated by blank lines."""
+    out: List[PlotCandidate] = []
+    title: Optional[str] = None
+    for line in raw.splitlines():
+        if not line.strip() or line.strip().startswith("```"):
+            continue
+        label = _LABEL.match(_LIST_PREFIX.sub("", line))
+        text = _clean(line)
+        if not text:
+            continue
+        if label and label.group(1).lower() == "title":
+            title = text
+        elif title is None:
+            title = text
+        else:
+            out.append(PlotCandidate(title, text))
+            title = None
+    return out
+
+
+def parse_candidates(raw: str) -> List[PlotCandidate]:
+    """Ideas from a model reply: a JSON list of {title, prompt} objects when the
+    model followed the instructions, else whatever "title\\nprompt" pairs the
+    text contains."""
+    parsed = _from_json(raw)
+    return parsed if parsed else _from_lines(raw)
+
+
+def _length_score(n: int, bounds: Sequence[int]) -> float:
+    lo, hi = bounds
+    if lo <= n <= hi:
+        return 1.0
+    off = lo - n if n < lo else n - hi
+    return max(0.0, 1.0 - off / lo)
+
+
+def score_candidates(
+    candidates: Iterable[PlotCandidate],
+    seen: Iterable[str] = (),
+    banned: Sequence[str] = BANNED_TERMS,
+) -> List[PlotCandidate]:
+    """Rank ideas best first. Each gets a 0..1 score from prompt/title length
+    and novelty (against ``seen`` and the better ideas of the same batch);
+    banned terms, empty fields and near-duplicates are marked ``rejected``
+    and sorted last."""
+    history = [_words(s) for s in seen]
+    # Terms match at word starts ("politic" catches "politics", "gun" not "begun")
+    banned_re = [(t, re.compile(r"\b" + re.escape(t))) for t in banned]
+    scored: List[PlotCandidate] = []
+    for c in candidates:
+        text = f"{c.title} {c.prompt}".lower()
+        hit = next((t for t, rx in banned_re if rx.search(text)), None)
+        prompt_words = len(c.prompt.split())
+        c.score = 0.5 * _length_score(prompt_words, PROMPT_WORDS) + 0.2 * _length_score(
+            len(c.title.split()), TITLE_WORDS
+        )
+        if hit:
+            c.rejected = f"banned term {hit!r}"
+        elif prompt_words < PROMPT_WORDS[0] // 2:
+            c.rejected = "prompt too short"
+        scored.append(c)
+
+    # Greedy: the best-scored idea of a near-duplicate group survives
+    kept: List[Set[str]] = list(history)
+    for c in sorted(scored, key=lambda c: (c.rejected is not None, -c.score)):
+        words = _words(f"{c.title} {c.prompt}")
+        nearest = max((_similarity(words, k) for k in kept), default=0.0)
+        c.score += 0.3 * (1.0 - nearest)
+        if c.rejected is None and nearest >= DUPLICATE_SIMILARITY:
+            c.rejected = f"near-duplicate ({nearest:.2f})"
+        if c.rejected is None:
+            kept.append(words)
+        c.notes.append(f"words={len(c.prompt.split())} novelty={1.0 - nearest:.2f}")
+    return sorted(scored, key=lambda c: (c.rejected is not None, -c.score))
+
 
 class PlotGenerator:
-    def __init__(self, session: ChatSession = None):
+    batch_prompt = (
+        "Give me {k} different, unique ideas for viral AI-generated videos of about 8s each. "
+        "Answer with only a JSON array of {k} objects with the keys \"title\" (a short title) "
+        "and \"prompt\" (a prompt for an AI video generation model, 20 to 60 words, "
+        "no real people, brands or violence), without any extra text."
+    )
+    # Completion budget per requested idea
+    tokens_per_idea = 120
+    # Fallback when every batched idea is rejected or the reply is not usable
+    single_prompt = (
+        "Give me an unique idea for a viral AI-generated video of about 8s formatted as a prompt for an AI "
+        "video generation model, in two lines without any formatting, first line containing the title and "
+        "second line containing the prompt, without any extra text"
+    )
+
+    def __init__(self, session: ChatSession = None, banned: Sequence[str] = BANNED_TERMS,
+                 novelty: Optional[NoveltyIndex] = None, max_rounds: int = 2):
         if not session:
             try:
                 config = AppConfig.load()
@@ -12,20 +188,85 @@ class PlotGenerator:
             except RuntimeError as e:
                 print(f"[error] {e}\nSet OPENAI_API_KEY and other params in environment or .env.")
                 return 1
-            
+
             self.session = ChatSession(config=config)
-            self.prompt = "Give me an unique idea for a viral AI-generated video of about 8s formatted as a prompt for an AI video generation model, in two lines without any formatting, first line containing the title and second line containing the prompt, without any extra text"
         else:
             self.session = session
+        self.banned = tuple(t.lower() for t in banned)
+        # Every idea ever accepted (data/novelty.jsonl), not just this process's
+        self.novelty = novelty if novelty is not None else get_index()
+        # Ideas accepted by this generator, for the in-batch novelty score
+        self.seen: List[str] = []
+        # Batches to request before giving up when every idea gets rejected
+        self.max_rounds = max(1, max_rounds)
 
-    def generate_plot(self) -> str:
-        response = self.session.openai_client().chat.completions.create(
-            model=self.session.config.model,
-            messages=[{"role": "user", "content": self.prompt}],
-            max_tokens=150
-        )
-        resp = response.choices[0].message.content
-        return resp
+    def generate_candidates(self, k: int = 5, keep_rejected: bool = False) -> List[PlotCandidate]:
+        """K ideas from a single background call, ranked best first.
+        Ideas close to one already in the novelty index are rejected; if a
+        whole batch is rejected a new one is requested (up to max_rounds).
+        Rejected ideas are dropped unless keep_rejected is set. Call
+        accept() with the ideas actually used."""
+        ranked: List[PlotCandidate] = []
+        for _ in range(self.max_rounds):
+            raw = self.session.one_shot(
+                self.batch_prompt.format(k=k), call_class=BACKGROUND, max_tokens=self.tokens_per_idea * k
+            )
+            ranked = score_candidates(parse_candidates(raw), seen=self.seen, banned=self.banned)
+            for c in ranked:
+                if c.rejected is None:
+                    dup = self.novelty.duplicate_of(f"{c.title} {c.prompt}")
+                    if dup is not None:
+                        c.rejected = f"already generated ({dup.similarity:.2f} like {dup.title!r})"
+                metrics.inc("plot_candidates", status="rejected" if c.rejected else "accepted")
+            ranked.sort(key=lambda c: (c.rejected is not None, -c.score))
+            if any(c.rejected is None for c in ranked):
+                break
+        return ranked if keep_rejected else [c for c in ranked if c.rejected is None]
+
+    def accept(self, candidates: Iterable[PlotCandidate]):
+        """Record ideas as used so later batches and runs do not repeat them."""
+        for c in candidates:
+            text = f"{c.title} {c.prompt}"
+            self.seen.append(text)
+            self.novelty.add(text, title=c.title)
+
+    def generate_plot(self) -> Optional[PlotCandidate]:
+        """The best new idea, or None when every attempt was rejected."""
+        # Ideation is a background call: routed to BUZZBOT_BACKGROUND_MODEL when set
+        ranked = self.generate_candidates(k=3, keep_rejected=True)
+        usable = [c for c in ranked if c.rejected is None]
+        if usable:
+            self.accept(usable[:1])
+            return usable[0]
+        return self._fallback_plot([c.title for c in ranked if c.title])
+
+    def _fallback_plot(self, rejected_titles: List[str]) -> Optional[PlotCandidate]:
+        """One idea at a time from the single-idea prompt, told what was
+        rejected so far; near-duplicates are regenerated up to max_rounds."""
+        metrics.inc("plot_fallbacks")
+        rejected_titles = list(rejected_titles)
+        for _ in range(self.max_rounds):
+            prompt = self.single_prompt
+            if rejected_titles:
+                prompt += ". It must be different from these ideas: " + "; ".join(rejected_titles[-10:])
+            raw = self.session.one_shot(prompt, call_class=BACKGROUND, max_tokens=150)
+            ranked = score_candidates(parse_candidates(raw)[:1], seen=self.seen, banned=self.banned)
+            if not ranked:
+                continue
+            idea = ranked[0]
+            if idea.rejected is None:
+                dup = self.novelty.duplicate_of(f"{idea.title} {idea.prompt}")
+                if dup is not None:
+                    idea.rejected = f"already generated ({dup.similarity:.2f} like {dup.title!r})"
+            metrics.inc("plot_candidates", status="rejected" if idea.rejected else "accepted")
+            if idea.rejected is None:
+                self.accept([idea])
+                return idea
+            if idea.title:
+                rejected_titles.append(idea.title)
+        metrics.inc("plot_failures")
+        print(f"[warn] no new plot idea after {self.max_rounds} fallback attempts")
+        return None
 
 class ClipGenerator:
     def __init__(self, session: ChatSession = None):
@@ -36,18 +277,27 @@ class ClipGenerator:
             except RuntimeError as e:
                 print(f"[error] {e}\nSet OPENAI_API_KEY and other params in environment or .env.")
                 return 1
-            
+
             self.session = ChatSession(config=config)
         else:
             self.session = session
         self.plot_gen = PlotGenerator(self.session)
 
-    def generate_clip(self) -> str:
-        plot = self.plot_gen.generate_plot()
+    def generate_clips(self, count: int = 1, candidates: int = 5) -> List[str]:
+        """Render the best `count` ideas of one batch of `candidates`."""
+        ranked = self.plot_gen.generate_candidates(k=max(count, candidates))[:count]
+        self.plot_gen.accept(ranked)
+        return [self._render(c) for c in ranked]
 
-        title = plot.split('\n')[0].strip()
-        prompt = plot.split('\n')[1].strip()
+    def generate_clip(self) -> Optional[str]:
+        """Render one new idea; None (nothing rendered) when there is none."""
+        plot = self.plot_gen.generate_plot()
+        if plot is None:
+            return None
+        return self._render(plot)
 
-        out_path = generate_veo3_video(self.session, description=prompt, negative_keywords=["low quality", "bad lighting", "unrelated content"], out_dir = "data/video_tests")
+    def _render(self, plot: PlotCandidate) -> str:
+        # generate_veo3_video wants the genai client, not the chat session
+        out_path = generate_veo3_video(self.session.google_client(), description=plot.prompt, negative_keywords=["low quality", "bad lighting", "unrelated content"], out_dir = "data/video_tests")
 
-        return out_path
\ No newline at end of file
+        return out_path
@@ -1,9 +1,16 @@
 import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
 from pathlib import Path
-from typing import Iterable, List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 import datetime as _dt
 import sys
 
+from .messages import json_default
+
 Message = Dict[str, Any]
 
 SESSIONS_DIR = Path("data/sessions")
@@ -22,23 +29,326 @@ def save_history(history: List[Message]) -> Path:
     path = SESSIONS_DIR / f"{timestamp()}.jsonl"
     with path.open("w", encoding="utf-8") as f:
         for msg in history:
-            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            f.write(json.dumps(msg, ensure_ascii=False, default=json_default) + "\n")
     return path
 
 
 def load_history(path: Path) -> List[Message]:
+    """Load a JSONL history (plain export or session journal).
+
+    Journals carry ``{"_op": ...}`` control lines; a ``.ckpt`` sidecar lets us
+    seek straight past everything before the last reset. ``.bzar`` archives
+    (archive.py) are detected by their magic bytes.
+    """
+    from . import archive
+    if archive.is_archive(path):
+        return archive.load_archive(path)
     loaded: List[Message] = []
-    with path.open("r", encoding="utf-8") as f:
+    start = 0
+    ckpt = _read_checkpoint(path)
+    if ckpt and ckpt.get("base", 0) <= path.stat().st_size:
+        start = ckpt["base"]
+    with path.open("rb") as f:
+        f.seek(start)
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                loaded.append(json.loads(line))
+                msg = json.loads(line)
             except json.JSONDecodeError:
                 print(f"Skipping invalid JSON line in {path}", file=sys.stderr)
+                continue
+            op = msg.get("_op") if isinstance(msg, dict) else None
+            if op == "reset":
+                loaded.clear()
+            elif op is None:
+                loaded.append(msg)
     return loaded
 
+
+def iter_history(path: Path) -> Iterator[Message]:
+    """Stream the messages of a JSONL export or archive without materializing
+    the whole file. Journal control lines are skipped; use load_history to
+    replay journals with resets."""
+    from . import archive
+    if archive.is_archive(path):
+        for msg in archive.iter_archive(path):
+            if not (isinstance(msg, dict) and "_op" in msg):
+                yield msg
+        return
+    with path.open("rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping invalid JSON line in {path}", file=sys.stderr)
+                continue
+            if not (isinstance(msg, dict) and "_op" in msg):
+                yield msg
+
+
+# Append-only session journal --------------------------------------------------
+# One JSONL file per session (<key>.journal.jsonl). Saving appends only the
+# messages written since the previous save; a history reset is recorded as a
+# {"_op": "reset"} line. A small JSON sidecar (<file>.ckpt) checkpoints the
+# byte offset where the live history starts, its message count and last id, so
+# reopening or loading a journal never re-parses stale data. Once the dead
+# prefix dominates the file it is compacted away in a background thread.
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def _checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".ckpt")
+
+
+def _read_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(_checkpoint_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _dumps_line(obj: Any) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, default=json_default) + "\n").encode("utf-8")
+
+
+class SessionJournal:
+    def __init__(
+        self,
+        path: Path,
+        fsync: str = "interval",
+        fsync_interval: float = 1.0,
+        checkpoint_every: int = 64,
+        compact_min_bytes: int = 1 << 20,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = Path(path)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._last_fsync = time.monotonic()
+        self._since_checkpoint = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.base, self.count, self.last_id = 0, 0, 0
+        self._recover()
+        self._f = self.path.open("ab")
+        self.size = self._f.tell()
+
+    def _recover(self):
+        """Restore base/count/last_id from the checkpoint plus the journal tail."""
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        offset = 0
+        ckpt = _read_checkpoint(self.path)
+        if ckpt and ckpt.get("offset", size + 1) <= size:
+            self.base, self.count, self.last_id = ckpt["base"], ckpt["count"], ckpt["last_id"]
+            offset = ckpt["offset"]
+        end = offset  # just past the last complete, parseable line
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break  # torn by a crash mid-write
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                end = offset
+                if not isinstance(msg, dict):
+                    continue
+                if msg.get("_op") == "reset":
+                    self.base, self.count, self.last_id = offset, 0, 0
+                elif "_op" not in msg:
+                    self.count += 1
+                    if isinstance(msg.get("id"), int):
+                        self.last_id = msg["id"]
+        if end < size:
+            # Otherwise the next append would be glued onto the partial line
+            with self.path.open("r+b") as f:
+                f.truncate(end)
+
+    def _pending(self, history: List[Message]) -> Tuple[bool, List[Message]]:
+        """(reset, new_messages) needed to bring the journal up to history."""
+        if not history:
+            return self.count > 0, []
+        if isinstance(history[-1].get("id"), int) and self.last_id:
+            # Ids are increasing; if the last journaled one is gone, the
+            # history was reset since the previous save.
+            idx = bisect_left(history, self.last_id, key=lambda m: m.get("id", 0))
+            if idx < len(history) and history[idx].get("id") == self.last_id:
+                return False, list(history[idx + 1:])
+            return True, list(history)
+        if len(history) < self.count:
+            return True, list(history)
+        return False, list(history[self.count:])
+
+    def _reset_locked(self):
+        self._write(_dumps_line({"_op": "reset"}))
+        self.base, self.count, self.last_id = self.size, 0, 0
+
+    def _reopen_locked(self):
+        # Closed by open_journal's eviction while a caller still held it
+        if self._f.closed:
+            self.base, self.count, self.last_id = 0, 0, 0
+            self._recover()
+            self._f = self.path.open("ab")
+            self.size = self._f.tell()
+
+    def reset(self):
+        """Start over: the next sync writes the whole history. For histories
+        whose message ids do not continue the journal's (e.g. rebuilt from
+        the database)."""
+        with self._lock:
+            self._reopen_locked()
+            self._reset_locked()
+            self._f.flush()
+            self._maybe_fsync()
+            self._checkpoint()
+
+    def sync(self, history: List[Message]) -> int:
+        """Append whatever history has that the journal lacks; returns the count."""
+        with self._lock:
+            self._reopen_locked()
+            reset, new = self._pending(history)
+            if reset:
+                self._reset_locked()
+            for msg in new:
+                self._write(_dumps_line(msg))
+                self.count += 1
+                if isinstance(msg.get("id"), int):
+                    self.last_id = msg["id"]
+            self._f.flush()
+            self._maybe_fsync()
+            self._since_checkpoint += len(new)
+            if reset or self._since_checkpoint >= self.checkpoint_every:
+                self._checkpoint()
+            compact = (
+                not self._compacting
+                and self.base >= self.compact_min_bytes
+                and self.base * 2 >= self.size
+            )
+            if compact:
+                self._compacting = True
+        if compact:
+            threading.Thread(target=self._compact, name=f"compact-{self.path.name}", daemon=True).start()
+        return len(new)
+
+    def _write(self, data: bytes):
+        self._f.write(data)
+        self.size += len(data)
+
+    def _maybe_fsync(self, force: bool = False):
+        now = time.monotonic()
+        if (
+            (force and self.fsync != "never")
+            or self.fsync == "always"
+            or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval)
+        ):
+            os.fsync(self._f.fileno())
+            self._last_fsync = now
+
+    def _checkpoint(self):
+        ckpt = {"base": self.base, "offset": self.size, "count": self.count, "last_id": self.last_id}
+        tmp = _checkpoint_path(self.path).with_suffix(".tmp")
+        tmp.write_text(json.dumps(ckpt), encoding="utf-8")
+        os.replace(tmp, _checkpoint_path(self.path))
+        self._since_checkpoint = 0
+
+    def _compact(self):
+        """Rewrite the journal without its dead prefix (everything before base)."""
+        tmp = self.path.with_suffix(".compact.tmp")
+        try:
+            with self._lock:
+                base, end = self.base, self.size
+            # Bulk copy happens outside the lock; saves keep appending meanwhile
+            with self.path.open("rb") as src, tmp.open("wb") as dst:
+                src.seek(base)
+                dst.write(src.read(end - base))
+                with self._lock:
+                    if self.base != base or self._f.closed:  # reset or close raced us
+                        return
+                    src.seek(end)
+                    dst.write(src.read(self.size - end))
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                    self._f.close()
+                    os.replace(tmp, self.path)
+                    self._f = self.path.open("ab")
+                    self.size -= base
+                    self.base = 0
+                    self._checkpoint()
+        finally:
+            tmp.unlink(missing_ok=True)
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        with self._lock:
+            if self._f.closed:
+                return
+            self._f.flush()
+            self._maybe_fsync(force=True)
+            self._checkpoint()
+            self._f.close()
+
+
+# Open journals, least recently used first; evicted ones are closed
+MAX_OPEN_JOURNALS = 64
+_journals: "OrderedDict[str, SessionJournal]" = OrderedDict()
+_journals_lock = threading.Lock()
+
+
+def journal_path(key: str) -> Path:
+    return SESSIONS_DIR / f"{key}.journal.jsonl"
+
+
+def open_journal(key: str, **options: Any) -> SessionJournal:
+    """Shared journal for a session key (webserver session id, CLI run, ...)."""
+    evicted: List[SessionJournal] = []
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            ensure_sessions_dir()
+            journal = SessionJournal(journal_path(key), **options)
+            _journals[key] = journal
+            while len(_journals) > MAX_OPEN_JOURNALS:
+                evicted.append(_journals.popitem(last=False)[1])
+        else:
+            _journals.move_to_end(key)
+    for old in evicted:
+        old.close()
+    return journal
+
+
+def reset_journal(key: str, **options: Any):
+    """Mark a session's existing journal as restarted (see SessionJournal.reset)."""
+    if key in _journals or journal_path(key).exists():
+        open_journal(key, **options).reset()
+
+
+def close_journal(key: str, remove: bool = False):
+    """Close a session's journal; remove=True also deletes its files."""
+    with _journals_lock:
+        journal = _journals.pop(key, None)
+    if journal is not None:
+        journal.close()
+    if remove:
+        path = journal_path(key)
+        path.unlink(missing_ok=True)
+        _checkpoint_path(path).unlink(missing_ok=True)
+
+
 # Formatting utilities -------------------------------------------------------
 RESET = "\033[0m"
 BOLD = "\033[1m"
@@ -67,7 +377,12 @@ def print_message(msg: Message, color: bool, stream: bool = False):
     prefix = format_prefix(msg.get("role", "?"), color)
     content = msg.get("content", "")
     if stream:
-        # streaming prints are handled token-by-token elsewhere
+        # Start of a streamed message: tokens follow via print_token()
+        print(f"{prefix} {content or ''}", end="", flush=True)
         return
     print(f"{prefix} {content}")
 
+
+def print_token(text: str):
+    print(text, end="", flush=True)
+
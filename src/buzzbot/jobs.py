@@ -0,0 +1,93 @@
+"""Background jobs for deferred (long-running) tools.
+
+A tool registered with ``deferred=True`` (e.g. ``generate_veo3_video``) does
+not block the tool loop: ChatSession submits it here, immediately hands the
+model a pending note with the job id, and gets ``on_done`` called from the
+worker thread when the job finishes. The session then injects the result as a
+system message (see ``ChatSession.deliver_job_results``).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+# Start of the system message that carries a job's result; its job id and
+# result differ between runs (see cassette.request_key)
+RESULT_PREFIX = "Background job "
+
+
+@dataclass
+class Job:
+    id: str
+    tool: str
+    arguments: str
+    status: str = PENDING
+    result: Optional[str] = None
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 4, keep: int = 1000):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="buzzbot-job")
+        self._jobs: Dict[str, Job] = {}
+        self._keep = keep
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        tool: str,
+        fn: Callable[[], str],
+        arguments: str = "",
+        on_done: Optional[Callable[[Job], None]] = None,
+    ) -> Job:
+        """Run fn() in the background; its string result becomes job.result.
+        Results starting with ``<error`` mark the job failed."""
+        job = Job(id=uuid.uuid4().hex[:10], tool=tool, arguments=arguments, created=time.time())
+        with self._lock:
+            self._jobs[job.id] = job
+            if len(self._jobs) > self._keep:
+                # Forget the oldest finished jobs
+                for jid in [j.id for j in self._jobs.values() if j.finished][: len(self._jobs) - self._keep]:
+                    del self._jobs[jid]
+        metrics.inc("jobs_submitted", tool=tool)
+        self._pool.submit(self._run, job, fn, on_done)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[], str], on_done: Optional[Callable[[Job], None]]):
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            result = str(fn())
+            job.status = FAILED if result.startswith("<error") else DONE
+        except Exception as e:
+            result = f"<error executing {job.tool}: {e}>"
+            job.status = FAILED
+        job.result = result
+        job.finished = time.time()
+        metrics.inc("jobs_finished", tool=job.tool, status=job.status)
+        metrics.observe("job_seconds", job.finished - job.started, tool=job.tool)
+        if on_done is not None:
+            try:
+                on_done(job)
+            except Exception:  # pragma: no cover - a listener must not kill the worker
+                logging.exception("job %s: completion callback failed", job.id)
+
+
+jobs = JobManager()
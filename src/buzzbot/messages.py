@@ -0,0 +1,244 @@
+"""Compact in-memory representation of chat history.
+
+``ChatSession.history`` used to be a plain list of dicts, each repeating its
+string keys and nesting more dicts/lists for tool calls. With thousands of
+cached sessions that dominates heap usage. Here every message is a
+``__slots__`` record (no per-instance ``__dict__``), roles/names are interned
+and short tool results are shared between messages.
+
+Records still behave like dicts (``m["role"]``, ``m.get("content")``,
+``dict(m)``) and ``MessageStore`` behaves like a list, so ``buzzcli`` and
+``io_utils`` keep working unchanged. Tool calls stay packed until
+``m["tool_calls"]`` is read, which unpacks them into plain dicts kept on
+the record, so in-place edits stick as they did with the old dicts.
+``MessageStore.wire()`` yields the OpenAI ``messages`` payload straight
+from the records.
+"""
+from __future__ import annotations
+
+import sys
+from collections.abc import MutableMapping, MutableSequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # pragma: no cover - the CLI does not need Flask
+    DefaultJSONProvider = None  # type: ignore
+
+_UNSET: Any = object()
+
+# Tool results up to this size are interned: the same dice roll, error or
+# video path is then stored once no matter how many sessions contain it.
+SHARED_CONTENT_MAX = 256
+
+
+def _share(value: Any) -> Any:
+    if isinstance(value, str) and len(value) <= SHARED_CONTENT_MAX:
+        return sys.intern(value)
+    return value
+
+
+class ToolCallRecord:
+    __slots__ = ("id", "type", "name", "arguments")
+
+    def __init__(self, id: Optional[str], type: str, name: str, arguments: str):
+        self.id = id
+        self.type = sys.intern(type or "function")
+        self.name = sys.intern(name or "")
+        self.arguments = arguments
+
+    @classmethod
+    def from_dict(cls, tc: Dict[str, Any]) -> "ToolCallRecord":
+        fn = tc.get("function") or {}
+        return cls(tc.get("id"), tc.get("type", "function"), fn.get("name", ""), fn.get("arguments", ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "function": {"name": self.name, "arguments": self.arguments},
+        }
+
+
+class MessageRecord(MutableMapping):
+    """One history entry. Known keys live in slots; anything else in ``extra``."""
+
+    __slots__ = ("id", "role", "content", "tool_calls", "tool_call_id", "name", "extra")
+    FIELDS = ("id", "role", "content", "tool_calls", "tool_call_id", "name")
+    _FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        for field in self.FIELDS:
+            setattr(self, field, _UNSET)
+        self.extra: Optional[Dict[str, Any]] = None
+        if data:
+            for k, v in data.items():
+                self[k] = v
+            # Interned here so it does not depend on "role" coming before "content"
+            if self.role == "tool":
+                self.content = _share(self.content)
+
+    @classmethod
+    def coerce(cls, msg: Any) -> "MessageRecord":
+        return msg if isinstance(msg, MessageRecord) else cls(msg)
+
+    # Mapping protocol --------------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key)
+            if value is _UNSET:
+                raise KeyError(key)
+            if key == "tool_calls" and isinstance(value, tuple):
+                value = self.tool_calls = [tc.to_dict() for tc in value]
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "role":
+            value = sys.intern(value) if isinstance(value, str) else value
+        elif key == "name":
+            value = _share(value)
+        elif key == "tool_calls":
+            if value is not None:
+                value = tuple(ToolCallRecord.from_dict(tc) for tc in value)
+        elif key == "content" and self.role == "tool":
+            value = _share(value)
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELD_SET:
+            if getattr(self, key) is _UNSET:
+                raise KeyError(key)
+            setattr(self, key, _UNSET)
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if getattr(self, field) is not _UNSET:
+                yield field
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        n = sum(1 for field in self.FIELDS if getattr(self, field) is not _UNSET)
+        return n + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self) -> str:
+        return f"MessageRecord({self.to_dict()!r})"
+
+    # Serialization ------------------------------------------------------------
+    def _tool_call_dicts(self) -> Any:
+        # Without unpacking (and keeping) them, unlike self["tool_calls"]
+        if isinstance(self.tool_calls, tuple):
+            return [tc.to_dict() for tc in self.tool_calls]
+        return self.tool_calls
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: self._tool_call_dicts() if k == "tool_calls" else self[k] for k in self}
+
+    def to_wire(self) -> Dict[str, Any]:
+        """The OpenAI chat.completions message for this record."""
+        role = self.role
+        content = "" if self.content is _UNSET or self.content is None else self.content
+        if role == "tool":
+            call_id = None if self.tool_call_id is _UNSET else self.tool_call_id
+            return {"role": role, "content": content, "tool_call_id": call_id}
+        if role == "assistant" and self.tool_calls is not _UNSET and self.tool_calls:
+            return {
+                "role": role,
+                "content": content,
+                "tool_calls": self._tool_call_dicts(),
+            }
+        return {"role": None if role is _UNSET else role, "content": content}
+
+
+class WireView:
+    """Re-iterable view of a store in OpenAI wire format (safe across retries)."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items: List[MessageRecord]):
+        self._items = items
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for rec in self._items:
+            yield rec.to_wire()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class MessageStore(MutableSequence):
+    """List-compatible container of :class:`MessageRecord`."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, messages: Optional[Iterable[Any]] = None):
+        self._items: List[MessageRecord] = [MessageRecord.coerce(m) for m in (messages or ())]
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            self._items[index] = [MessageRecord.coerce(m) for m in value]
+        else:
+            self._items[index] = MessageRecord.coerce(value)
+
+    def __delitem__(self, index) -> None:
+        del self._items[index]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self._items)
+
+    def __repr__(self) -> str:
+        return f"MessageStore({len(self._items)} messages)"
+
+    def insert(self, index: int, value: Any) -> None:
+        self._items.insert(index, MessageRecord.coerce(value))
+
+    def append(self, value: Any) -> None:
+        self._items.append(MessageRecord.coerce(value))
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def wire(self) -> WireView:
+        return WireView(self._items)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [rec.to_dict() for rec in self._items]
+
+
+def json_default(obj: Any) -> Any:
+    """``default=`` hook for json.dumps / Flask's JSON provider."""
+    if isinstance(obj, MessageRecord):
+        return obj.to_dict()
+    if isinstance(obj, MessageStore):
+        return obj.to_dicts()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if DefaultJSONProvider is not None:
+
+    class JSONProvider(DefaultJSONProvider):
+        """Flask JSON provider that serializes history records (``app.json``)."""
+
+        @staticmethod
+        def default(o):
+            if isinstance(o, (MessageRecord, MessageStore)):
+                return json_default(o)
+            return DefaultJSONProvider.default(o)
@@ -0,0 +1,89 @@
+"""Minimal in-process metrics registry (counters, gauges, latency samples).
+
+No external dependency: values live in module-level dicts guarded by a lock and
+are exported as plain JSON by the webserver ``/metrics`` endpoint.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# How many recent samples we keep per timing series (bounded memory).
+MAX_SAMPLES = 1024
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, Any]] = {}
+_samples: Dict[str, Dict[LabelKey, Deque[float]]] = {}
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def set_gauge(name: str, value: Any, **labels: Any) -> None:
+    key = _key(labels)
+    with _lock:
+        _gauges.setdefault(name, {})[key] = value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    key = _key(labels)
+    with _lock:
+        series = _samples.setdefault(name, {})
+        if key not in series:
+            series[key] = deque(maxlen=MAX_SAMPLES)
+        series[key].append(float(value))
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    vals = list(values)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "mean": sum(vals) / len(vals),
+        "p50": percentile(vals, 0.50),
+        "p95": percentile(vals, 0.95),
+        "p99": percentile(vals, 0.99),
+        "max": max(vals),
+    }
+
+
+def _series(store: Dict[LabelKey, Any], fmt=lambda v: v):
+    return [{"labels": dict(k), "value": fmt(v)} for k, v in store.items()]
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return a JSON-serializable view of every metric."""
+    with _lock:
+        return {
+            "counters": {n: _series(s) for n, s in _counters.items()},
+            "gauges": {n: _series(s) for n, s in _gauges.items()},
+            "timings": {n: _series(s, summarize) for n, s in _samples.items()},
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _samples.clear()
@@ -0,0 +1,220 @@
+"""Near-duplicate index over every plot idea we have generated.
+
+Each idea (title + prompt) is reduced to a MinHash signature of its word
+unigrams and bigrams: ``NUM_PERM`` minimum values of affine hash
+permutations, so the fraction of equal positions between two signatures
+estimates their Jaccard similarity. Signatures are split into ``BANDS``
+bands of ``ROWS`` values; an idea is only compared with the ideas sharing
+at least one band bucket (LSH). With 20 bands of 3 a pair at similarity
+0.6 is found 99% of the time, one at 0.1 only 2% of the time, so a lookup
+takes tens of microseconds however large the index grows. Hashing a new
+text (about a millisecond in pure Python) dominates; signatures are
+memoized so checking and then adding the same idea hashes it once.
+
+The index is an append-only JSONL file (``data/novelty.jsonl``), loaded once
+and kept in memory. PlotGenerator checks new candidates against it and adds
+the ideas it hands out.
+
+CLI:
+  PYTHONPATH=src python -m buzzbot.novelty query "A whale made of clouds..."
+  PYTHONPATH=src python -m buzzbot.novelty add "Cloud Whale" "A whale made of clouds..."
+  PYTHONPATH=src python -m buzzbot.novelty stats
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .config import APP_SAVING_DIR
+
+DEFAULT_INDEX_PATH = APP_SAVING_DIR / "novelty.jsonl"
+
+BANDS, ROWS = 20, 3
+NUM_PERM = BANDS * ROWS
+# Estimated Jaccard similarity from which an idea counts as already made
+DEFAULT_THRESHOLD = 0.6
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Fixed seed: signatures must stay comparable across processes and runs
+_rng = random.Random(0x6275_7A7A)
+_PERMS: List[Tuple[int, int]] = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str) -> Set[str]:
+    words = _WORD.findall(text.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+@lru_cache(maxsize=4096)
+def signature(text: str) -> Signature:
+    hashes = [_hash(s) for s in shingles(text)]
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(min([((a * h + b) % _PRIME) & _MAX_HASH for h in hashes]) for a, b in _PERMS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _bands(sig: Signature) -> List[int]:
+    return [hash((i, sig[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+
+
+@dataclass
+class Match:
+    id: str
+    title: str
+    text: str
+    similarity: float
+
+
+class NoveltyIndex:
+    def __init__(self, path: Optional[Path] = DEFAULT_INDEX_PATH, threshold: float = DEFAULT_THRESHOLD):
+        self.path = Path(path) if path else None  # None: in-memory only
+        self.threshold = threshold
+        self._entries: Dict[str, Tuple[str, str, Signature]] = {}
+        self._buckets: Dict[int, List[str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    self._insert(rec["id"], rec.get("title", ""), rec["text"], tuple(rec["sig"]))
+                except (ValueError, KeyError, TypeError):
+                    continue  # e.g. a line truncated by a crash
+
+    def _insert(self, entry_id: str, title: str, text: str, sig: Signature):
+        if len(sig) != NUM_PERM:
+            return  # written with other LSH parameters
+        self._entries[entry_id] = (title, text, sig)
+        for b in _bands(sig):
+            self._buckets.setdefault(b, []).append(entry_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def query(self, text: str, limit: int = 5, sig: Optional[Signature] = None) -> List[Match]:
+        """Indexed ideas sharing an LSH bucket with text, most similar first."""
+        sig = sig or signature(text)
+        with self._lock:
+            self._load()
+            ids = {i for b in _bands(sig) for i in self._buckets.get(b, ())}
+            matches = [
+                Match(i, self._entries[i][0], self._entries[i][1], similarity(sig, self._entries[i][2]))
+                for i in ids
+            ]
+        matches.sort(key=lambda m: m.similarity, reverse=True)
+        return matches[:limit]
+
+    def duplicate_of(self, text: str, sig: Optional[Signature] = None) -> Optional[Match]:
+        """The closest indexed idea at or above the threshold, if any."""
+        best = self.query(text, limit=1, sig=sig)
+        return best[0] if best and best[0].similarity >= self.threshold else None
+
+    def add(self, text: str, title: str = "", **meta: Any) -> str:
+        sig = signature(text)
+        entry_id = uuid.uuid4().hex[:10]
+        with self._lock:
+            self._load()
+            self._insert(entry_id, title, text, sig)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                rec = {"id": entry_id, "title": title, "text": text, "sig": list(sig), "added": time.time(), **meta}
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return entry_id
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load()
+            sizes = [len(v) for v in self._buckets.values()]
+            return {
+                "entries": len(self._entries),
+                "buckets": len(sizes),
+                "largest_bucket": max(sizes, default=0),
+                "path": str(self.path) if self.path else None,
+            }
+
+
+_default: Optional[NoveltyIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_index() -> NoveltyIndex:
+    """Process-wide index on DEFAULT_INDEX_PATH."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = NoveltyIndex()
+        return _default
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="buzzbot.novelty", description="Query the near-duplicate index of generated ideas.")
+    p.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH, help=f"index file (default: {DEFAULT_INDEX_PATH})")
+    p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("query", help="show the closest indexed ideas")
+    q.add_argument("text")
+    q.add_argument("--limit", type=int, default=5)
+    a = sub.add_parser("add", help="index an idea")
+    a.add_argument("title")
+    a.add_argument("prompt")
+    sub.add_parser("stats", help="index size and bucket spread")
+    args = p.parse_args(argv)
+
+    index = NoveltyIndex(args.index, threshold=args.threshold)
+    if args.cmd == "stats":
+        for k, v in index.stats().items():
+            print(f"{k:<15}{v}")
+        return 0
+    if args.cmd == "add":
+        text = f"{args.title} {args.prompt}"
+        dup = index.duplicate_of(text)
+        if dup is not None:
+            print(f"near-duplicate of {dup.id} ({dup.similarity:.2f}): {dup.title}")
+            return 1
+        print(index.add(text, title=args.title))
+        return 0
+    start = time.perf_counter()
+    matches = index.query(args.text, limit=args.limit)
+    elapsed = time.perf_counter() - start
+    for m in matches:
+        flag = "DUP" if m.similarity >= index.threshold else "   "
+        print(f"{m.similarity:5.2f} {flag} {m.id}  {m.title or m.text[:60]}")
+    print(f"{len(matches)} match(es) in {elapsed * 1e3:.2f} ms ({len(index)} indexed)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
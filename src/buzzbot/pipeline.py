@@ -0,0 +1,502 @@
+"""Staged, resumable content production: ideate -> render -> post-process -> publish.
+
+Each clip is an *item* whose state lives in a small SQLite database
+(``data/pipeline.db`` by default): the next stage to run, its status and
+a JSON ``data`` dict that every stage extends (title/prompt, then
+video_path, then the published result...). A stage runs in its own worker
+threads and hands items to the next one through a bounded queue, so a
+slow Veo3 render does not stop ideation or publishing from making
+progress, and a full queue pushes back on the stage feeding it.
+
+Ideation is the source: it produces new items (one call may yield several
+ideas) until the run has created ``count`` of them. Items left unfinished
+by an earlier run (crash, Ctrl-C) are resumed at the stage where they
+stopped; the output of completed stages is never recomputed. An item that
+fails a stage after its retries is marked ``failed`` with the error;
+``--retry-failed`` puts those back in line.
+
+Per stage, ``pipeline_stage_seconds`` samples, ``pipeline_items`` counters
+and a ``pipeline_queue_depth`` gauge go to the metrics registry, and a
+summary with throughput is printed at the end of a run.
+
+Run:
+  PYTHONPATH=src python -m buzzbot.pipeline run --count 10 --render-workers 2
+  PYTHONPATH=src python -m buzzbot.pipeline status
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from . import metrics
+from .config import APP_SAVING_DIR
+
+DEFAULT_DB_PATH = APP_SAVING_DIR / "pipeline.db"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+Item = Dict[str, Any]
+
+# Stop marker passed down the queues once a stage has no more input
+_STOP = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, stage);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    item_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    error TEXT,
+    finished REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class Stage:
+    """A processing step: fn(data) returns the keys to merge into the item."""
+
+    name: str
+    fn: Callable[[Item], Item]
+    workers: int = 1
+    queue_size: int = 4
+    retries: int = 0
+
+
+@dataclass
+class Source:
+    """The ideation step: fn(n) returns up to n new items' data."""
+
+    name: str
+    fn: Callable[[int], List[Item]]
+    batch: int = 5
+    # Give up after this many calls in a row that produced nothing usable
+    max_empty: int = 3
+
+
+class PipelineStore:
+    """Item state in SQLite; one connection shared by the worker threads."""
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, stage: str, data: Item) -> str:
+        item_id = uuid.uuid4().hex[:10]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO items (id, stage, status, data, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (item_id, stage, QUEUED, json.dumps(data, ensure_ascii=False), now, now),
+            )
+        return item_id
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def start(self, item_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (RUNNING, time.time(), item_id),
+            )
+
+    def advance(self, item_id: str, stage: str, next_stage: Optional[str], data: Item, seconds: float):
+        """Record a finished stage and move the item to next_stage (None: done)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET stage = ?, status = ?, attempts = 0, data = ?, error = NULL, updated = ? WHERE id = ?",
+                (next_stage or stage, QUEUED if next_stage else DONE, json.dumps(data, ensure_ascii=False), now, item_id),
+            )
+            self._conn.execute(
+                "INSERT INTO stage_runs (item_id, stage, ok, seconds, finished) VALUES (?, ?, 1, ?, ?)",
+                (item_id, stage, seconds, now),
+            )
+
+    def fail(self, item_id: str, stage: str, error: str, seconds: float, final: bool):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET status = ?, error = ?, updated = ? WHERE id = ?",
+                (FAILED if final else QUEUED, error, now, item_id),
+            )
+            self._conn.execute(
+                "INSERT INTO stage_runs (item_id, stage, ok, seconds, error, finished) VALUES (?, ?, 0, ?, ?, ?)",
+                (item_id, stage, seconds, error, now),
+            )
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Items to resume; RUNNING ones were interrupted mid-stage."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE items SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            rows = self._conn.execute(
+                "SELECT * FROM items WHERE status = ? ORDER BY created", (QUEUED,)
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def queued(self, stage: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Items waiting for stage, oldest first."""
+        sql = "SELECT * FROM items WHERE stage = ? AND status = ? ORDER BY created"
+        params: tuple = (stage, QUEUED)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row(r) for r in rows]
+
+    def update_data(self, item_id: str, data: Item):
+        """Replace an item's data without moving it (e.g. partial progress)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET data = ?, updated = ? WHERE id = ?",
+                (json.dumps(data, ensure_ascii=False), time.time(), item_id),
+            )
+
+    def retry_failed(self) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE items SET status = ?, attempts = 0, updated = ? WHERE status = ?",
+                (QUEUED, time.time(), FAILED),
+            )
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{stage: {status: n}} over all items."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, status, COUNT(*) AS n FROM items GROUP BY stage, status"
+            ).fetchall()
+        out: Dict[str, Dict[str, int]] = {}
+        for r in rows:
+            out.setdefault(r["stage"], {})[r["status"]] = r["n"]
+        return out
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        item["data"] = json.loads(item["data"])
+        return item
+
+
+@dataclass
+class StageStats:
+    ok: int = 0
+    failed: int = 0
+    busy: float = 0.0  # summed seconds spent in fn
+    first: Optional[float] = None
+    last: Optional[float] = None
+    samples: List[float] = field(default_factory=list)
+
+    def add(self, seconds: float, ok: bool):
+        now = time.time()
+        self.first = self.first or now - seconds
+        self.last = now
+        self.busy += seconds
+        self.samples.append(seconds)
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+
+
+def run_stage(
+    store: PipelineStore,
+    item: Dict[str, Any],
+    stage: Stage,
+    next_stage: Optional[str],
+    record: Optional[Callable[[str, float, bool], None]] = None,
+) -> bool:
+    """Run one stage on a stored item with its retries; True once it advanced."""
+    item_id = item["id"]
+    for attempt in range(stage.retries + 1):
+        store.start(item_id)
+        start = time.perf_counter()
+        try:
+            data = dict(item["data"])
+            data.update(stage.fn(data) or {})
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            final = attempt == stage.retries
+            store.fail(item_id, stage.name, str(e) or type(e).__name__, seconds, final)
+            if record is not None:
+                record(stage.name, seconds, False)
+            if final:
+                print(f"[pipeline] {item_id} failed at {stage.name}: {e}", file=sys.stderr)
+            continue
+        seconds = time.perf_counter() - start
+        store.advance(item_id, stage.name, next_stage, data, seconds)
+        item["data"] = data
+        if record is not None:
+            record(stage.name, seconds, True)
+        return True
+    return False
+
+
+class Pipeline:
+    def __init__(self, source: Source, stages: List[Stage], store: PipelineStore):
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage after the source")
+        for s in stages:
+            s.workers = max(1, s.workers)
+        self.source = source
+        self.stages = stages
+        self.store = store
+        self.stats: Dict[str, StageStats] = {s.name: StageStats() for s in [source, *stages]}
+        self._queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=max(1, s.queue_size)) for s in stages]
+        self._index = {s.name: i for i, s in enumerate(stages)}
+        self._alive = [s.workers for s in stages]
+        self._alive_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _record(self, stage: str, seconds: float, ok: bool):
+        with self._stats_lock:
+            self.stats[stage].add(seconds, ok)
+        metrics.observe("pipeline_stage_seconds", seconds, stage=stage)
+        metrics.inc("pipeline_items", stage=stage, status="ok" if ok else "failed")
+
+    def _put(self, i: int, item_id: str):
+        q = self._queues[i]
+        q.put(item_id)  # blocks while the stage is saturated
+        metrics.set_gauge("pipeline_queue_depth", q.qsize(), stage=self.stages[i].name)
+
+    # Source ---------------------------------------------------------------
+    def _produce(self, count: int, resumed: List[Dict[str, Any]]):
+        try:
+            for item in resumed:
+                if item["stage"] in self._index:
+                    self._put(self._index[item["stage"]], item["id"])
+            created, empty = 0, 0
+            while created < count and empty < self.source.max_empty:
+                start = time.perf_counter()
+                try:
+                    batch = self.source.fn(min(self.source.batch, count - created))
+                    ok = True
+                except Exception as e:
+                    print(f"[pipeline] {self.source.name} failed: {e}", file=sys.stderr)
+                    batch, ok = [], False
+                self._record(self.source.name, time.perf_counter() - start, ok)
+                empty = 0 if batch else empty + 1
+                for data in batch[: count - created]:
+                    self._put(0, self.store.add(self.stages[0].name, data))
+                    created += 1
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_STOP)
+
+    # Stages ---------------------------------------------------------------
+    def _work(self, i: int):
+        stage = self.stages[i]
+        q = self._queues[i]
+        nxt = self.stages[i + 1].name if i + 1 < len(self.stages) else None
+        while True:
+            item_id = q.get()
+            if item_id is _STOP:
+                break
+            metrics.set_gauge("pipeline_queue_depth", q.qsize(), stage=stage.name)
+            item = self.store.get(item_id)
+            if item is None:
+                continue
+            if run_stage(self.store, item, stage, nxt, self._record) and nxt is not None:
+                self._put(i + 1, item_id)
+        with self._alive_lock:
+            self._alive[i] -= 1
+            last = self._alive[i] == 0
+        if last and i + 1 < len(self.stages):
+            for _ in range(self.stages[i + 1].workers):
+                self._queues[i + 1].put(_STOP)
+
+    def run(self, count: int) -> Dict[str, Any]:
+        """Finish the unfinished items and produce count new ones; returns the summary."""
+        resumed = self.store.unfinished()
+        if resumed:
+            print(f"[pipeline] resuming {len(resumed)} unfinished item(s)", file=sys.stderr)
+        started = time.time()
+        threads = [threading.Thread(target=self._produce, args=(count, resumed), name="pipeline-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._work, args=(i,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.summary(time.time() - started)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"elapsed_s": round(elapsed, 2), "stages": {}}
+        for name, st in self.stats.items():
+            span = (st.last - st.first) if st.first and st.last else 0.0
+            out["stages"][name] = {
+                "ok": st.ok,
+                "failed": st.failed,
+                "busy_s": round(st.busy, 2),
+                "per_min": round(st.ok * 60 / span, 2) if span > 0 else None,
+                **{k: round(v, 3) for k, v in metrics.summarize(st.samples).items() if k != "count"},
+            }
+        return out
+
+
+# BuzzBot stages ------------------------------------------------------------
+
+NEGATIVE_KEYWORDS = ["low quality", "bad lighting", "unrelated content"]
+
+
+def clip_steps(session, ideas_per_call: int = 5, platforms: Sequence[str] = ()) -> Dict[str, Callable[..., Any]]:
+    """The ideate (source), render and postprocess functions for BuzzBot clips.
+
+    postprocess encodes the transcode.py rendition of each platform in
+    platforms that has a profile (when ffmpeg is available); publishers use
+    ``rendition_for(data, platform)``.
+    """
+    from .content_gen import PlotGenerator
+    from .transcode import PROFILES, get_transcoder, transcoding_enabled
+    from .veo3 import VIDEO_DIR, generate_veo3_video
+
+    plot_gen = PlotGenerator(session)
+
+    def ideate(n: int) -> List[Item]:
+        chosen = plot_gen.generate_candidates(k=max(n, ideas_per_call))[:n]
+        plot_gen.accept(chosen)
+        return [{"title": c.title, "prompt": c.prompt, "score": round(c.score, 3)} for c in chosen]
+
+    def render(data: Item) -> Item:
+        route = generate_veo3_video(session.google_client(), description=data["prompt"], negative_keywords=NEGATIVE_KEYWORDS)
+        if route.startswith("<error"):
+            raise RuntimeError(route)
+        return {"video_url": route, "video_path": str(VIDEO_DIR / Path(route).name)}
+
+    def postprocess(data: Item) -> Item:
+        path = Path(data["video_path"])
+        if not path.exists() or path.stat().st_size == 0:
+            raise RuntimeError(f"rendered video missing or empty: {path}")
+        out: Item = {"bytes": path.stat().st_size}
+        profiles = [p for p in platforms if p in PROFILES]
+        if profiles and transcoding_enabled():
+            out["renditions"] = {k: str(v) for k, v in get_transcoder().renditions(path, profiles).items()}
+        return out
+
+    return {"ideate": ideate, "render": render, "postprocess": postprocess}
+
+
+def rendition_for(data: Item, platform: str) -> str:
+    """The file to upload to platform: its rendition if one was made."""
+    return data.get("renditions", {}).get(platform, data["video_path"])
+
+
+def default_pipeline(session, store: PipelineStore, render_workers: int = 2, publish: str = "none",
+                     ideas_per_call: int = 5, retries: int = 1) -> Pipeline:
+    """ideate (PlotGenerator) -> render (Veo3) -> postprocess -> publish."""
+    steps = clip_steps(session, ideas_per_call, platforms=[] if publish == "none" else [publish])
+
+    publisher = None
+    if publish == "tiktok":
+        from .publish.tiktok import TikTokPublisher
+        publisher = TikTokPublisher()
+
+    def publish_stage(data: Item) -> Item:
+        if publisher is None:
+            return {"published": None}
+        if not publisher.publish_video(rendition_for(data, publish), data["title"]):
+            raise RuntimeError(f"{publish} upload failed")
+        return {"published": publish}
+
+    return Pipeline(
+        Source("ideate", steps["ideate"], batch=ideas_per_call),
+        [
+            Stage("render", steps["render"], workers=render_workers, queue_size=render_workers * 2, retries=retries),
+            Stage("postprocess", steps["postprocess"], workers=1, queue_size=4),
+            # Browser uploads are not safe to run concurrently on one account
+            Stage("publish", publish_stage, workers=1, queue_size=4, retries=retries),
+        ],
+        store,
+    )
+
+
+def _print_summary(summary: Dict[str, Any]):
+    print(f"elapsed {summary['elapsed_s']}s")
+    print(f"{'stage':<12}{'ok':>5}{'failed':>8}{'p50 s':>9}{'p95 s':>9}{'per min':>9}")
+    for name, s in summary["stages"].items():
+        per_min = "-" if s["per_min"] is None else f"{s['per_min']:.2f}"
+        print(f"{name:<12}{s['ok']:>5}{s['failed']:>8}{s.get('p50', 0):>9.2f}{s.get('p95', 0):>9.2f}{per_min:>9}")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="buzzbot.pipeline", description="Staged clip production (ideate, render, post-process, publish).")
+    p.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help=f"state database (default: {DEFAULT_DB_PATH})")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="resume unfinished items and produce new clips")
+    r.add_argument("--count", type=int, default=1, help="new clips to ideate (0: only resume)")
+    r.add_argument("--ideas-per-call", type=int, default=5)
+    r.add_argument("--render-workers", type=int, default=2)
+    r.add_argument("--retries", type=int, default=1, help="extra attempts per stage")
+    r.add_argument("--publish", choices=["none", "tiktok"], default="none")
+    r.add_argument("--retry-failed", action="store_true", help="requeue items that failed in earlier runs")
+    sub.add_parser("status", help="item counts per stage and status")
+    args = p.parse_args(argv)
+
+    store = PipelineStore(args.db)
+    try:
+        if args.cmd == "status":
+            for stage, by_status in store.counts().items():
+                print(f"{stage:<12} " + "  ".join(f"{s}={n}" for s, n in sorted(by_status.items())))
+            return 0
+
+        from .chat import ChatSession
+        from .config import AppConfig
+
+        try:
+            config = AppConfig.load()
+        except RuntimeError as e:
+            print(f"[error] {e}\nSet OPENAI_API_KEY and other params in environment or .env.")
+            return 1
+        session = ChatSession(config=config)
+        session.echo = False
+        if args.retry_failed:
+            print(f"[pipeline] requeued {store.retry_failed()} failed item(s)", file=sys.stderr)
+        pipeline = default_pipeline(
+            session, store, render_workers=args.render_workers, publish=args.publish,
+            ideas_per_call=args.ideas_per_call, retries=args.retries,
+        )
+        summary = pipeline.run(args.count)
+        _print_summary(summary)
+        return 1 if any(s["failed"] for s in summary["stages"].values()) else 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
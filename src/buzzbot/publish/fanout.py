@@ -0,0 +1,259 @@
+"""Multi-platform publishing: one post, one task per platform, run concurrently.
+
+``PostManager.start(video, description, platforms)`` opens the video once as
+a read-only memory map (``SharedVideo``) and submits one task per platform
+to that platform's own thread pool, whose size is the backend's
+``concurrency`` (one warm TikTok browser, several API uploads...). Backends
+get the shared video: browser-driven ones use ``video.path``, byte-level
+uploaders read ``video.view()`` slices, so no platform copies the file and
+it is read from disk once. The map is closed when the last task ends.
+A backend with a ``profile`` gets its transcode.py rendition instead
+(encoded once per video and cached) when transcoding is enabled.
+
+Each task records its status (queued, running, done, failed), latency,
+error and backend result; the post is running, done, partial or failed.
+``Post.to_dict()`` is what ``GET /post/<id>`` returns.
+
+Backends: ``tiktok`` (publish/tiktok.py, account cookies from
+``BUZZBOT_TIKTOK_COOKIES``) and ``fake`` (reads the video, waits, optionally
+fails; for benchmarks, and registered in the default manager only with
+``BUZZBOT_FAKE_BACKEND=1``).
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .. import metrics
+from ..transcode import get_transcoder, transcoding_enabled
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+PARTIAL = "partial"  # post-level: some platforms done, some failed
+
+
+class SharedVideo:
+    """A video file mapped once and shared by every platform task."""
+
+    def __init__(self, path: Path, users: int):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self._file = self.path.open("rb")
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._users = users
+        self._lock = threading.Lock()
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the file contents."""
+        return memoryview(self._map) if self._map is not None else memoryview(b"")
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:  # pragma: no cover - a backend kept a view alive
+                pass
+        self._file.close()
+
+
+class Backend:
+    name = "backend"
+    concurrency = 1
+    profile: Optional[str] = None  # transcode.py profile to upload
+
+    def publish(self, video: SharedVideo, description: str) -> Optional[Dict[str, Any]]:
+        """Upload the video; raise on failure. The return value is kept as the task result."""
+        raise NotImplementedError
+
+
+class TikTokBackend(Backend):
+    name = "tiktok"
+    # One browser per account: uploads through it are sequential anyway
+    concurrency = 1
+    profile = "tiktok"
+
+    def __init__(self, cookies_path: Optional[str] = None):
+        self.cookies_path = cookies_path or os.getenv("BUZZBOT_TIKTOK_COOKIES", "env/cookies.txt")
+        self._publisher = None
+        self._lock = threading.Lock()
+
+    def publish(self, video: SharedVideo, description: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._publisher is None:
+                from .tiktok import TikTokPublisher
+                self._publisher = TikTokPublisher(self.cookies_path)
+        upload = self._publisher.service.wait(self._publisher.submit(str(video.path), description))
+        if upload.status != DONE:
+            raise RuntimeError(upload.error or "upload failed")
+        return {"upload_id": upload.id, "attempts": upload.attempts}
+
+
+class FakeBackend(Backend):
+    """Reads the whole video through the shared map (like an HTTP upload
+    would), then waits latency +- jitter seconds."""
+
+    def __init__(self, name: str = "fake", latency: float = 0.5, jitter: float = 0.2,
+                 error_rate: float = 0.0, concurrency: int = 4, chunk_size: int = 1 << 20):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+
+    def publish(self, video: SharedVideo, description: str) -> Optional[Dict[str, Any]]:
+        digest = hashlib.blake2b(digest_size=16)
+        view = video.view()
+        try:
+            for start in range(0, len(view), self.chunk_size):
+                digest.update(view[start:start + self.chunk_size])
+        finally:
+            view.release()
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            raise RuntimeError(f"{self.name}: simulated upload failure")
+        return {"bytes": video.size, "digest": digest.hexdigest()}
+
+
+@dataclass
+class PlatformTask:
+    platform: str
+    status: str = QUEUED
+    queued_at: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    latency: Optional[float] = None  # seconds spent publishing
+    rendition: Optional[str] = None  # file uploaded instead of the source
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class Post:
+    id: str
+    video: str
+    description: str
+    created: float
+    tasks: Dict[str, PlatformTask] = field(default_factory=dict)
+
+    @property
+    def status(self) -> str:
+        states = {t.status for t in self.tasks.values()}
+        if states & {QUEUED, RUNNING}:
+            return RUNNING
+        if FAILED in states:
+            return PARTIAL if DONE in states else FAILED
+        return DONE
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["status"] = self.status
+        return data
+
+
+class PostManager:
+    def __init__(self, backends: Optional[List[Backend]] = None, keep: int = 1000):
+        self._backends: Dict[str, Backend] = {}
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._posts: Dict[str, Post] = {}
+        self._keep = keep
+        self._lock = threading.Lock()
+        if backends is None:
+            backends = [TikTokBackend()]
+            if os.getenv("BUZZBOT_FAKE_BACKEND", "0") == "1":
+                backends.append(FakeBackend())
+        for backend in backends:
+            self.register(backend)
+
+    def register(self, backend: Backend):
+        with self._lock:
+            old = self._pools.pop(backend.name, None)
+            self._backends[backend.name] = backend
+            self._pools[backend.name] = ThreadPoolExecutor(
+                max_workers=max(1, backend.concurrency), thread_name_prefix=f"post-{backend.name}"
+            )
+        if old is not None:
+            old.shutdown(wait=False)
+
+    @property
+    def platforms(self) -> List[str]:
+        return list(self._backends)
+
+    def start(self, video_path: Path, description: str, platforms: List[str]) -> Post:
+        unknown = [p for p in platforms if p not in self._backends]
+        if unknown:
+            raise KeyError(f"unknown platform(s): {', '.join(unknown)}")
+        platforms = list(dict.fromkeys(platforms))
+        video = SharedVideo(video_path, users=len(platforms))
+        now = time.time()
+        post = Post(
+            id=uuid.uuid4().hex[:12],
+            video=str(video_path),
+            description=description,
+            created=now,
+            tasks={p: PlatformTask(platform=p, queued_at=now) for p in platforms},
+        )
+        with self._lock:
+            self._posts[post.id] = post
+            if len(self._posts) > self._keep:
+                for pid in [p.id for p in self._posts.values() if p.status != RUNNING][: len(self._posts) - self._keep]:
+                    del self._posts[pid]
+        for p in platforms:
+            metrics.inc("post_tasks", platform=p, status=QUEUED)
+            self._pools[p].submit(self._run, post.tasks[p], self._backends[p], video, description)
+        return post
+
+    def get(self, post_id: str) -> Optional[Post]:
+        return self._posts.get(post_id)
+
+    def _run(self, task: PlatformTask, backend: Backend, video: SharedVideo, description: str):
+        task.status = RUNNING
+        task.started = time.time()
+        metrics.observe("post_queue_seconds", task.started - task.queued_at, platform=task.platform)
+        start = time.perf_counter()
+        try:
+            if backend.profile and transcoding_enabled():
+                rendition = get_transcoder().transcode(video.path, backend.profile)
+                task.rendition = str(rendition)
+                target = SharedVideo(rendition, users=1)
+                try:
+                    task.result = backend.publish(target, description)
+                finally:
+                    target.release()
+            else:
+                task.result = backend.publish(video, description)
+            task.status = DONE
+        except Exception as e:
+            task.error = str(e) or type(e).__name__
+            task.status = FAILED
+        finally:
+            task.latency = round(time.perf_counter() - start, 3)
+            task.finished = time.time()
+            video.release()
+        metrics.inc("post_tasks", platform=task.platform, status=task.status)
+        metrics.observe("post_task_seconds", task.latency, platform=task.platform)
+
+
+_manager: Optional[PostManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> PostManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = PostManager()
+        return _manager
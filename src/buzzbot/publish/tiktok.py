@@ -1,28 +1,285 @@
-from tiktok_uploader.upload import upload_video
-from tiktok_uploader.auth import AuthBackend
+"""TikTok publishing through warm, authenticated browser sessions.
+
+``tiktok_uploader.upload_video`` starts a headless browser, logs in with the
+cookies, uploads one video and quits: browser startup dominates the time
+of a publish. Here each account keeps one browser open (``BrowserSession``)
+and an ``UploadService`` feeds it from a queue:
+
+- uploads are queued per account and sent in batches through the same
+  browser (``upload_videos`` with our driver as ``browser_agent``);
+- at most ``max_concurrency`` accounts upload at the same time (one browser
+  per account is never used by two threads);
+- a failed upload is retried with exponential backoff, and a browser that
+  errored is replaced before the retry;
+- every upload has an ``Upload`` record (queued, uploading, done, failed)
+  that can be looked up by id.
 
+``TikTokPublisher.publish_video`` keeps its blocking signature on top of the
+shared service.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-class TikTokPublisher:
-    def __init__(self, cookies_path: str = 'env/cookies.txt'):
+from tiktok_uploader.upload import upload_video, upload_videos
+from tiktok_uploader.auth import AuthBackend
+
+try:
+    from tiktok_uploader import config as uploader_config
+    from tiktok_uploader.browsers import get_browser
+except ImportError:  # pragma: no cover - older tiktok-uploader layouts
+    uploader_config = None  # type: ignore
+    get_browser = None  # type: ignore
+
+from .. import metrics
+
+QUEUED, UPLOADING, DONE, FAILED = "queued", "uploading", "done", "failed"
+
+
+@dataclass
+class Upload:
+    id: str
+    account: str
+    path: str
+    description: str
+    status: str = QUEUED
+    attempts: int = 0
+    error: Optional[str] = None
+    created: float = 0.0
+    not_before: float = 0.0  # backoff: not retried before this time
+    finished: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class BrowserSession:
+    """One logged-in browser for one account, reused across uploads."""
+
+    def __init__(self, cookies_path: str, browser: str = "chrome", headless: bool = True,
+                 max_uploads: int = 50, max_age: float = 2 * 3600):
         self.cookies_path = cookies_path
+        self.browser = browser
+        self.headless = headless
+        # Recycle long-lived browsers: memory grows and sessions go stale
+        self.max_uploads = max_uploads
+        self.max_age = max_age
+        self.auth = AuthBackend(cookies=cookies_path)
+        self._driver = None
+        self._started = 0.0
+        self._uploads = 0
+
+    def _ensure(self):
+        if self._driver is not None and (
+            self._uploads >= self.max_uploads or time.monotonic() - self._started > self.max_age
+        ):
+            self.close()
+        if self._driver is None:
+            start = time.perf_counter()
+            self._driver = get_browser(name=self.browser, headless=self.headless)
+            self._started = time.monotonic()
+            self._uploads = 0
+            metrics.inc("tiktok_browser_starts")
+            metrics.observe("tiktok_browser_start_seconds", time.perf_counter() - start)
+        return self._driver
+
+    def upload(self, uploads: List[Upload]) -> List[Upload]:
+        """Upload a batch through this browser; returns the ones that failed."""
+        if get_browser is None:
+            # No reusable driver with this tiktok-uploader: one browser per video
+            return [
+                u for u in uploads
+                if upload_video(u.path, description=u.description, cookies=self.cookies_path, headless=self.headless)
+            ]
+        driver = self._ensure()
+        failed = upload_videos(
+            videos=[{"path": u.path, "description": u.description} for u in uploads],
+            auth=self.auth,
+            browser_agent=driver,
+            headless=self.headless,
+        )
+        self._uploads += len(uploads)
+        failed_paths = {str(v.get("path")) for v in failed or []}
+        return [u for u in uploads if u.path in failed_paths]
+
+    def close(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:  # pragma: no cover - already dead
+                pass
+            self._driver = None
 
-        # Load the content of the cookies file
+
+class UploadService:
+    def __init__(self, max_concurrency: int = 2, batch_size: int = 5, max_attempts: int = 3,
+                 backoff: float = 30.0, keep: int = 1000):
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self._keep = keep
+        self._accounts: Dict[str, str] = {}
+        self._sessions: Dict[str, BrowserSession] = {}
+        self._queues: Dict[str, List[Upload]] = {}
+        self._uploads: Dict[str, Upload] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._cond = threading.Condition()
+        self._closed = False
+        if uploader_config is not None:
+            try:
+                # upload_videos quits the driver when done unless told otherwise
+                uploader_config["quit_on_end"] = False
+            except TypeError:  # pragma: no cover
+                pass
+
+    def add_account(self, name: str, cookies_path: str, **session_options: Any):
         if not Path(cookies_path).exists():
             raise FileNotFoundError(f"Cookies file not found: {cookies_path}")
-        with open(cookies_path, 'r') as f:
-            self.cookies_content = f.read()
+        with self._cond:
+            if name in self._accounts:
+                return
+            self._accounts[name] = cookies_path
+            self._sessions[name] = BrowserSession(cookies_path, **session_options)
+            self._queues[name] = []
+            worker = threading.Thread(target=self._work, args=(name,), name=f"tiktok-{name}", daemon=True)
+            self._workers[name] = worker
+            worker.start()
 
-        self.auth_backend = AuthBackend(cookies = cookies_path)
+    def submit(self, path: str, description: str, account: str = "default") -> Upload:
+        if account not in self._accounts:
+            raise KeyError(f"unknown TikTok account {account!r}")
+        upload = Upload(id=uuid.uuid4().hex[:10], account=account, path=str(path), description=description,
+                        created=time.time())
+        with self._cond:
+            self._uploads[upload.id] = upload
+            if len(self._uploads) > self._keep:
+                for uid in [u.id for u in self._uploads.values() if u.finished][: len(self._uploads) - self._keep]:
+                    del self._uploads[uid]
+            self._queues[account].append(upload)
+            self._cond.notify_all()
+        metrics.inc("tiktok_uploads", status="queued")
+        return upload
 
-    def publish_video(self, video_path: str, desc: str):
-        failed_videos = upload_video(
-            video_path,
-            description=desc,
-            cookies=self.cookies_path,
-            headless=True
-        )
-        if failed_videos:
-            print(f"Failed to upload videos: {failed_videos}")
-        else:
-            print("Video uploaded successfully.")
\ No newline at end of file
+    def get(self, upload_id: str) -> Optional[Upload]:
+        return self._uploads.get(upload_id)
+
+    def wait(self, upload: Upload, timeout: Optional[float] = None) -> Upload:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while upload.status not in (DONE, FAILED):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return upload
+
+    def _next_batch(self, account: str) -> List[Upload]:
+        """Wait for ready uploads of account and take up to batch_size."""
+        with self._cond:
+            while not self._closed:
+                now = time.time()
+                queue = self._queues[account]
+                ready = [u for u in queue if u.not_before <= now][: self.batch_size]
+                if ready:
+                    for u in ready:
+                        queue.remove(u)
+                        u.status = UPLOADING
+                    return ready
+                waits = [u.not_before - now for u in queue]
+                self._cond.wait(min(waits) if waits else None)
+        return []
+
+    def _work(self, account: str):
+        session = self._sessions[account]
+        while True:
+            batch = self._next_batch(account)
+            if not batch:
+                break
+            with self._slots:
+                start = time.perf_counter()
+                for u in batch:
+                    u.attempts += 1
+                try:
+                    failed = session.upload(batch)
+                    error = "upload failed"
+                except Exception as e:  # browser crashed, login expired...
+                    logging.exception("tiktok %s: batch upload failed", account)
+                    failed, error = batch, str(e) or type(e).__name__
+                    session.close()
+                metrics.observe("tiktok_batch_seconds", time.perf_counter() - start, account=account)
+                metrics.observe("tiktok_batch_size", len(batch), account=account)
+            self._settle(account, batch, failed, error)
+        session.close()
+
+    def _settle(self, account: str, batch: List[Upload], failed: List[Upload], error: str):
+        failed_ids = {u.id for u in failed}
+        with self._cond:
+            now = time.time()
+            for u in batch:
+                if u.id not in failed_ids:
+                    u.status, u.error, u.finished = DONE, None, now
+                    metrics.inc("tiktok_uploads", status=DONE)
+                elif u.attempts >= self.max_attempts:
+                    u.status, u.error, u.finished = FAILED, error, now
+                    metrics.inc("tiktok_uploads", status=FAILED)
+                else:
+                    u.status, u.error = QUEUED, error
+                    u.not_before = now + self.backoff * (2 ** (u.attempts - 1))
+                    self._queues[account].append(u)
+                    metrics.inc("tiktok_uploads", status="retried")
+            self._cond.notify_all()
+
+    def close(self):
+        """Stop the workers once their current batch is done and quit the browsers."""
+        with self._cond:
+            self._closed = True
+            now = time.time()
+            for queue in self._queues.values():
+                for u in queue:
+                    u.status, u.error, u.finished = FAILED, "upload service closed", now
+                queue.clear()
+            self._cond.notify_all()
+        for worker in self._workers.values():
+            worker.join()
+
+
+_service: Optional[UploadService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> UploadService:
+    """Process-wide upload service (browsers are shared by all publishers)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = UploadService()
+        return _service
+
+
+class TikTokPublisher:
+    def __init__(self, cookies_path: str = 'env/cookies.txt', account: str = "default",
+                 service: Optional[UploadService] = None):
+        self.cookies_path = cookies_path
+        self.account = account
+        self.service = service or get_service()
+        self.service.add_account(account, cookies_path)
+
+    def submit(self, video_path: str, desc: str) -> Upload:
+        """Queue an upload and return immediately; see Upload.status."""
+        return self.service.submit(video_path, desc, account=self.account)
+
+    def publish_video(self, video_path: str, desc: str) -> bool:
+        upload = self.service.wait(self.submit(video_path, desc))
+        if upload.status != DONE:
+            print(f"Failed to upload videos: {[video_path]} ({upload.error})")
+            return False
+        print("Video uploaded successfully.")
+        return True
@@ -0,0 +1,219 @@
+"""Retry policy + circuit breaker around provider (OpenAI-compatible) calls.
+
+Errors are classified as retryable, rate-limited or fatal. Retryable and
+rate-limited errors are retried with jittered exponential backoff until the
+attempt budget or the deadline runs out; every attempt gets what is left
+of the deadline as its request timeout. Each (base_url, model) pair gets its
+own circuit breaker so a provider outage fails fast instead of piling up
+timeouts; a half-open breaker lets exactly one probe call through. Breaker state is exported through :mod:`buzzbot.metrics`.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+RETRYABLE = "retryable"
+RATE_LIMITED = "rate_limited"
+FATAL = "fatal"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while a breaker is open."""
+
+    def __init__(self, key: Tuple[str, str], retry_in: float):
+        super().__init__(
+            f"provider {key[0]} ({key[1]}) unavailable, circuit open for another {retry_in:.0f}s"
+        )
+        self.key = key
+        self.retry_in = retry_in
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify_error(exc: BaseException) -> str:
+    """Map an exception raised by a provider SDK to an error class."""
+    if isinstance(exc, CircuitOpenError):
+        return FATAL
+    name = type(exc).__name__
+    code = _status_code(exc)
+    if code == 429 or name == "RateLimitError":
+        return RATE_LIMITED
+    if name in ("APITimeoutError", "APIConnectionError", "InternalServerError"):
+        return RETRYABLE
+    if code is not None:
+        return RETRYABLE if code >= 500 or code in (408, 409) else FATAL
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return RETRYABLE
+    return FATAL
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds suggested by a ``Retry-After`` response header, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    deadline: float = 60.0  # seconds for the whole call, retries included
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) attempt."""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    def __init__(self, key: Tuple[str, str], failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._export()
+
+    def _export(self):
+        metrics.set_gauge("provider_circuit_state", _STATE_VALUES[self.state], base_url=self.key[0], model=self.key[1])
+        metrics.set_gauge("provider_circuit_failures", self.failures, base_url=self.key[0], model=self.key[1])
+
+    def _transition(self, state: str):
+        if state != self.state:
+            self.state = state
+            metrics.inc("provider_circuit_transitions", base_url=self.key[0], model=self.key[1], to=state)
+        self._export()
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are rejected (open and not yet due for a probe)."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self):
+        """Raise :class:`CircuitOpenError` if calls should not go through."""
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self.key, self.reset_timeout - elapsed)
+                # Let a single probe through
+                self._transition(HALF_OPEN)
+                self._probe_in_flight = True
+            elif self.state == HALF_OPEN and self._probe_in_flight:
+                # Everyone else waits for the probe's outcome
+                raise CircuitOpenError(self.key, 0.0)
+
+    def release_probe(self):
+        """The probe ended without an outcome (e.g. interrupted)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+            else:
+                self._export()
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(base_url: str, model: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    key = (base_url, model)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key, failure_threshold, reset_timeout)
+            _breakers[key] = breaker
+        return breaker
+
+
+def call_with_retry(
+    fn: Callable[[float], T],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    start: Optional[float] = None,
+) -> T:
+    """Run ``fn(timeout)`` under ``policy`` and ``breaker``; re-raise the last error.
+
+    ``timeout`` is the time left of ``policy.deadline`` counted from ``start``
+    (a ``time.monotonic()`` value, default now), so one deadline can span
+    several calls. Fatal errors (auth, bad request, ...) are raised
+    immediately and do not count against the breaker.
+    """
+    start = time.monotonic() if start is None else start
+    labels = {"base_url": breaker.key[0], "model": breaker.key[1]} if breaker else {}
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = fn(max(0.1, policy.deadline - (time.monotonic() - start)))
+        except Exception as e:
+            kind = classify_error(e)
+            metrics.inc("provider_errors", kind=kind, **labels)
+            if kind == FATAL:
+                if breaker is not None and breaker.state == HALF_OPEN:
+                    # The probe reached the provider, so it is up again
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt)
+            if kind == RATE_LIMITED:
+                delay = max(delay, retry_after(e) or 0.0)
+            if time.monotonic() - start + delay >= policy.deadline:
+                raise
+            metrics.inc("provider_retries", kind=kind, **labels)
+            sleep(delay)
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        metrics.observe("provider_call_seconds", time.monotonic() - start, **labels)
+        return result
@@ -0,0 +1,219 @@
+"""Model routing: which (base_url, model) serves each provider call.
+
+Calls are tagged with a class:
+
+- ``interactive``: the first round of a user turn (someone is waiting).
+- ``tool_followup``: rounds after tool results, and follow-ups on background jobs.
+- ``background``: titles, plot ideation, batch jobs, connectivity tests.
+
+A policy table maps each class to an ordered list of routes. Without a table
+every class uses the session's own base_url/model, as before; setting
+``BUZZBOT_BACKGROUND_MODEL`` alone moves background calls to a cheaper model on
+the same endpoint. A full table is a JSON file named by ``BUZZBOT_ROUTES``::
+
+    {
+      "endpoints": {
+        "openai": {"base_url": "https://api.openai.com/v1"},
+        "backup": {"base_url": "https://backup.example/v1", "api_key_env": "BACKUP_API_KEY"}
+      },
+      "classes": {
+        "interactive":   {"routes": [{"endpoint": "openai"}, {"endpoint": "backup", "model": "llama-3.1-70b"}],
+                          "max_latency": 6},
+        "tool_followup": {"routes": [{"endpoint": "openai"}]},
+        "background":    {"routes": [{"endpoint": "openai", "model": "gpt-4o-mini"}]}
+      }
+    }
+
+A route without ``model`` follows the session's model (so ``/model`` still
+works); without ``endpoint`` it uses the session's base_url.
+
+The first route whose circuit breaker is closed and whose moving-average
+latency and error rate are within the class limits wins; the others remain
+failover candidates, tried in order when a call fails after its retries.
+Decisions are counted in ``router_decisions`` and per-route averages are
+exported as gauges.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .resilience import get_breaker
+
+INTERACTIVE, TOOL_FOLLOWUP, BACKGROUND = "interactive", "tool_followup", "background"
+CALL_CLASSES = (INTERACTIVE, TOOL_FOLLOWUP, BACKGROUND)
+
+DEFAULT_MAX_LATENCY = {INTERACTIVE: 8.0, TOOL_FOLLOWUP: 8.0, BACKGROUND: 30.0}
+DEFAULT_MAX_ERROR_RATE = 0.5
+EWMA_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str = "default"
+    base_url: Optional[str] = None     # None: the session's base_url
+    model: Optional[str] = None        # None: the session's model
+    api_key_env: Optional[str] = None  # None: the session's OpenAI key
+
+    def resolve(self, config: Any) -> "Route":
+        return Route(
+            name=self.name,
+            base_url=(self.base_url or config.base_url).rstrip("/"),
+            model=self.model or config.model,
+            api_key_env=self.api_key_env,
+        )
+
+    def api_key(self, config: Any) -> str:
+        if self.api_key_env:
+            return os.getenv(self.api_key_env, "")
+        return config.openai_api_key
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.base_url or "", self.model or "")
+
+
+@dataclass
+class ClassPolicy:
+    routes: List[Route] = field(default_factory=lambda: [Route()])
+    max_latency: float = 8.0
+    max_error_rate: float = DEFAULT_MAX_ERROR_RATE
+
+
+Policy = Dict[str, ClassPolicy]
+
+
+def default_policy(background_model: Optional[str] = None) -> Policy:
+    policy = {c: ClassPolicy(max_latency=DEFAULT_MAX_LATENCY[c]) for c in CALL_CLASSES}
+    if background_model:
+        policy[BACKGROUND].routes = [Route(name="background", model=background_model)]
+    return policy
+
+
+def load_policy(path: Path, background_model: Optional[str] = None) -> Policy:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    endpoints: Dict[str, Dict[str, Any]] = data.get("endpoints", {})
+    policy = default_policy(background_model)
+    for call_class, spec in (data.get("classes") or {}).items():
+        if call_class not in CALL_CLASSES:
+            raise ValueError(f"{path}: unknown call class {call_class!r} (expected one of {CALL_CLASSES})")
+        routes = []
+        for i, r in enumerate(spec.get("routes") or []):
+            ep_name = r.get("endpoint")
+            if ep_name is not None and ep_name not in endpoints:
+                raise ValueError(f"{path}: route {i} of {call_class} uses unknown endpoint {ep_name!r}")
+            ep = endpoints.get(ep_name, {}) if ep_name else {}
+            routes.append(Route(
+                name=r.get("name") or ep_name or f"{call_class}-{i}",
+                base_url=r.get("base_url") or ep.get("base_url"),
+                model=r.get("model") or ep.get("model"),
+                api_key_env=r.get("api_key_env") or ep.get("api_key_env"),
+            ))
+        policy[call_class] = ClassPolicy(
+            routes=routes or [Route()],
+            max_latency=float(spec.get("max_latency", DEFAULT_MAX_LATENCY[call_class])),
+            max_error_rate=float(spec.get("max_error_rate", DEFAULT_MAX_ERROR_RATE)),
+        )
+    return policy
+
+
+class RouteStats:
+    """Exponentially weighted latency (seconds) and error rate of one route."""
+
+    __slots__ = ("latency", "error_rate", "calls", "updated")
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.updated = 0.0
+
+    def update(self, seconds: Optional[float], ok: bool):
+        self.calls += 1
+        self.updated = time.monotonic()
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok and seconds is not None:
+            self.latency = seconds if self.latency is None else self.latency + EWMA_ALPHA * (seconds - self.latency)
+
+
+class Router:
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self._stats: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, route: Route) -> RouteStats:
+        with self._lock:
+            st = self._stats.get(route.key)
+            if st is None:
+                st = self._stats[route.key] = RouteStats()
+            return st
+
+    def _healthy(self, route: Route, cp: ClassPolicy, config: Any) -> bool:
+        breaker = get_breaker(route.base_url, route.model, config.breaker_threshold, config.breaker_reset)
+        if breaker.is_open:
+            return False
+        st = self.stats(route)
+        if st.calls and time.monotonic() - st.updated > config.breaker_reset:
+            # A route that lost its traffic gets no new samples: after a
+            # while, give it another chance instead of trusting old numbers
+            return True
+        return st.error_rate <= cp.max_error_rate and (st.latency is None or st.latency <= cp.max_latency)
+
+    def candidates(self, call_class: str, config: Any) -> List[Route]:
+        """Routes to try for one call, best first."""
+        cp = self.policy.get(call_class) or self.policy[INTERACTIVE]
+        routes: List[Route] = []
+        for r in cp.routes:
+            r = r.resolve(config)
+            if all(r.key != o.key for o in routes):
+                routes.append(r)
+        healthy = [r for r in routes if self._healthy(r, cp, config)]
+        # Unhealthy routes stay as a last resort, least bad first
+        rest = sorted(
+            (r for r in routes if r not in healthy),
+            key=lambda r: (self.stats(r).error_rate, self.stats(r).latency or 0.0),
+        )
+        ordered = healthy + rest
+        chosen = ordered[0]
+        metrics.inc(
+            "router_decisions",
+            call_class=call_class,
+            route=chosen.name,
+            model=chosen.model,
+            reason="preferred" if chosen.key == routes[0].key else "failover",
+        )
+        return ordered
+
+    def record(self, route: Route, seconds: Optional[float], ok: bool, call_class: str = ""):
+        st = self.stats(route)
+        with self._lock:
+            st.update(seconds, ok)
+        labels = {"base_url": route.base_url, "model": route.model}
+        if st.latency is not None:
+            metrics.set_gauge("router_latency_ewma_seconds", st.latency, **labels)
+        metrics.set_gauge("router_error_rate", st.error_rate, **labels)
+        if not ok:
+            metrics.inc("router_route_failures", call_class=call_class, route=route.name, model=route.model)
+
+
+_routers: Dict[Tuple[Optional[str], Optional[str]], Router] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(config: Any) -> Router:
+    """Process-wide router for the policy named by config (stats are shared)."""
+    key = (getattr(config, "routes_file", None), getattr(config, "background_model", None))
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            path, background_model = key
+            policy = load_policy(Path(path), background_model) if path else default_policy(background_model)
+            router = _routers[key] = Router(policy)
+        return router
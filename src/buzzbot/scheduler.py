@@ -0,0 +1,375 @@
+"""Long-running content daemon: plans clip production against daily targets.
+
+Targets are clips per day per platform (``tiktok=3``). Each day every
+platform gets that many publish slots spread evenly over the publish window
+(09:00-22:00 by default); a slot is dispatched once its time has passed, no
+sooner than the platform's minimum gap after the previous upload and never
+above its daily cap. A rendered clip is published once to every target
+platform before it leaves the buffer; a failed upload is retried after
+``FAILURE_BACKOFF``, and after ``PUBLISH_ATTEMPTS`` failures that platform is
+skipped for the clip so it cannot block the platform's queue.
+
+Upstream of publishing, the daemon keeps two buffers in the pipeline store
+(``data/pipeline.db``, see pipeline.py):
+
+- ideas (items waiting for ``render``), refilled by batched ideation;
+- rendered clips (items waiting for ``publish``), refilled one Veo3 render at
+  a time, at most ``veo3_quota`` per day and paced ``24h / quota`` apart so
+  the quota is spread over the day instead of burnt in a burst.
+
+Counters for the current day (renders, uploads per platform, last upload
+times) are kept in ``data/scheduler_state.json``; together with the
+pipeline store this lets the daemon be stopped and restarted at any time.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .config import APP_SAVING_DIR
+from .pipeline import DEFAULT_DB_PATH, PipelineStore, Stage, clip_steps, rendition_for, run_stage
+
+DEFAULT_STATE_PATH = APP_SAVING_DIR / "scheduler_state.json"
+
+# Our own caps per platform account, kept well below what gets accounts flagged
+PLATFORM_LIMITS: Dict[str, Dict[str, float]] = {
+    "tiktok": {"max_per_day": 6, "min_gap": 60 * 60},
+}
+DEFAULT_LIMITS = {"max_per_day": 10, "min_gap": 30 * 60}
+
+# Wait this long after a failed ideation / render / upload before trying again
+FAILURE_BACKOFF = 10 * 60
+# Uploads of one clip to one platform before that platform is given up
+PUBLISH_ATTEMPTS = 3
+
+# publish(video_path, title); returning False means the upload failed
+Publisher = Callable[[str, str], Optional[bool]]
+
+
+def parse_targets(spec: str) -> Dict[str, int]:
+    """"tiktok=3,youtube=1" -> {"tiktok": 3, "youtube": 1}."""
+    targets: Dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, n = part.partition("=")
+        targets[name.strip().lower()] = int(n or 1)
+    return targets
+
+
+def parse_window(spec: str) -> Tuple[float, float]:
+    """"9-22" or "8:30-21" -> hours since midnight."""
+    def hours(s: str) -> float:
+        h, _, m = s.strip().partition(":")
+        return int(h) + int(m or 0) / 60
+
+    start, _, end = spec.partition("-")
+    lo, hi = hours(start), hours(end)
+    if not 0 <= lo < hi <= 24:
+        raise ValueError(f"invalid publish window {spec!r}")
+    return lo, hi
+
+
+@dataclass
+class ScheduleState:
+    day: str = ""
+    renders: int = 0
+    published: Dict[str, int] = field(default_factory=dict)
+    last_render: float = 0.0
+    last_publish: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "ScheduleState":
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.__dict__, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def default_publishers(targets: Dict[str, int], dry_run: bool = False) -> Dict[str, Publisher]:
+    publishers: Dict[str, Publisher] = {}
+    for platform in targets:
+        if dry_run:
+            publishers[platform] = lambda path, title, p=platform: print(f"[daemon] (dry run) {p}: {title} <- {path}")
+        elif platform == "tiktok":
+            from .publish.tiktok import TikTokPublisher
+            publishers[platform] = TikTokPublisher().publish_video
+        else:
+            raise ValueError(f"no publisher for platform {platform!r}")
+    return publishers
+
+
+class ContentScheduler:
+    def __init__(
+        self,
+        steps: Dict[str, Callable[..., Any]],
+        publishers: Dict[str, Publisher],
+        targets: Dict[str, int],
+        store: PipelineStore,
+        veo3_quota: int = 10,
+        window: Tuple[float, float] = (9.0, 22.0),
+        clip_buffer: Optional[int] = None,
+        idea_buffer: Optional[int] = None,
+        state_path: Path = DEFAULT_STATE_PATH,
+        clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+    ):
+        self.steps = steps
+        self.publishers = publishers
+        self.targets = targets
+        self.store = store
+        self.veo3_quota = max(0, veo3_quota)
+        self.window = window
+        # A day of publishing demand, ready ahead of time
+        self.clip_buffer = clip_buffer if clip_buffer is not None else max(targets.values(), default=1)
+        self.idea_buffer = idea_buffer if idea_buffer is not None else self.clip_buffer
+        self.state_path = Path(state_path)
+        self.state = ScheduleState.load(self.state_path)
+        self.clock = clock
+        self.limits = {p: {**DEFAULT_LIMITS, **PLATFORM_LIMITS.get(p, {})} for p in targets}
+        self._render_thread: Optional[threading.Thread] = None
+        self._state_lock = threading.Lock()
+        self._retry_ideate_at = 0.0
+        self._retry_render_at = 0.0
+        # _roll_day only sets it on a new day, not after a same-day restart
+        from . import veo3
+
+        veo3.set_query_limit(self.veo3_quota)
+        # Items interrupted mid-stage by a previous run go back in line
+        store.unfinished()
+
+    # Planning -------------------------------------------------------------
+    def slots(self, platform: str, day: datetime.date) -> List[datetime.datetime]:
+        n = min(self.targets.get(platform, 0), int(self.limits[platform]["max_per_day"]))
+        if n <= 0:
+            return []
+        lo, hi = self.window
+        span = (hi - lo) / n
+        midnight = datetime.datetime.combine(day, datetime.time())
+        return [midnight + datetime.timedelta(hours=lo + (i + 0.5) * span) for i in range(n)]
+
+    @property
+    def render_interval(self) -> float:
+        return 24 * 3600 / self.veo3_quota if self.veo3_quota else float("inf")
+
+    def _save(self):
+        with self._state_lock:
+            self.state.save(self.state_path)
+
+    def _roll_day(self, now: datetime.datetime):
+        today = now.date().isoformat()
+        if self.state.day == today:
+            return
+        from . import veo3
+
+        with self._state_lock:
+            self.state.day = today
+            self.state.renders = 0
+            self.state.published = {}
+        veo3.reset_query_count(self.veo3_quota)
+        self._save()
+
+    # Steps ----------------------------------------------------------------
+    def _publish_due(self, now: datetime.datetime):
+        ts = now.timestamp()
+        for platform in self.targets:
+            done = self.state.published.get(platform, 0)
+            due = sum(1 for slot in self.slots(platform, now.date()) if slot <= now)
+            if done >= due or ts - self.state.last_publish.get(platform, 0.0) < self.limits[platform]["min_gap"]:
+                continue
+            item = next((i for i in self.store.queued("publish") if self._can_publish(i["data"], platform, ts)), None)
+            if item is None:
+                metrics.inc("scheduler_slot_waits", platform=platform)
+                continue
+            data = dict(item["data"])
+            start = time.perf_counter()
+            try:
+                data.update(self._publish_one(platform, data))
+            except Exception as e:
+                self._publish_failed(item, platform, data, str(e) or type(e).__name__, time.perf_counter() - start, ts)
+                continue
+            if self._pending_platforms(data):
+                # Stays in the publish buffer for the other platforms
+                self.store.update_data(item["id"], data)
+            else:
+                self.store.advance(item["id"], "publish", None, data, time.perf_counter() - start)
+            item["data"] = data
+            with self._state_lock:
+                self.state.published[platform] = done + 1
+                self.state.last_publish[platform] = ts
+            self._save()
+
+    def _can_publish(self, data: Dict[str, Any], platform: str, ts: float) -> bool:
+        return (
+            platform not in data.get("published_to", [])
+            and platform not in data.get("publish_failed", [])
+            and data.get("publish_retry_at", {}).get(platform, 0.0) <= ts
+        )
+
+    def _pending_platforms(self, data: Dict[str, Any]) -> List[str]:
+        done = set(data.get("published_to", [])) | set(data.get("publish_failed", []))
+        return [p for p in self.targets if p not in done]
+
+    def _publish_failed(self, item: Dict[str, Any], platform: str, data: Dict[str, Any],
+                        error: str, seconds: float, ts: float):
+        """Count a failed upload against (clip, platform): back off, and give
+        the platform up after PUBLISH_ATTEMPTS so the clip stops blocking it."""
+        attempts = {**data.get("publish_attempts", {})}
+        attempts[platform] = attempts.get(platform, 0) + 1
+        data["publish_attempts"] = attempts
+        metrics.inc("scheduler_publish_failures", platform=platform)
+        if attempts[platform] >= PUBLISH_ATTEMPTS:
+            data["publish_failed"] = [*data.get("publish_failed", []), platform]
+            print(f"[daemon] giving up publishing {item['id']} to {platform}: {error}", file=sys.stderr)
+        else:
+            data["publish_retry_at"] = {**data.get("publish_retry_at", {}), platform: ts + FAILURE_BACKOFF}
+            print(f"[daemon] publishing {item['id']} to {platform} failed (attempt {attempts[platform]}): {error}",
+                  file=sys.stderr)
+        item["data"] = data
+        if self._pending_platforms(data):
+            self.store.update_data(item["id"], data)
+            self.store.fail(item["id"], "publish", error, seconds, final=False)
+        elif data.get("published_to"):
+            # Published where it could be: done, with the failures kept in data
+            self.store.advance(item["id"], "publish", None, data, seconds)
+        else:
+            self.store.update_data(item["id"], data)
+            self.store.fail(item["id"], "publish", error, seconds, final=True)
+
+    def _publish_one(self, platform: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if self.publishers[platform](rendition_for(data, platform), data["title"]) is False:
+            raise RuntimeError(f"{platform} upload failed")
+        metrics.inc("scheduler_published", platform=platform)
+        return {"published_to": [*data.get("published_to", []), platform]}
+
+    def _render_next(self):
+        # Finish a post-process interrupted by a restart before rendering more
+        for item in self.store.queued("postprocess"):
+            run_stage(self.store, item, Stage("postprocess", self.steps["postprocess"]), "publish")
+        ideas = self.store.queued("render", limit=1)
+        if not ideas:
+            return
+        item = ideas[0]
+        if run_stage(self.store, item, Stage("render", self.steps["render"]), "postprocess"):
+            metrics.inc("scheduler_renders", status="ok")
+            run_stage(self.store, item, Stage("postprocess", self.steps["postprocess"]), "publish")
+        else:
+            metrics.inc("scheduler_renders", status="failed")
+            self._retry_render_at = time.time() + FAILURE_BACKOFF
+
+    def _maybe_render(self, now: datetime.datetime):
+        if self._render_thread is not None and self._render_thread.is_alive():
+            return
+        ts = now.timestamp()
+        if (
+            len(self.store.queued("publish")) + len(self.store.queued("postprocess")) >= self.clip_buffer
+            or self.state.renders >= self.veo3_quota
+            or ts - self.state.last_render < self.render_interval
+            or time.time() < self._retry_render_at
+            or not self.store.queued("render", limit=1)
+        ):
+            return
+        with self._state_lock:
+            self.state.renders += 1
+            self.state.last_render = ts
+        self._save()
+        self._render_thread = threading.Thread(target=self._render_next, name="daemon-render", daemon=True)
+        self._render_thread.start()
+
+    def _maybe_ideate(self):
+        missing = self.idea_buffer - len(self.store.queued("render"))
+        if missing <= 0 or time.time() < self._retry_ideate_at:
+            return
+        try:
+            ideas = self.steps["ideate"](missing)
+        except Exception as e:
+            print(f"[daemon] ideation failed: {e}", file=sys.stderr)
+            ideas = []
+        if not ideas:
+            self._retry_ideate_at = time.time() + FAILURE_BACKOFF
+        for data in ideas:
+            self.store.add("render", data)
+
+    def step(self):
+        """One planning round: publish what is due, then refill the buffers."""
+        now = self.clock()
+        self._roll_day(now)
+        self._publish_due(now)
+        self._maybe_ideate()
+        self._maybe_render(now)
+        metrics.set_gauge("scheduler_buffer", len(self.store.queued("render")), kind="ideas")
+        metrics.set_gauge("scheduler_buffer", len(self.store.queued("publish")), kind="clips")
+
+    def status(self) -> str:
+        now = self.clock()
+        parts = [
+            f"ideas={len(self.store.queued('render'))}",
+            f"clips={len(self.store.queued('publish'))}",
+            f"renders={self.state.renders}/{self.veo3_quota}",
+        ]
+        for platform in self.targets:
+            nxt = next((s for s in self.slots(platform, now.date()) if s > now), None)
+            parts.append(
+                f"{platform}={self.state.published.get(platform, 0)}/{self.targets[platform]}"
+                + (f" next {nxt:%H:%M}" if nxt else "")
+            )
+        return " ".join(parts)
+
+    def run(self, tick: float = 30.0):
+        print(f"[daemon] started: {self.status()}", file=sys.stderr)
+        last_status = ""
+        try:
+            while True:
+                try:
+                    self.step()
+                except Exception as e:  # keep the daemon alive; the next tick retries
+                    print(f"[daemon] step failed: {e}", file=sys.stderr)
+                status = self.status()
+                if status != last_status:
+                    print(f"[daemon] {self.clock():%H:%M:%S} {status}", file=sys.stderr)
+                    last_status = status
+                time.sleep(tick)
+        except KeyboardInterrupt:
+            print("[daemon] stopping (state saved; an interrupted render is retried on restart)", file=sys.stderr)
+
+
+def main_daemon(config, targets: Optional[List[str]] = None, quota: Optional[int] = None,
+                window_spec: Optional[str] = None, dry_run: bool = False, tick: float = 30.0) -> int:
+    """Entry point for ``--daemon``; CLI values override the config ones."""
+    from .chat import ChatSession
+
+    targets = parse_targets(",".join(targets) if targets else config.daemon_targets)
+    quota = quota if quota is not None else config.veo3_daily_quota
+    if not targets:
+        print("[error] no publishing targets (e.g. --target tiktok=3)")
+        return 1
+    session = ChatSession(config=config)
+    session.echo = False
+    store = PipelineStore(DEFAULT_DB_PATH)
+    try:
+        scheduler = ContentScheduler(
+            clip_steps(session, platforms=list(targets)),
+            default_publishers(targets, dry_run=dry_run),
+            targets,
+            store,
+            veo3_quota=quota,
+            window=parse_window(window_spec or config.publish_window),
+        )
+        scheduler.run(tick=tick)
+    finally:
+        store.close()
+    return 0
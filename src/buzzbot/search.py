@@ -0,0 +1,174 @@
+"""Full-text search over chat history (SQLite FTS5).
+
+``message_fts`` is an external-content FTS5 table over ``message_db``: the
+text lives only once (in ``message_db``) and SQLite triggers keep the index in
+sync on every insert, update and delete, in the same transaction as the write.
+``/chat`` therefore needs no extra round-trip and indexing cost is a few
+microseconds per message.
+
+Backfill / rebuild an existing database::
+
+    PYTHONPATH=src python -m buzzbot.search --rebuild [--db src/instance/buzzbot.db]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+
+FTS_TABLE = "message_fts"
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / "instance" / "buzzbot.db"
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, session_id UNINDEXED, role UNINDEXED,
+        content='message_db', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_ai AFTER INSERT ON message_db BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, session_id, role)
+        VALUES (new.id, new.content, new.session_id, new.role);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_ad AFTER DELETE ON message_db BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, session_id, role)
+        VALUES ('delete', old.id, old.content, old.session_id, old.role);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_au AFTER UPDATE ON message_db BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, session_id, role)
+        VALUES ('delete', old.id, old.content, old.session_id, old.role);
+        INSERT INTO {FTS_TABLE}(rowid, content, session_id, role)
+        VALUES (new.id, new.content, new.session_id, new.role);
+    END""",
+]
+
+
+def fts5_available(conn) -> bool:
+    try:
+        rows = conn.execute(text("PRAGMA compile_options")).fetchall()
+    except Exception:
+        return False
+    return any("ENABLE_FTS5" in r[0] for r in rows)
+
+
+def ensure_fts(engine) -> bool:
+    """Create the FTS table + triggers if missing; backfill on first creation.
+
+    Returns False (search disabled) on non-SQLite databases or SQLite builds
+    without FTS5.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        if not fts5_available(conn):
+            return False
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}
+        ).first()
+        for stmt in _DDL:
+            conn.execute(text(stmt))
+        if not existed:
+            rebuild(conn)
+    return True
+
+
+def rebuild(conn) -> int:
+    """Re-index every row of message_db; returns the number of messages."""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return conn.execute(text("SELECT count(*) FROM message_db")).scalar() or 0
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(q: str) -> Optional[str]:
+    """Turn free user text into a safe FTS5 MATCH expression.
+
+    Every word must match (implicit AND); the last one is a prefix so results
+    show up while typing. FTS5 operators in the input are neutralised by quoting.
+    """
+    tokens = _TOKEN.findall(q or "")
+    if not tokens:
+        return None
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(conn, q: str, limit: int = 20, session_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Ranked message hits (bm25) with snippets, grouped by session."""
+    expr = match_query(q)
+    if expr is None:
+        return {"query": q, "sessions": [], "messages": []}
+    sql = f"""
+        SELECT m.id, m.session_id, m.role, m.timestamp,
+               snippet({FTS_TABLE}, 0, '[', ']', '…', 12) AS snippet,
+               bm25({FTS_TABLE}) AS rank,
+               s.title
+        FROM {FTS_TABLE}
+        JOIN message_db m ON m.id = {FTS_TABLE}.rowid
+        LEFT JOIN chat_session_db s ON s.session_id = m.session_id
+        WHERE {FTS_TABLE} MATCH :q
+    """
+    params: Dict[str, Any] = {"q": expr, "limit": limit}
+    if session_ids is not None:
+        if not session_ids:
+            return {"query": q, "sessions": [], "messages": []}
+        keys = [f":s{i}" for i in range(len(session_ids))]
+        sql += f" AND m.session_id IN ({', '.join(keys)})"
+        params.update({f"s{i}": sid for i, sid in enumerate(session_ids)})
+    sql += " ORDER BY rank LIMIT :limit"
+    rows = conn.execute(text(sql), params).fetchall()
+
+    messages = []
+    sessions: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        # bm25 is "lower is better" and negative; expose a positive score
+        score = -float(r.rank)
+        hit = {
+            "message_id": r.id,
+            "session_id": r.session_id,
+            "role": r.role,
+            "snippet": r.snippet,
+            "timestamp": str(r.timestamp) if r.timestamp is not None else None,
+            "score": score,
+        }
+        messages.append(hit)
+        entry = sessions.setdefault(r.session_id, {
+            "id": r.session_id,
+            "title": r.title,
+            "score": 0.0,
+            "hits": 0,
+        })
+        entry["score"] += score
+        entry["hits"] += 1
+    ranked = sorted(sessions.values(), key=lambda s: s["score"], reverse=True)
+    return {"query": q, "sessions": ranked, "messages": messages}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="buzzbot.search", description="Maintain the chat history search index.")
+    p.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help=f"SQLite database (default: {DEFAULT_DB_PATH})")
+    p.add_argument("--rebuild", action="store_true", help="Create the index if needed and re-index every message")
+    p.add_argument("query", nargs="?", help="Run a search and print the hits")
+    args = p.parse_args(argv)
+    if not args.db.exists():
+        print(f"[error] database not found: {args.db}")
+        return 1
+    engine = create_engine(f"sqlite:///{args.db}")
+    if not ensure_fts(engine):
+        print("[error] this SQLite build has no FTS5 support")
+        return 1
+    with engine.begin() as conn:
+        if args.rebuild:
+            print(f"Indexed {rebuild(conn)} messages")
+        if args.query:
+            for hit in search(conn, args.query)["messages"]:
+                print(f"{hit['score']:6.2f}  {hit['session_id'][:8]}  {hit['role']:<9} {hit['snippet']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
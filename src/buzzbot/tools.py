@@ -0,0 +1,338 @@
+"""Declarative tool registry for ChatSession function calling.
+
+A tool is a plain function registered once with ``@tool``::
+
+    @tool(description="Roll N dice", params={"n": "How many dice"}, cacheable=False)
+    def roll_dice(n: int = 1) -> str:
+        ...
+
+At registration the JSON schema is derived from the signature (``str``,
+``int``, ``float``, ``bool``, ``List[...]``, ``Optional[...]``; parameters
+without a default are required) and cached, together with a precompiled
+argument validator. ``params`` maps a parameter to its description, or to a
+dict merged into its property schema. A first parameter named ``session``
+receives the calling ChatSession and is not exposed to the model.
+
+Per-tool metadata is used by :meth:`ToolRegistry.call` and the tool loop:
+
+- ``timeout``: seconds before the call is abandoned with an error result.
+- ``parallel_safe``: may run concurrently with the other calls of a round.
+- ``cacheable``: results are memoized per arguments (deterministic tools only).
+- ``cost``: relative cost units, added to the ``tool_cost`` counter.
+- ``deferred``: long-running; ChatSession runs it as a background job (jobs.py)
+  and gives the model a pending handle instead of waiting.
+"""
+from __future__ import annotations
+
+import inspect
+import json
+import threading
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from . import metrics
+
+_JSON_TYPES: Dict[Any, str] = {str: "string", int: "integer", float: "number", bool: "boolean"}
+_PY_TYPES: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+_MISSING = object()
+
+
+class ToolArgumentError(ValueError):
+    """Arguments sent by the model do not match the tool's schema."""
+
+
+def _type_schema(annotation: Any) -> Tuple[Dict[str, Any], bool]:
+    """(JSON schema, optional) for a parameter annotation."""
+    optional = False
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        optional = len(args) < len(typing.get_args(annotation))
+        annotation = args[0] if len(args) == 1 else Any
+        origin = typing.get_origin(annotation)
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}, optional
+    if origin in (list, List) or annotation is list:
+        (item,) = typing.get_args(annotation) or (Any,)
+        schema: Dict[str, Any] = {"type": "array"}
+        if item in _JSON_TYPES:
+            schema["items"] = {"type": _JSON_TYPES[item]}
+        return schema, optional
+    if origin in (dict, Dict) or annotation is dict:
+        return {"type": "object"}, optional
+    return {}, optional
+
+
+def _compile_validator(
+    name: str, properties: Dict[str, Dict[str, Any]], required: List[str]
+) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    """Build a validator closing over flat (name, types, item types) tuples so
+    each call is a few isinstance checks, not a schema walk."""
+    checks = []
+    for pname, schema in properties.items():
+        types = _PY_TYPES.get(schema.get("type", ""))
+        items = _PY_TYPES.get((schema.get("items") or {}).get("type", ""))
+        checks.append((pname, types, items, pname in required))
+    allowed = frozenset(properties)
+
+    def validate(args: Mapping[str, Any]) -> Dict[str, Any]:
+        unknown = set(args) - allowed
+        if unknown:
+            raise ToolArgumentError(f"unexpected argument(s) for {name}: {', '.join(sorted(unknown))}")
+        out: Dict[str, Any] = {}
+        for pname, types, items, req in checks:
+            value = args.get(pname, _MISSING)
+            if value is _MISSING or value is None:
+                if req:
+                    raise ToolArgumentError(f"missing required argument '{pname}' for {name}")
+                continue
+            # bool is an int subclass: never accept it for integer/number
+            if types is not None and (
+                not isinstance(value, types) or (isinstance(value, bool) and bool not in types)
+            ):
+                raise ToolArgumentError(f"argument '{pname}' of {name} must be {types[0].__name__}")
+            if items is not None and any(not isinstance(v, items) for v in value):
+                raise ToolArgumentError(f"items of '{pname}' of {name} must be {items[0].__name__}")
+            out[pname] = value
+        return out
+
+    return validate
+
+
+@dataclass(frozen=True)
+class Tool:
+    name: str
+    fn: Callable[..., Any]
+    description: str
+    parameters: Dict[str, Any]
+    validate: Callable[[Mapping[str, Any]], Dict[str, Any]] = field(repr=False)
+    wants_session: bool = False
+    timeout: Optional[float] = None
+    parallel_safe: bool = True
+    cacheable: bool = False
+    cost: float = 0.0
+    deferred: bool = False
+
+    @property
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+
+
+def _param_hints(fn: Callable[..., Any], sig: inspect.Signature, skip: Optional[str]) -> Dict[str, Any]:
+    """Resolve annotations one by one: the session parameter may name a class
+    that is not defined yet when the decorator runs."""
+    hints: Dict[str, Any] = {}
+    for pname, p in sig.parameters.items():
+        if pname == skip or p.annotation is p.empty:
+            continue
+        ann = p.annotation
+        if isinstance(ann, str):
+            ann = eval(ann, getattr(fn, "__globals__", {}))  # noqa: S307 - our own annotations
+        hints[pname] = ann
+    return hints
+
+
+def build_tool(
+    fn: Callable[..., Any],
+    name: Optional[str] = None,
+    description: Optional[str] = None,
+    params: Optional[Mapping[str, Any]] = None,
+    **meta: Any,
+) -> Tool:
+    sig = inspect.signature(fn)
+    names = list(sig.parameters)
+    wants_session = bool(names) and names[0] == "session"
+    hints = _param_hints(fn, sig, skip="session" if wants_session else None)
+    properties: Dict[str, Dict[str, Any]] = {}
+    required: List[str] = []
+    for pname, p in sig.parameters.items():
+        if wants_session and pname == "session":
+            continue
+        if p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD):
+            raise TypeError(f"tool {fn.__name__}: *args/**kwargs are not supported")
+        schema, optional = _type_schema(hints.get(pname, Any))
+        extra = (params or {}).get(pname)
+        if isinstance(extra, str):
+            schema["description"] = extra
+        elif extra:
+            schema.update(extra)
+        if p.default is p.empty and not optional:
+            required.append(pname)
+        elif p.default is not p.empty and p.default is not None and "default" not in schema:
+            schema["default"] = p.default
+        properties[pname] = schema
+    parameters: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    parameters["additionalProperties"] = False
+    doc = inspect.getdoc(fn) or ""
+    tool_name = name or fn.__name__
+    return Tool(
+        name=tool_name,
+        fn=fn,
+        description=description or " ".join(doc.split("\n\n")[0].split()),
+        parameters=parameters,
+        validate=_compile_validator(tool_name, properties, required),
+        wants_session=wants_session,
+        **meta,
+    )
+
+
+class ToolRegistry:
+    def __init__(self, cache_size: int = 256):
+        self._tools: Dict[str, Tool] = {}
+        self._specs: Optional[List[Dict[str, Any]]] = None
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def register(
+        self,
+        fn: Optional[Callable[..., Any]] = None,
+        *,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        params: Optional[Mapping[str, Any]] = None,
+        timeout: Optional[float] = None,
+        parallel_safe: bool = True,
+        cacheable: bool = False,
+        cost: float = 0.0,
+        deferred: bool = False,
+    ):
+        """Decorator (bare or with options); returns the function unchanged."""
+
+        def decorate(f: Callable[..., Any]) -> Callable[..., Any]:
+            t = build_tool(
+                f, name, description, params,
+                timeout=timeout, parallel_safe=parallel_safe, cacheable=cacheable, cost=cost,
+                deferred=deferred,
+            )
+            with self._lock:
+                self._tools[t.name] = t
+                self._specs = None
+            return f
+
+        return decorate(fn) if fn is not None else decorate
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._tools.pop(name, None)
+            self._specs = None
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[Tool]:
+        return iter(list(self._tools.values()))
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def specs(self) -> List[Dict[str, Any]]:
+        """OpenAI ``tools=`` payload, built once per registry change."""
+        specs = self._specs
+        if specs is None:
+            with self._lock:
+                specs = self._specs = [t.spec for t in self._tools.values()]
+        return specs
+
+    def parallel_safe(self, names: List[str]) -> bool:
+        return all((t := self._tools.get(n)) is not None and t.parallel_safe for n in names)
+
+    # Execution ------------------------------------------------------------
+    def check(self, name: str, arguments: Optional[str]) -> Optional[str]:
+        """Error text for an unknown tool or invalid arguments, else None."""
+        if name not in self._tools:
+            return f"<error: unknown function {name}>"
+        try:
+            self._parse(self._tools[name], arguments)
+        except (ValueError, TypeError) as e:
+            return f"<error: invalid arguments for {name}: {e}>"
+        return None
+
+    @staticmethod
+    def _parse(t: Tool, arguments: Optional[str]) -> Dict[str, Any]:
+        raw = json.loads(arguments or "{}")
+        if not isinstance(raw, dict):
+            raise ToolArgumentError(f"arguments for {t.name} must be a JSON object")
+        return t.validate(raw)
+
+    def call(self, name: str, arguments: Optional[str], session: Any = None) -> str:
+        """Run a tool for the model; failures come back as ``<error ...>`` text."""
+        t = self._tools.get(name)
+        if t is None:
+            return f"<error: unknown function {name}>"
+        try:
+            kwargs = self._parse(t, arguments)
+        except (ValueError, TypeError) as e:  # JSONDecodeError is a ValueError
+            metrics.inc("tool_errors", tool=name, reason="arguments")
+            return f"<error: invalid arguments for {name}: {e}>"
+
+        cache_key = None
+        if t.cacheable:
+            cache_key = (name, json.dumps(kwargs, sort_keys=True))
+            with self._lock:
+                hit = self._cache.get(cache_key)
+                if hit is not None:
+                    self._cache.move_to_end(cache_key)
+                    metrics.inc("tool_cache_hits", tool=name)
+                    return hit
+
+        if t.wants_session:
+            kwargs["session"] = session
+        start = time.perf_counter()
+        metrics.inc("tool_calls", tool=name)
+        if t.cost:
+            metrics.inc("tool_cost", t.cost, tool=name)
+        try:
+            if t.timeout is None:
+                result = str(t.fn(**kwargs))
+            else:
+                result = str(self._executor().submit(t.fn, **kwargs).result(timeout=t.timeout))
+        except FutureTimeout:
+            metrics.inc("tool_errors", tool=name, reason="timeout")
+            return f"<error: {name} timed out after {t.timeout:g}s>"
+        except Exception as e:
+            metrics.inc("tool_errors", tool=name, reason="exception")
+            return f"<error executing {name}: {e}>"
+        finally:
+            metrics.observe("tool_seconds", time.perf_counter() - start, tool=name)
+
+        if cache_key is not None:
+            with self._lock:
+                self._cache[cache_key] = result
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Timed-out calls keep running in their worker; the pool just stops waiting
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="buzzbot-tool")
+        return self._pool
+
+
+registry = ToolRegistry()
+tool = registry.register
@@ -0,0 +1,231 @@
+"""Per-platform renditions of generated videos, encoded once and cached.
+
+A ``Profile`` describes what a platform accepts (canvas size and aspect
+ratio, frame rate, bitrate cap, maximum duration and file size). ``Transcoder``
+turns a source video into the rendition for a profile with ffmpeg
+(``libx264`` at constant quality with a fast preset, the video bitrate capped
+at ``max_kbps``, AAC audio, ``+faststart``), letterboxing
+instead of cropping so nothing Veo3 rendered is cut off.
+
+Renditions are cached in ``data/renditions`` under
+``<source sha256>-<profile>-<profile hash>.mp4``: the same video is never
+encoded twice for a platform, and changing a profile's settings produces
+new files instead of serving stale ones. Source hashes are memoized by
+(path, size, mtime). Encodes run in a pool with one worker per CPU, each
+ffmpeg limited to one thread, and concurrent requests for the same
+rendition share one encode. A rendition above the profile's size limit is
+an error here rather than a failed upload later.
+
+``BUZZBOT_TRANSCODE`` (``auto`` by default: on when ffmpeg is found, ``0`` to
+disable) and ``BUZZBOT_FFMPEG`` (binary path) control it.
+
+CLI:
+  PYTHONPATH=src python -m buzzbot.transcode data/video_tests/clip.mp4 --profile tiktok --profile youtube_shorts
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import metrics
+from .config import APP_SAVING_DIR
+
+DEFAULT_CACHE_DIR = APP_SAVING_DIR / "renditions"
+FFMPEG = os.getenv("BUZZBOT_FFMPEG", "ffmpeg")
+
+
+class TranscodeError(RuntimeError):
+    """ffmpeg failed, or the rendition does not fit the profile."""
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    width: int = 1080
+    height: int = 1920
+    fps: int = 30
+    max_kbps: int = 8000         # cap on the CRF encode (-maxrate)
+    audio_kbps: int = 128
+    max_duration: float = 180.0  # seconds; longer sources are cut
+    max_size_mb: float = 250.0
+    preset: str = "veryfast"
+    crf: int = 21
+
+    @property
+    def key(self) -> str:
+        """Hash of the encoding settings, part of the cache file name."""
+        return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:8]
+
+
+PROFILES: Dict[str, Profile] = {
+    p.name: p
+    for p in (
+        Profile("tiktok", max_duration=600.0, max_size_mb=250.0),
+        Profile("instagram_reels", max_kbps=6000, max_duration=90.0, max_size_mb=100.0),
+        Profile("youtube_shorts", max_kbps=10000, max_duration=60.0, max_size_mb=256.0),
+    )
+}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG) is not None
+
+
+def transcoding_enabled() -> bool:
+    mode = os.getenv("BUZZBOT_TRANSCODE", "auto").lower()
+    if mode in ("0", "false", "no", "off"):
+        return False
+    return ffmpeg_available()
+
+
+def ffmpeg_command(src: Path, out: Path, profile: Profile, threads: int = 1) -> List[str]:
+    w, h = profile.width, profile.height
+    vf = (
+        f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={profile.fps}"
+    )
+    return [
+        FFMPEG, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", str(src),
+        "-t", f"{profile.max_duration:g}",
+        "-vf", vf,
+        "-c:v", "libx264", "-preset", profile.preset, "-crf", str(profile.crf),
+        "-maxrate", f"{profile.max_kbps}k", "-bufsize", f"{profile.max_kbps * 2}k",
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", f"{profile.audio_kbps}k",
+        "-movflags", "+faststart",
+        "-threads", str(threads),
+        str(out),
+    ]
+
+
+class Transcoder:
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, workers: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="buzzbot-ffmpeg")
+        self._inflight: Dict[Path, Future] = {}
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def source_hash(self, src: Path) -> str:
+        st = src.stat()
+        key = (str(src.resolve()), st.st_size, st.st_mtime_ns)
+        cached = self._hashes.get(key)
+        if cached is not None:
+            return cached
+        digest = hashlib.sha256()
+        with src.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        value = digest.hexdigest()
+        self._hashes[key] = value
+        return value
+
+    def rendition_path(self, src: Path, profile: Profile) -> Path:
+        return self.cache_dir / f"{self.source_hash(src)[:16]}-{profile.name}-{profile.key}.mp4"
+
+    def submit(self, src: Path, profile: Profile | str) -> "Future[Path]":
+        """Future of the rendition path; cached renditions resolve immediately."""
+        profile = PROFILES[profile] if isinstance(profile, str) else profile
+        src = Path(src)
+        out = self.rendition_path(src, profile)
+        with self._lock:
+            if out.exists():
+                metrics.inc("transcode_cache", profile=profile.name, result="hit")
+                done: "Future[Path]" = Future()
+                done.set_result(out)
+                return done
+            fut = self._inflight.get(out)
+            if fut is None:
+                metrics.inc("transcode_cache", profile=profile.name, result="miss")
+                fut = self._pool.submit(self._encode, src, out, profile)
+                self._inflight[out] = fut
+                fut.add_done_callback(lambda _f, k=out: self._forget(k))
+            return fut
+
+    def _forget(self, out: Path):
+        with self._lock:
+            self._inflight.pop(out, None)
+
+    def transcode(self, src: Path, profile: Profile | str) -> Path:
+        return self.submit(src, profile).result()
+
+    def renditions(self, src: Path, profiles: List[str]) -> Dict[str, Path]:
+        """Renditions for several profiles, encoded in parallel."""
+        futures = {name: self.submit(src, name) for name in profiles}
+        return {name: fut.result() for name, fut in futures.items()}
+
+    def _encode(self, src: Path, out: Path, profile: Profile) -> Path:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(out.stem + ".part.mp4")
+        start = time.perf_counter()
+        proc = subprocess.run(ffmpeg_command(src, tmp, profile), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True)
+        seconds = time.perf_counter() - start
+        metrics.observe("transcode_seconds", seconds, profile=profile.name)
+        if proc.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            metrics.inc("transcode_errors", profile=profile.name, reason="ffmpeg")
+            raise TranscodeError(f"ffmpeg failed for {src.name} ({profile.name}): {proc.stderr.strip()[-500:]}")
+        size_mb = tmp.stat().st_size / (1 << 20)
+        if size_mb > profile.max_size_mb:
+            tmp.unlink(missing_ok=True)
+            metrics.inc("transcode_errors", profile=profile.name, reason="size")
+            raise TranscodeError(f"{src.name}: {profile.name} rendition is {size_mb:.0f} MB (limit {profile.max_size_mb:g} MB)")
+        os.replace(tmp, out)
+        return out
+
+
+_transcoder: Optional[Transcoder] = None
+_transcoder_lock = threading.Lock()
+
+
+def get_transcoder() -> Transcoder:
+    global _transcoder
+    with _transcoder_lock:
+        if _transcoder is None:
+            _transcoder = Transcoder()
+        return _transcoder
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="buzzbot.transcode", description="Encode per-platform renditions of a video.")
+    p.add_argument("video", type=Path, nargs="?")
+    p.add_argument("--profile", action="append", default=None, help=f"one of {', '.join(PROFILES)} (repeatable; default all)")
+    p.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    p.add_argument("--list", action="store_true", help="show the profiles and exit")
+    args = p.parse_args(argv)
+    if args.list or args.video is None:
+        for prof in PROFILES.values():
+            print(f"{prof.name:<16}{prof.width}x{prof.height}@{prof.fps} crf {prof.crf} (max {prof.max_kbps}k) "
+                  f"<= {prof.max_duration:g}s, <= {prof.max_size_mb:g} MB")
+        return 0
+    if not ffmpeg_available():
+        print(f"[error] ffmpeg not found ({FFMPEG}); set BUZZBOT_FFMPEG")
+        return 1
+    transcoder = Transcoder(args.cache_dir)
+    start = time.perf_counter()
+    try:
+        out = transcoder.renditions(args.video, args.profile or list(PROFILES))
+    except TranscodeError as e:
+        print(f"[error] {e}")
+        return 1
+    for name, path in out.items():
+        print(f"{name:<16}{path}")
+    print(f"done in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,7 @@ import random
 import datetime
 import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import os
 
 try:
@@ -34,6 +34,21 @@ def generate_timestamped_random_filename(prefix: str = "video", extension: str =
 MAX_VEO3_QUERIES = 10
 NB_VEO3_QUERIES = 0
 
+
+def reset_query_count(limit: Optional[int] = None):
+    """Start a new quota period (e.g. a new day for a long-running daemon)."""
+    global NB_VEO3_QUERIES, MAX_VEO3_QUERIES
+    NB_VEO3_QUERIES = 0
+    if limit is not None:
+        MAX_VEO3_QUERIES = limit
+
+
+def set_query_limit(limit: int):
+    """Change the per-period limit without starting a new period."""
+    global MAX_VEO3_QUERIES
+    MAX_VEO3_QUERIES = limit
+
+
 PUBLIC_VIDEO_ROUTE_PREFIX = "/videos"  # where Flask will serve from
 PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
 
@@ -42,7 +57,7 @@ def generate_veo3_video(client, description: str, negative_keywords: List[str],
     """Generate a video with Google's Veo3 model and return a public route.
     Saves files under VIDEO_DIR so webserver can serve them.
     """
-    if genai is None:
+    if genai is None and getattr(client, "requires_sdk", True):
         return "<error: google-genai not installed>"
     global NB_VEO3_QUERIES
     NB_VEO3_QUERIES += 1
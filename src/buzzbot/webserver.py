@@ -4,20 +4,29 @@ from __future__ import annotations
 # =====================
 # Imports
 # =====================
+import dataclasses
 import logging
+import os
+import queue
 import threading
 import traceback
 import uuid
 from pathlib import Path as _Path
 from typing import Dict, List, Optional, Any
 
-from flask import Flask, request, jsonify, send_from_directory, session as flask_session, abort  # noqa: F401
+from flask import Flask, Response, request, jsonify, send_from_directory, session as flask_session, abort  # noqa: F401
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from . import metrics
 from .models import db, User, ChatSessionDB, MessageDB
 from .config import AppConfig
 from .chat import ChatSession
-from .io_utils import save_history
+from .router import BACKGROUND
+from .messages import JSONProvider
+from .io_utils import close_journal, open_journal, reset_journal
+from .jobs import Job, jobs
+from .publish.fanout import get_manager as get_post_manager
+from .search import ensure_fts, search as search_messages
 from .veo3 import generate_veo3_video
 
 # =====================
@@ -29,17 +38,20 @@ WEBUI_DIST_DIR = WEBUI_DIR / 'dist'
 WEBUI_INDEX = WEBUI_DIST_DIR / 'index.html'
 VIDEO_FILES_DIR = (BASE_DIR.parent.parent / 'data' / 'video_tests').resolve()
 
+
 app = Flask(
     __name__,
     static_folder=str(WEBUI_DIST_DIR),
     static_url_path=''
 )
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///buzzbot.db'
+app.json = JSONProvider(app)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///buzzbot.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'replace-this-with-a-secret-key'
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    _search_enabled = ensure_fts(db.engine)
 VIDEO_FILES_DIR.mkdir(parents=True, exist_ok=True)
 
 # =====================
@@ -49,6 +61,9 @@ _config = AppConfig.load()
 _sessions: Dict[str, ChatSession] = {}
 _locks: Dict[str, threading.Lock] = {}
 _global_lock = threading.Lock()
+# Server-sent event subscribers per session (GET /session/<id>/events)
+_subscribers: Dict[str, List[queue.Queue]] = {}
+_subscribers_lock = threading.Lock()
 
 # =====================
 # Utility Functions
@@ -57,19 +72,15 @@ def _create_session(model: Optional[str] = None, system_prompt: Optional[str] =
     from flask import has_request_context
     cfg = _config
     model_to_use = model or cfg.model
-    new_cfg = type(cfg)(
-        openai_api_key=cfg.openai_api_key,
-        google_api_key=cfg.google_api_key,
-        base_url=cfg.base_url,
+    new_cfg = dataclasses.replace(
+        cfg,
         model=model_to_use,
         system_prompt=system_prompt or cfg.system_prompt,
         color=False,
-        debug=cfg.debug,
     )
     session = ChatSession(config=new_cfg)
     sid = uuid.uuid4().hex
-    _sessions[sid] = session
-    _locks[sid] = threading.Lock()
+    _register_session(sid, session)
     # Save to DB
     with app.app_context():
         if user_id is not None:
@@ -82,6 +93,44 @@ def _create_session(model: Optional[str] = None, system_prompt: Optional[str] =
         db.session.commit()
     return sid
 
+def _register_session(sid: str, session: ChatSession):
+    _sessions[sid] = session
+    _locks[sid] = threading.Lock()
+    session.add_job_listener(
+        lambda job: threading.Thread(target=_on_job_done, args=(sid, job), daemon=True).start()
+    )
+
+def _on_job_done(sid: str, job: Job):
+    """Inject a finished background job into its session, let the assistant
+    follow up (BUZZBOT_JOB_AUTO_CONTINUE) and push the new messages to clients."""
+    session, lock = _sessions.get(sid), _locks.get(sid)
+    if session is None or lock is None:
+        return
+    with lock:
+        start_id = session.last_id
+        # Empty if a /chat turn already picked the result up
+        delivered = session.deliver_job_results()
+        _save_messages(sid, delivered)
+        if delivered and session.config.job_auto_continue:
+            reply = session.continue_turn()
+            _save_messages(sid, [reply])
+        messages, _ = session.history_page(since=start_id)
+        last_id = session.last_id
+    _publish(sid, {"type": "job", "job": job.to_dict(), "messages": messages, "last_id": last_id})
+
+def _save_messages(sid: str, messages: List[Dict[str, Any]]):
+    """Persist job results and replies so a session rebuilt from the DB has them."""
+    rows = [MessageDB(session_id=sid, role=m["role"], content=m["content"]) for m in messages if m.get("content")]
+    if rows:
+        with app.app_context():
+            db.session.add_all(rows)
+            db.session.commit()
+
+def _publish(sid: str, event: Dict[str, Any]):
+    with _subscribers_lock:
+        for q in _subscribers.get(sid, ()):
+            q.put(event)
+
 def _ensure_base_session():
     if not _sessions:
         _create_session()
@@ -158,6 +207,24 @@ def list_sessions():
     result.sort(key=lambda x: x.get("updatedAt") or 0, reverse=True)
     return jsonify(result)
 
+@app.route("/search", methods=["GET"])
+def search():
+    """Full-text search over stored messages: GET /search?q=<text>&limit=<n>."""
+    if not _search_enabled:
+        return jsonify({"error": "search unavailable (SQLite FTS5 required)"}), 501
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "missing q"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "invalid limit"}), 400
+    user_id = flask_session.get('user_id') if 'user_id' in flask_session else None
+    session_ids = None
+    if user_id:
+        session_ids = [s.session_id for s in ChatSessionDB.query.filter_by(user_id=user_id).all()]
+    return jsonify(search_messages(db.session.connection(), q, limit=limit, session_ids=session_ids))
+
 @app.route("/session/<session_id>", methods=["DELETE"])
 def delete_session(session_id: str):
     cs = ChatSessionDB.query.filter_by(session_id=session_id).first()
@@ -171,6 +238,7 @@ def delete_session(session_id: str):
     # Remove from in-memory store if present
     _sessions.pop(session_id, None)
     _locks.pop(session_id, None)
+    close_journal(session_id, remove=True)
     return jsonify({"ok": True})
 
 # =====================
@@ -201,6 +269,11 @@ def add_cors(resp):
 def health():
     return jsonify({"status": "ok"})
 
+@app.route("/metrics", methods=["GET"])
+def metrics_snapshot():
+    """Counters, gauges (e.g. provider circuit breaker state) and latency summaries."""
+    return jsonify(metrics.snapshot())
+
 @app.route("/")
 @app.route("/<path:path>")
 def serve_frontend(path=None):
@@ -229,12 +302,44 @@ def get_session(session_id: str):
         history = [{"role": m.role, "content": m.content} for m in msgs]
         # Recreate ChatSession
         session = ChatSession(config=_config, history=history)
-        _sessions[session_id] = session
-        _locks[session_id] = threading.Lock()
+        # Rebuilt histories are renumbered from 1: a journal from before must
+        # not be matched against them by message id
+        reset_journal(session_id, **session.config.journal_options())
+        _register_session(session_id, session)
     payload = _session_payload(session_id)
-    payload["history"] = _sessions[session_id].history
+    session = _sessions[session_id]
+    try:
+        since = _int_arg("since")
+        before = _int_arg("before")
+        limit = _int_arg("limit")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if since is None and before is None and limit is None:
+        # Legacy behaviour: the whole history
+        payload["history"] = session.history
+        return jsonify(payload)
+    with _locks[session_id]:
+        page, has_more = session.history_page(since=since, before=before, limit=limit)
+        payload["last_id"] = session.last_id
+    payload["history"] = page
+    payload["has_more"] = has_more
+    # Cursors for the next page in each direction
+    payload["first_id"] = page[0]["id"] if page else None
+    payload["next_since"] = page[-1]["id"] if page else since
     return jsonify(payload)
 
+def _int_arg(name: str) -> Optional[int]:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        n = int(value)
+    except ValueError:
+        raise ValueError(f"invalid {name}: {value!r}")
+    if name == "limit" and n <= 0:
+        raise ValueError("limit must be positive")
+    return n
+
 @app.route("/chat", methods=["POST"])
 def chat():
     data = request.get_json(force=True) or {}
@@ -250,9 +355,10 @@ def chat():
         if data.get("model") and isinstance(data.get("model"), str) and data.get("model") != session.config.model:
             session.switch_model(data.get("model"))
         if data.get("reset"):
-            session.history.clear()
-            if session.config.system_prompt:
-                session.history.append({"role": "system", "content": session.config.system_prompt})
+            session.reset()
+        turn_start_id = session.last_id
+        # Job results complete() would add ahead of the prompt, saved in that order
+        _save_messages(sid, session.deliver_job_results())
         # Save user message to DB
         with app.app_context():
             db.session.add(MessageDB(session_id=sid, role="user", content=prompt))
@@ -275,16 +381,13 @@ def chat():
                     llm_prompt += f"{m['role']}: {m['content']}\n"
                 llm_prompt += "\nTitle: "
                 title = None
-                if session and hasattr(session, 'complete'):
-                    try:
-                        ai_response = session.complete(llm_prompt)
-                        if isinstance(ai_response, dict):
-                            title = ai_response.get("content", "").strip().split("\n")[0]
-                        elif isinstance(ai_response, str):
-                            title = ai_response.strip().split("\n")[0]
-                        title = " ".join(title.split()[:12]) if title else None
-                    except Exception:
-                        title = None
+                try:
+                    # Background call outside the conversation: the title prompt
+                    # must not end up in the chat history
+                    title = session.one_shot(llm_prompt, call_class=BACKGROUND, max_tokens=32).strip().split("\n")[0]
+                    title = " ".join(title.split()[:12]) if title else None
+                except Exception:
+                    title = None
                 # Fallback to heuristic
                 if not title:
                     def first_words(text, n=6):
@@ -304,12 +407,55 @@ def chat():
             with app.app_context():
                 db.session.add(MessageDB(session_id=sid, role="assistant", content=reply_msg["content"]))
                 db.session.commit()
-        return jsonify({
+        payload = {
             "session_id": sid,
             "reply": reply_msg.get("content", ""),
             "model": session.config.model,
-            "history": session.history,
-        })
+            "last_id": session.last_id,
+            # Deferred tools still running; results arrive via /session/<id>/events
+            "pending_jobs": [j.to_dict() for j in session.running_jobs()],
+        }
+        if data.get("delta"):
+            # Only the messages appended by this turn (user, tool calls, reply)
+            payload["messages"], _ = session.history_page(since=turn_start_id)
+        else:
+            payload["history"] = session.history
+        return jsonify(payload)
+
+@app.route("/session/<session_id>/events", methods=["GET"])
+def session_events(session_id: str):
+    """Server-sent events for a session: ``event: job`` when a background job
+    finishes, with the messages it added (result + assistant follow-up)."""
+    if session_id not in _sessions:
+        return jsonify({"error": "not_found"}), 404
+    q: queue.Queue = queue.Queue()
+    with _subscribers_lock:
+        _subscribers.setdefault(session_id, []).append(q)
+
+    def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {app.json.dumps(event)}\n\n"
+        finally:
+            with _subscribers_lock:
+                subs = _subscribers.get(session_id, [])
+                if q in subs:
+                    subs.remove(q)
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(job.to_dict())
 
 @app.route("/session/<session_id>/model", methods=["POST"])
 def switch_model(session_id: str):
@@ -327,9 +473,11 @@ def switch_model(session_id: str):
 def save_session(session_id: str):
     if session_id not in _sessions:
         return jsonify({"error": "not_found"}), 404
+    session = _sessions[session_id]
     with _locks[session_id]:
-        path = save_history(_sessions[session_id].history)
-    return jsonify({"path": str(path), "messages": len(_sessions[session_id].history)})
+        journal = open_journal(session_id, **session.config.journal_options())
+        appended = journal.sync(session.history)
+    return jsonify({"path": str(journal.path), "messages": len(session.history), "appended": appended})
 
 # =====================
 # Video & Social Endpoints
@@ -353,11 +501,21 @@ def video_generate():
     status = "ok" if not path.startswith("<error") else "error"
     return jsonify({"path": path, "status": status})
 
+def _video_file_from_url(video_url: str) -> Optional[_Path]:
+    """Local file under VIDEO_FILES_DIR for a /videos/<name> route or URL."""
+    marker = "/videos/"
+    name = video_url.split(marker, 1)[1] if marker in video_url else video_url
+    target = (VIDEO_FILES_DIR / name.split("?", 1)[0]).resolve()
+    if not target.is_relative_to(VIDEO_FILES_DIR) or not target.is_file():
+        return None
+    return target
+
 @app.route("/post/start", methods=["POST"])
 def post_start():
     """
     Start posting a video to selected social media platforms.
     Expects JSON: {"video_url": str, "description": str, "platforms": [str], ...}
+    Returns at once with a post id; progress is at GET /post/<id>.
     """
     data = request.get_json(force=True) or {}
     video_url = data.get("video_url")
@@ -366,11 +524,25 @@ def post_start():
     # Optionally: hashtags, schedule, etc.
     if not video_url or not description or not platforms:
         return jsonify({"error": "Missing required fields (video_url, description, platforms)"}), 400
-    # Here you would trigger the actual posting logic (async task, API call, etc.)
-    # For now, just log and return success
-    logging.info(f"Posting video {video_url} to platforms: {platforms} with description: {description}")
-    # TODO: Integrate with actual social media APIs
-    return jsonify({"ok": True, "message": "Posting started", "platforms": platforms})
+    if isinstance(platforms, str):
+        platforms = [platforms]
+    video_path = _video_file_from_url(video_url)
+    if video_path is None:
+        return jsonify({"error": "video_not_found", "video_url": video_url}), 404
+    manager = get_post_manager()
+    try:
+        post = manager.start(video_path, description, [str(p).lower() for p in platforms])
+    except KeyError as e:
+        return jsonify({"error": str(e).strip("'\""), "available": manager.platforms}), 400
+    logging.info(f"Posting video {video_url} to platforms: {platforms} (post {post.id})")
+    return jsonify({"ok": True, "message": "Posting started", "post_id": post.id, "platforms": list(post.tasks)}), 202
+
+@app.route("/post/<post_id>", methods=["GET"])
+def post_status(post_id: str):
+    post = get_post_manager().get(post_id)
+    if post is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(post.to_dict())
 
 @app.route('/videos/<path:filename>', methods=['GET'])
 def serve_video_file(filename: str):
@@ -430,13 +602,9 @@ def generate_session_title(session_id):
     # Use the session's LLM to generate a title
     session = _sessions.get(session_id)
     title = None
-    if session and hasattr(session, 'complete'):
+    if session is not None:
         try:
-            ai_response = session.complete(prompt)
-            if isinstance(ai_response, dict):
-                title = ai_response.get("content", "").strip().split("\n")[0]
-            elif isinstance(ai_response, str):
-                title = ai_response.strip().split("\n")[0]
+            title = session.one_shot(prompt, call_class=BACKGROUND, max_tokens=32).strip().split("\n")[0]
             # Truncate to 12 words
             title = " ".join(title.split()[:12]) if title else None
         except Exception:
@@ -1,4 +1,4 @@
-from buzzbot.buzzcli import parse_args, repl, run_hello_test, repl_multiline
+from buzzbot.buzzcli import parse_args, repl, run_hello_test, repl_multiline, bind_journal
 from buzzbot.config import AppConfig
 from buzzbot.io_utils import save_history, load_history, print_message, colorize
 from buzzbot.chat import ChatSession
@@ -29,6 +29,14 @@ def main():
         return run_hello_test(config)
 
 
+    if args.batch:
+        from buzzbot.batch import main_batch
+        return main_batch(config, args.batch, args.batch_output, args.workers)
+
+    if getattr(args, 'daemon', False):
+        from buzzbot.scheduler import main_daemon
+        return main_daemon(config, args.target, args.veo3_quota, args.publish_window, dry_run=args.dry_run)
+
     # Web server mode (Flask) is now default unless --cli is passed
     if not getattr(args, 'cli', False):
         from buzzbot.webserver import app  # Flask app
@@ -39,8 +47,9 @@ def main():
 
     if getattr(args, 'test_gen', False):
         plot_gen = PlotGenerator()
-        plot = plot_gen.generate_plot()
-        print(plot)
+        for c in plot_gen.generate_candidates(k=5, keep_rejected=True):
+            status = f"rejected: {c.rejected}" if c.rejected else "ok"
+            print(f"[{c.score:.2f}] {c.title} ({status})\n    {c.prompt}")
         return 0
 
     if getattr(args, 'test_tiktok', False):
@@ -60,14 +69,18 @@ def main():
             print(f"[warn] Session file not found: {p}")
 
     session = ChatSession(config=config, history=history)
+    if args.session and Path(args.session).name.endswith(".journal.jsonl"):
+        # Keep appending to the journal we resumed from
+        bind_journal(session, Path(args.session).name[: -len(".journal.jsonl")])
 
+    stream = not args.no_stream
     if args.multiline:
-        repl_multiline(session)
+        repl_multiline(session, stream=stream)
     else:
-        repl(session)
+        repl(session, stream=stream)
 
     return 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
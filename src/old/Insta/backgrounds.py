@@ -0,0 +1,133 @@
+"""Pre-normalized background video library for the reels.
+
+`ingest()` encodes each downloaded background in reels/templates once into
+reels/templates/library: 9:16 centre crop at 1080x1920, 30 fps, yuv420p, no
+audio and a fixed one-second GOP (no scene-cut keyframes), so there is a
+keyframe every second. The keyframe times of every library video are
+probed once and stored in library/index.json with its duration.
+
+At render time `pick()` chooses a library video and `snap()` moves a seek
+position back to the previous keyframe: ffmpeg then starts exactly on a
+keyframe, with no large probe of the source and no decoding from an
+earlier keyframe.
+"""
+from bisect import bisect_right
+import json
+import os
+import subprocess
+import time
+
+import media_probe
+
+
+cur_path = os.path.dirname(os.path.realpath(__file__))
+TEMPLATE_DIR = os.path.join(cur_path, "reels", "templates")
+LIBRARY_DIR = os.path.join(TEMPLATE_DIR, "library")
+INDEX_PATH = os.path.join(LIBRARY_DIR, "index.json")
+
+WIDTH, HEIGHT = 1080, 1920
+FPS = 30
+GOP = FPS  # one keyframe per second
+
+
+def load_index():
+	if not os.path.exists(INDEX_PATH):
+		return {}
+	with open(INDEX_PATH, "r") as f:
+		return json.load(f)
+
+
+def save_index(index):
+	tmp_path = INDEX_PATH + ".tmp"
+	with open(tmp_path, "w") as f:
+		json.dump(index, f, indent=2)
+	os.replace(tmp_path, INDEX_PATH)
+
+
+def normalize_cmd(ffmpeg_path, src, out):
+	return [
+		ffmpeg_path, "-y", "-hide_banner", "-loglevel", "error",
+		"-probesize", "100M", "-analyzeduration", "100M",  # only paid once, here
+		"-i", src,
+		"-vf", f"crop='min(iw,ih*9/16)':'min(ih,iw*16/9)',scale={WIDTH}:{HEIGHT},fps={FPS},setsar=1",
+		"-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+		"-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0",
+		"-an",
+		"-movflags", "+faststart",
+		out,
+	]
+
+
+def ingest(ffmpeg_path, force=False):
+	"""Normalize and index the template videos that are new or changed."""
+	os.makedirs(LIBRARY_DIR, exist_ok=True)
+	index = load_index()
+	sources = sorted(f for f in os.listdir(TEMPLATE_DIR) if f.endswith(".mp4"))
+
+	for name in sources:
+		src = os.path.join(TEMPLATE_DIR, name)
+		out = os.path.join(LIBRARY_DIR, name)
+		st = os.stat(src)
+		entry = index.get(name)
+		if (
+			not force
+			and entry
+			and entry["source_size"] == st.st_size
+			and entry["source_mtime_ns"] == st.st_mtime_ns
+			and os.path.exists(out)
+		):
+			continue
+
+		print(f"Normalizing background {name}")
+		start = time.perf_counter()
+		tmp_path = out[: -len(".mp4")] + ".part.mp4"
+		try:
+			subprocess.run(normalize_cmd(ffmpeg_path, src, tmp_path), check=True)
+		except subprocess.CalledProcessError as e:
+			print(f"Error while normalizing {name}: {e}")
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			continue
+		os.replace(tmp_path, out)
+
+		try:
+			info = media_probe.probe(out, keyframes=True)
+		except (subprocess.CalledProcessError, OSError, ValueError, KeyError) as e:
+			# ffprobe failed or is missing: an unindexed library file is never picked
+			print(f"Error while probing {name}: {e}")
+			os.remove(out)
+			index.pop(name, None)
+			save_index(index)
+			continue
+		index[name] = {
+			"path": out,
+			"source_size": st.st_size,
+			"source_mtime_ns": st.st_mtime_ns,
+			"duration": info["duration"],
+			"keyframes": info["keyframes"] or [0.0],
+		}
+		save_index(index)
+		print(f"  {name}: {info['duration']:.0f}s, {len(index[name]['keyframes'])} keyframes in {time.perf_counter() - start:.1f}s")
+
+	# Drop entries whose source was removed
+	for name in [n for n in index if n not in sources]:
+		del index[name]
+		save_index(index)
+
+	return index
+
+
+def pick(rng, min_length):
+	"""A random library entry at least min_length long, or None if there is none."""
+	index = load_index()
+	entries = [e for _, e in sorted(index.items()) if e["duration"] >= min_length and os.path.exists(e["path"])]
+	if not entries:
+		return None
+	return rng.choice(entries)
+
+
+def snap(entry, t):
+	"""The last keyframe time at or before t."""
+	keyframes = entry["keyframes"]
+	i = bisect_right(keyframes, t + 1e-3)
+	return keyframes[max(i - 1, 0)]
@@ -1,5 +1,6 @@
 from base64 import b64encode
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import io
 import json
 import os
@@ -17,12 +18,15 @@ root = os.path.abspath(os.path.join(cur_path, ".."))
 for path in ("Reddit/YARS", "Sound/STT", "Sound/TTS"):
 	sys.path.append(os.path.join(root, path))
 
+import backgrounds
+import media_probe
 import scraper  # type: ignore
 import STT  # type: ignore
 import TTS  # type: ignore
 
 
 FFMPEG_PATH = r"C:\Users\William\ffmpeg\bin\ffmpeg.exe"
+TITLE_RENDERER = os.getenv("TITLE_RENDERER", "pillow")  # "selenium" for the HTML screenshot
 
 
 def create_reel():
@@ -30,6 +34,7 @@ def create_reel():
 	# TODO: Img posts with https://www.reddit.com/r/AskReddit/
 
 	download_background_videos()
+	backgrounds.ingest(FFMPEG_PATH)
 
 	posts = find_posts()
 
@@ -103,25 +108,31 @@ def check_post(metadata, root):
 
 
 # Video
-def create_video(root, length, audio, chunks, subs_type):
+def format_path(path, root=None, rel=False, quotes=None):
+	if not quotes:
+		quotes = ""
+	if rel:
+		path = os.path.relpath(path, os.path.abspath(root))
+
+	return quotes + path.replace(os.sep, "/") + quotes
 
-	def format_path(path, rel=False, quotes=None):
-		if not quotes:
-			quotes = ""
-		if rel:
-			path = os.path.relpath(path, os.path.abspath(root))
 
-		return quotes + path.replace(os.sep, "/") + quotes
+def create_video(root, length, audio, chunks, subs_type):
 
 	def filter_vids(file):
 		return file.endswith(".mp4")
 
-	video_root = os.path.join(cur_path, "reels/templates")
 	random.seed(os.path.basename(root))  # seed for reproducibility
-	choosen = random.choice(list(filter(filter_vids, os.listdir(video_root))))
-	path = os.path.join(video_root, choosen)
-
-	video_length = get_media_length(path)
+	background = backgrounds.pick(random, length)
+	if background is not None:
+		# Normalized library video: known format and keyframe index
+		path = background["path"]
+		video_length = background["duration"]
+	else:
+		video_root = os.path.join(cur_path, "reels/templates")
+		choosen = random.choice(list(filter(filter_vids, os.listdir(video_root))))
+		path = os.path.join(video_root, choosen)
+		video_length = get_media_length(path)
 
 	title_audio_path = os.path.join(root, "title.wav")
 	title_image_path = os.path.join(root, "title.png")
@@ -129,123 +140,130 @@ def create_video(root, length, audio, chunks, subs_type):
 
 	start_time = random.uniform(0, video_length - length)
 
+	parts = plan_render(
+		root, chunks, subs_type, path, audio, title_audio_path, title_image_path, title_audio_length, start_time,
+		background=background,
+	)
+	todo = [part for part in parts if not os.path.exists(part["out_path"])]
+	if todo and not encode_parts(todo, root):
+		return None
+
+	return [part["out_path"] for part in parts]
+
+
+def plan_render(
+	root, chunks, subs_type, video_path, audio, title_audio_path, title_image_path, title_audio_length, start_time,
+	background=None,
+):
+	# One ffmpeg command per part, all computed up front so they can run concurrently
+	parts = []
 	offset_time = 0
-	out_paths = []
 	for i, (length, subs) in enumerate(chunks):
 		subs_path = os.path.join(root, f"subs_{i}{subs_type}")
+		out_path = os.path.join(root, f"output_{i}.mp4")
+
+		cmd = [FFMPEG_PATH, "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+
+		video_start = start_time + offset_time
+		if background is not None:
+			video_start = backgrounds.snap(background, video_start)  # seek lands on a keyframe
 
-		fn = f"output_{i}.mp4"
-		print(f"Generating {fn} ({i + 1}/{len(chunks)})")
-
-		fullaudio_path = os.path.join(root, f"audio_{i}.wav")
-		if not os.path.exists(fullaudio_path):
-			# Merge title and main audio using ffmpeg
-			cmd = [
-				FFMPEG_PATH,
-				"-y",
-				"-i",
-				format_path(title_audio_path),
-				"-ss",
-				str(offset_time),
-				"-t",
-				str(length - title_audio_length),
-				"-i",
-				format_path(audio),
+		cmd.extend(
+			["-ss", str(video_start), "-t", str(length)]
+		)  # crop video duration
+		if background is None:
+			cmd.extend(
+				["-probesize", "100M", "-analyzeduration", "100M"]
+			)  # force find the input pixel format
+		cmd.extend(["-i", format_path(video_path)])  # background video
+
+		cmd.extend(["-i", format_path(title_audio_path)])  # title audio
+		cmd.extend(
+			["-ss", str(offset_time), "-t", str(length - title_audio_length), "-i", format_path(audio)]
+		)  # this part of the main audio
+
+		cmd.extend(["-i", format_path(title_image_path)])  # title image
+
+		subs_path = (
+			format_path(subs_path).replace("/", r"\\").replace(":", r"\:")
+		)  # ffmpeg bug: https://superuser.com/questions/1247197/ffmpeg-absolute-path-error
+
+		cmd.extend(
+			[
 				"-filter_complex",
-				"[0:a:0][1:a:0]concat=n=2:v=0:a=1[out]",
-				"-map",
-				"[out]",
-				format_path(fullaudio_path),
+				(
+					"[1:a:0][2:a:0]concat=n=2:v=0:a=1[a];"
+					f"[0:v:0][3:v:0]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:enable='between(t,0,{title_audio_length})',"
+					f"subtitles='{subs_path}',"
+					"crop='min(iw,ih*9/16)':ih,format=yuv420p[v]"
+				),
 			]
+		)  # title + main audio, overlay, subtitles and crop in a single filter graph
+		cmd.extend(["-c:s", "copy", "-c:v", "libx264", "-c:a", "aac"])  # codecs
+		cmd.extend(["-pix_fmt", "yuv420p"])  # Explicitly set pixel format
+		cmd.extend(["-ac", "2"])  # Force stereo audio
+		cmd.extend(["-map", "[v]", "-map", "[a]"])  # map video and audio streams
 
-			try:
-				subprocess.run(cmd, check=True, cwd=root)
-			except subprocess.CalledProcessError as e:
-				print(f"Error while merging audio with ffmpeg: {e}")
-				return None
+		parts.append({"index": i, "count": len(chunks), "length": length, "out_path": out_path, "cmd": cmd})
 
-		out_path = os.path.join(root, fn)
-		if not os.path.exists(out_path):
+		offset_time += length - title_audio_length
 
-			out_paths.append(out_path)
+	return parts
 
-			cmd = [FFMPEG_PATH, "-y"]
 
-			cmd.extend(
-				["-ss", str(start_time + offset_time), "-t", str(length)]
-			)  # crop video duration
-			cmd.extend(
-				["-probesize", "100M", "-analyzeduration", "100M"]
-			)  # force find the input pixel format
-			cmd.extend(["-i", format_path(path)])  # background video
+def encode_parts(parts, root):
+	# Parts are independent: run one ffmpeg per core, splitting the cores between them
+	cores = os.cpu_count() or 1
+	workers = min(len(parts), cores)
+	threads = max(1, cores // workers)
+	print(f"Encoding {len(parts)} part(s) with {workers} parallel ffmpeg process(es), {threads} thread(s) each")
 
-			cmd.extend(["-i", format_path(fullaudio_path)])  # main audio
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		results = list(pool.map(lambda part: encode_part(part, root, threads), parts))
+	print(f"Encoded {sum(results)}/{len(parts)} part(s) in {time.perf_counter() - start:.1f}s")
 
-			cmd.extend(["-i", format_path(title_image_path)])  # title image
+	return all(results)
 
-			subs_path = (
-				format_path(subs_path).replace("/", r"\\").replace(":", r"\:")
-			)  # ffmpeg bug: https://superuser.com/questions/1247197/ffmpeg-absolute-path-error
-			# subs_path = format_path(subs_path)
 
-			cmd.extend(
-				[
-					"-filter_complex",
-					(
-						f"[0:v:0][2:v:0]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:enable='between(t,0,{title_audio_length})',"
-						f"subtitles='{subs_path}',"
-						"crop='min(iw,ih*9/16)':ih,format=yuv420p[v]"
-					),
-				]
-			)  # combine overlay, subtitles, and crop into a single filter_complex
-			cmd.extend(["-c:s", "copy", "-c:v", "libx264", "-c:a", "aac"])  # codecs
-			cmd.extend(["-pix_fmt", "yuv420p"])  # Explicitly set pixel format
-			cmd.extend(["-ac", "2"])  # Force stereo audio
-			cmd.extend(["-map", "[v]", "-map", "1:a:0"])  # map video and audio streams
-			cmd.extend([format_path(out_path)])  # output path
-
-			# cmd = ' '.join(cmd)
+def encode_part(part, root, threads):
+	label = f"output_{part['index']}.mp4 ({part['index'] + 1}/{part['count']})"
+	# Write next to the output and rename when done, so check_post never sees a partial file
+	tmp_path = part["out_path"][: -len(".mp4")] + ".part.mp4"
+	cmd = part["cmd"] + ["-threads", str(threads), format_path(tmp_path)]
 
-			try:
-				subprocess.run(
-					cmd,
-					check=True,
-					cwd=root,
-					# stdout=subprocess.PIPE,
-					# stderr=subprocess.PIPE
-				)
-			except subprocess.CalledProcessError as e:
-				print(f"Error while running ffmpeg: {e}")
-				return None
+	start = time.perf_counter()
+	reported = 0
+	with tempfile.TemporaryFile() as errors:
+		proc = subprocess.Popen(cmd, cwd=root, stdout=subprocess.PIPE, stderr=errors, text=True)
+		for line in proc.stdout:
+			key, _, value = line.strip().partition("=")
+			if key in ("out_time_us", "out_time_ms") and value.isdigit():  # both are microseconds
+				percent = min(100, int(int(value) / 1e6 / part["length"] * 100))
+				if percent >= reported + 10:
+					reported = percent - percent % 10
+					print(f"  {label}: {reported}%")
+		proc.wait()
 
-		offset_time += length - title_audio_length
+		if proc.returncode != 0:
+			errors.seek(0)
+			print(f"Error while running ffmpeg for {label}: {errors.read().decode(errors='replace').strip()}")
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			return False
+
+	os.replace(tmp_path, part["out_path"])
+	print(f"  {label}: done in {time.perf_counter() - start:.1f}s")
+	return True
 
 
 def get_media_length(path):
 	try:
-		result = subprocess.run(
-			[
-				"ffprobe",
-				"-v",
-				"error",
-				"-show_entries",
-				"format=duration",
-				"-of",
-				"default=noprint_wrappers=1:nokey=1",
-				path,
-			],
-			stdout=subprocess.PIPE,
-			stderr=subprocess.PIPE,
-			text=True,
-			check=True,
-		)
-		video_length = float(result.stdout.strip())
+		return media_probe.get_duration(path)
 	except subprocess.CalledProcessError as e:
 		print(f"Error while running ffprobe: {e.stderr}")
 		raise
 
-	return video_length
-
 
 def download_background_videos():
 	template_folder = os.path.join(cur_path, "reels/templates")
@@ -301,10 +319,6 @@ def generate_title_img(root, post):
 	title_path = os.path.join(root, "title.png")
 	template_path = os.path.join(cur_path, "reels/templates", "title_template.html")
 	if not os.path.exists(title_path):
-		# Convert HTML string to image
-		with open(template_path, "r") as f:
-			template = f.read()
-
 		data = {
 			"subreddit": post["subreddit"],
 			"title": post["title"],
@@ -315,6 +329,19 @@ def generate_title_img(root, post):
 			"delay": random.randint(1, 8),
 		}
 
+		if TITLE_RENDERER == "pillow":
+			try:
+				import title_card
+			except ImportError as e:
+				print(f"Pillow title renderer unavailable ({e}), using Selenium")
+			else:
+				title_card.render_card(data, title_path)
+				return title_path
+
+		# Convert HTML string to image
+		with open(template_path, "r") as f:
+			template = f.read()
+
 		for k, v in data.items():
 			template = template.replace("{" + k + "}", str(v))
 
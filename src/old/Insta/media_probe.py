@@ -0,0 +1,198 @@
+"""Cached media metadata (duration, streams, sample rate, keyframes).
+
+`probe(path)` returns the metadata of a file, keyed by (path, size, mtime):
+an in-memory LRU first, then a SQLite cache next to the reels
+(reels/probe_cache.sqlite) that survives restarts, and only then ffprobe.
+A file that changes gets a new key, so stale entries are never returned.
+
+WAV files (the TTS output) are read from their header with `wave`, without
+starting a process. `probe_many(paths)` answers what it can from the caches
+and probes the misses concurrently; ffprobe takes a single input, so a
+batch is one process per missing file, not one per call.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import wave
+
+
+FFPROBE_PATH = "ffprobe"
+
+cur_path = os.path.dirname(os.path.realpath(__file__))
+CACHE_PATH = os.path.join(cur_path, "reels", "probe_cache.sqlite")
+LRU_SIZE = 512
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def _key(path):
+	path = os.path.abspath(path)
+	st = os.stat(path)
+	return (path, st.st_size, st.st_mtime_ns)
+
+
+def _connect():
+	os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+	conn = sqlite3.connect(CACHE_PATH, timeout=30)
+	conn.execute(
+		"CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, data TEXT)"
+	)
+	return conn
+
+
+def _remember(key, info):
+	with _lock:
+		_lru[key] = info
+		_lru.move_to_end(key)
+		while len(_lru) > LRU_SIZE:
+			_lru.popitem(last=False)
+
+
+def _cached(keys):
+	# {key: info} for the keys found in the LRU or the SQLite cache
+	found = {}
+	with _lock:
+		for key in keys:
+			if key in _lru:
+				_lru.move_to_end(key)
+				found[key] = _lru[key]
+	missing = [key for key in keys if key not in found]
+	if missing:
+		conn = _connect()
+		try:
+			for key in missing:
+				row = conn.execute(
+					"SELECT data FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?", key
+				).fetchone()
+				if row:
+					found[key] = json.loads(row[0])
+					_remember(key, found[key])
+		finally:
+			conn.close()
+	return found
+
+
+def _store(entries):
+	conn = _connect()
+	try:
+		with conn:
+			conn.executemany(
+				"INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+				[(*key, json.dumps(info)) for key, info in entries.items()],
+			)
+	finally:
+		conn.close()
+	for key, info in entries.items():
+		_remember(key, info)
+
+
+def _probe_wav(path):
+	try:
+		with wave.open(path, "rb") as f:
+			rate = f.getframerate()
+			channels = f.getnchannels()
+			duration = f.getnframes() / rate
+	except (wave.Error, EOFError):
+		return None  # e.g. a compressed WAV: let ffprobe handle it
+	return {
+		"duration": duration,
+		"sample_rate": rate,
+		"streams": [{"index": 0, "codec_type": "audio", "codec_name": "pcm", "sample_rate": rate, "channels": channels}],
+		"keyframes": None,
+	}
+
+
+def _probe_ffprobe(path, keyframes=False):
+	result = subprocess.run(
+		[FFPROBE_PATH, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+		stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE,
+		text=True,
+		check=True,
+	)
+	raw = json.loads(result.stdout)
+	streams = []
+	for s in raw.get("streams", []):
+		stream = {
+			"index": s.get("index"),
+			"codec_type": s.get("codec_type"),
+			"codec_name": s.get("codec_name"),
+		}
+		for k in ("width", "height", "channels", "r_frame_rate", "pix_fmt"):
+			if k in s:
+				stream[k] = s[k]
+		for k in ("sample_rate", "duration", "bit_rate"):
+			if k in s:
+				stream[k] = float(s[k]) if k == "duration" else int(s[k])
+		streams.append(stream)
+	audio = [s for s in streams if s["codec_type"] == "audio"]
+	info = {
+		"duration": float(raw["format"]["duration"]),
+		"sample_rate": audio[0].get("sample_rate") if audio else None,
+		"streams": streams,
+		"keyframes": None,
+	}
+	if keyframes and _has_video(info):
+		info["keyframes"] = _probe_keyframes(path)
+	return info
+
+
+def _has_video(info):
+	return any(s["codec_type"] == "video" for s in info["streams"])
+
+
+def _probe_keyframes(path):
+	# Packet flags only: no decoding, much faster than -skip_frame nokey
+	result = subprocess.run(
+		[
+			FFPROBE_PATH, "-v", "error", "-select_streams", "v:0",
+			"-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path,
+		],
+		stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE,
+		text=True,
+		check=True,
+	)
+	times = []
+	for line in result.stdout.splitlines():
+		pts, _, flags = line.partition(",")
+		if "K" in flags and pts not in ("", "N/A"):
+			times.append(float(pts))
+	return sorted(times)
+
+
+def _probe(path, keyframes=False):
+	if path.lower().endswith(".wav"):
+		info = _probe_wav(path)
+		if info is not None:
+			return info
+	return _probe_ffprobe(path, keyframes)
+
+
+def probe_many(paths, keyframes=False, workers=None):
+	"""Metadata of every path ({path: info}); misses are probed concurrently."""
+	keys = {path: _key(path) for path in paths}
+	found = _cached(list(dict.fromkeys(keys.values())))
+	if keyframes:
+		# Entries probed without keyframes do not answer this query
+		found = {k: v for k, v in found.items() if v["keyframes"] is not None or not _has_video(v)}
+	missing = list(dict.fromkeys(key for key in keys.values() if key not in found))
+	if missing:
+		with ThreadPoolExecutor(max_workers=workers or min(len(missing), os.cpu_count() or 1)) as pool:
+			probed = dict(zip(missing, pool.map(lambda key: _probe(key[0], keyframes), missing)))
+		_store(probed)
+		found.update(probed)
+	return {path: found[key] for path, key in keys.items()}
+
+
+def probe(path, keyframes=False):
+	return probe_many([path], keyframes=keyframes)[path]
+
+
+def get_duration(path):
+	return probe(path)["duration"]
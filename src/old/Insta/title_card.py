@@ -0,0 +1,195 @@
+"""Pillow renderer for the reel title card (reels/templates/title_template.html).
+
+Draws the same post card as the Selenium screenshot of `.post-card`: vote
+column, subreddit / author / age line, wrapped bold title and the action
+row, at the template's CSS sizes times `scale`. Fonts are loaded once per
+(weight, size) and no browser is started, so a card takes a few
+milliseconds; `render_cards` renders many in a thread pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+CARD_WIDTH = 640  # .post-card max-width
+
+WHITE = "#ffffff"
+BORDER = "#cccccc"
+VOTE_BG = "#f8f9fa"
+MUTED = "#787c7e"
+VOTE_ICON = "#878a8c"
+TEXT = "#1a1a1b"
+ORANGE = "#ff4500"
+
+# Same family order as the template's font stack, then common Linux fonts
+FONT_DIRS = [
+	os.getenv("TITLE_FONT_DIR", ""),
+	os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+	"/System/Library/Fonts/Supplemental",
+	"/Library/Fonts",
+	"/usr/share/fonts/truetype/dejavu",
+	"/usr/share/fonts/truetype/liberation",
+	"/usr/share/fonts/TTF",
+]
+FONT_FILES = {
+	"regular": ["segoeui.ttf", "Roboto-Regular.ttf", "Arial.ttf", "arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"],
+	"bold": ["seguisb.ttf", "segoeuib.ttf", "Roboto-Medium.ttf", "Arial Bold.ttf", "arialbd.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+}
+
+
+@lru_cache(maxsize=None)
+def _font_path(weight):
+	for folder in FONT_DIRS:
+		if not folder:
+			continue
+		for name in FONT_FILES[weight]:
+			path = os.path.join(folder, name)
+			if os.path.exists(path):
+				return path
+	return None
+
+
+@lru_cache(maxsize=64)
+def get_font(weight, size):
+	path = _font_path(weight)
+	if path is None:
+		return ImageFont.load_default(size)  # Pillow's bundled font
+	return ImageFont.truetype(path, size)
+
+
+def wrap_text(text, font, width):
+	# Greedy word wrap; words wider than a line are split by characters
+	lines = []
+	line = ""
+	for word in text.split():
+		candidate = f"{line} {word}" if line else word
+		if font.getlength(candidate) <= width:
+			line = candidate
+			continue
+		if line:
+			lines.append(line)
+		line = ""
+		while font.getlength(word) > width:
+			cut = len(word) - 1
+			while cut > 1 and font.getlength(word[:cut]) > width:
+				cut -= 1
+			lines.append(word[:cut])
+			word = word[cut:]
+		line = word
+	if line:
+		lines.append(line)
+	return lines or [""]
+
+
+def _icon(draw, kind, x, y, size, color, s):
+	# Stand-ins for the emoji icons of the action buttons
+	w = max(1, round(1.5 * s))
+	if kind == "comments":
+		draw.rounded_rectangle((x, y + size * 0.15, x + size, y + size * 0.75), radius=size * 0.2, outline=color, width=w)
+		draw.polygon([(x + size * 0.25, y + size * 0.7), (x + size * 0.5, y + size * 0.7), (x + size * 0.25, y + size * 0.95)], fill=color)
+	elif kind == "award":
+		draw.rectangle((x + size * 0.1, y + size * 0.35, x + size * 0.9, y + size * 0.95), outline=color, width=w)
+		draw.line((x + size * 0.5, y + size * 0.35, x + size * 0.5, y + size * 0.95), fill=color, width=w)
+		draw.line((x, y + size * 0.35, x + size, y + size * 0.35), fill=color, width=w)
+	elif kind == "share":
+		draw.line((x + size * 0.15, y + size * 0.85, x + size * 0.85, y + size * 0.15), fill=color, width=w)
+		draw.line((x + size * 0.45, y + size * 0.15, x + size * 0.85, y + size * 0.15, x + size * 0.85, y + size * 0.55), fill=color, width=w)
+	elif kind == "save":
+		draw.polygon(
+			[(x + size * 0.2, y), (x + size * 0.8, y), (x + size * 0.8, y + size), (x + size * 0.5, y + size * 0.7), (x + size * 0.2, y + size)],
+			outline=color, width=w,
+		)
+
+
+def render_card(data, out_path=None, scale=1.0):
+	"""Render the card for data (subreddit, title, author, upvotes, comments,
+	delay) and save it to out_path as PNG; returns the image."""
+
+	def px(v):
+		return round(v * scale)
+
+	regular = get_font("regular", px(12))
+	bold = get_font("bold", px(12))
+	title_font = get_font("bold", px(18))
+	icon_font = get_font("bold", px(10))
+
+	width = px(CARD_WIDTH)
+	vote_w = px(40)
+	pad = px(8)
+	content_x = vote_w + pad
+	content_w = width - content_x - pad
+
+	title_lines = wrap_text(str(data["title"]), title_font, content_w)
+	line_h = px(18 * 1.2)
+	meta_h = px(20)
+	action_h = px(12 * 1.2) + 2 * px(6)
+	height = pad + meta_h + px(8) + line_h * len(title_lines) + px(12) + action_h + pad
+	height = max(height, px(8 + 28 + 4 + 14 + 4 + 28 + 8))  # vote column
+
+	img = Image.new("RGB", (width, height), WHITE)
+	draw = ImageDraw.Draw(img)
+	draw.rectangle((0, 0, vote_w, height), fill=VOTE_BG)
+
+	# Vote column: ▲ count ▼
+	cx = vote_w / 2
+	y = px(8)
+	arrow = px(10)
+	draw.polygon([(cx, y + px(8)), (cx - arrow / 2, y + px(8) + arrow * 0.8), (cx + arrow / 2, y + px(8) + arrow * 0.8)], fill=VOTE_ICON)
+	y += px(28) + px(4)
+	draw.text((cx, y + px(7)), str(data["upvotes"]), font=bold, fill=TEXT, anchor="mm")
+	y += px(14) + px(4)
+	draw.polygon([(cx - arrow / 2, y + px(10)), (cx + arrow / 2, y + px(10)), (cx, y + px(10) + arrow * 0.8)], fill=VOTE_ICON)
+
+	# Metadata: (r) subreddit • Posted by u/author • N hours ago
+	x, y = content_x, pad
+	mid = y + meta_h / 2
+	draw.ellipse((x, y, x + px(20), y + px(20)), fill=ORANGE)
+	draw.text((x + px(10), mid), "r", font=icon_font, fill=WHITE, anchor="mm")
+	x += px(20) + px(4)
+	for text, font, color, gap in (
+		(str(data["subreddit"]), bold, TEXT, 4),
+		("•", regular, MUTED, 4),
+		(f"Posted by u/{data['author']}", regular, MUTED, 4),
+		("•", regular, MUTED, 4),
+		(f"{data['delay']} hours ago", regular, MUTED, 0),
+	):
+		draw.text((x, mid), text, font=font, fill=color, anchor="lm")
+		x += font.getlength(text) + px(gap) + (px(4) if text == "•" else 0)
+
+	# Title
+	y += meta_h + px(8)
+	for line in title_lines:
+		draw.text((content_x, y + line_h / 2), line, font=title_font, fill=TEXT, anchor="lm")
+		y += line_h
+	y += px(12)
+
+	# Actions
+	x = content_x
+	icon = px(14)
+	for kind, label in (
+		("comments", f"{data['comments']} Comments"),
+		("award", "Award"),
+		("share", "Share"),
+		("save", "Save"),
+	):
+		x += px(8)
+		_icon(draw, kind, x, y + (action_h - icon) / 2, icon, MUTED, scale)
+		x += icon + px(4)
+		draw.text((x, y + action_h / 2), label, font=regular, fill=MUTED, anchor="lm")
+		x += regular.getlength(label) + px(8) + px(4)
+
+	draw.rounded_rectangle((0, 0, width - 1, height - 1), radius=px(4), outline=BORDER, width=max(1, px(1)))
+
+	if out_path:
+		img.save(out_path, compress_level=1)  # ffmpeg reads it once; size does not matter
+	return img
+
+
+def render_cards(jobs, workers=None, scale=1.0):
+	"""Render [(data, out_path), ...] in parallel; returns the output paths."""
+	workers = workers or os.cpu_count() or 1
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		list(pool.map(lambda job: render_card(job[0], job[1], scale), jobs))
+	return [out for _, out in jobs]